@@ -6,22 +6,44 @@ E-XAM Admin Panel (Tkinter GUI) - Minimal grayscale theme + emoji icons
 - Removed "active set" usage in GUI
 - Refresh buttons added for Manage Sets and Results
 - Minimal grayscale palette, emoji icons kept
-- Uses Database context manager for MySQL connections
+- Uses the shared Database / repository layer in exam_db.py and the
+  GUI-free services in exam_services.py
 
 Dependencies:
-    pip install mysql-connector-python
+    pip install mysql-connector-python   (not needed for EXAM_DB_BACKEND=sqlite)
+    pip install qrcode reportlab         (optional: result QR images, PDF certificates)
 """
+import os
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import mysql.connector
-from datetime import datetime
+from datetime import date
+from tkinter import ttk, messagebox, simpledialog, filedialog
+import exam_config
+import exam_db
+import exam_services
+from exam_db import Database, create_tables, DB_ERRORS
+from change_feed import ChangeTail
+from exam_monitor import active_attempts
+from attempts import get_time_limits, set_time_limits, sweep_expired, SWEEP_BATCH
+from job_scheduler import start_scheduler
+from set_purge import PurgeJob
+from result_backfill import BackfillJob
+import result_qr
+import rollups
+import score_stats
+from certificates import CertificateJob, CERT_PASS_PERCENT, CERT_FORMAT, CERT_FORMATS, CERT_OUT_DIR
+import query_stats
+import ui_profiler
+from question_types import (QTYPES, QTYPE_LABELS, parse_authoring, authoring_text,
+                            pack_options, unpack_options)
 
 # ---------------------------
 # CONFIG
 # ---------------------------
-ADMIN_KEY = "1234"  # change to your secure admin key
 WIN_W = 1000
 WIN_H = 640
+CHANGE_POLL_MS = exam_config.getint("admin", "change_poll_ms")  # how often open pages tail the `changes` table
+MONITOR_REFRESH_MS = exam_config.getint("admin", "monitor_refresh_ms")  # exam monitor page refresh
+SWEEP_MS = exam_config.getint("admin", "sweep_ms")  # expired-attempt sweeper interval
 
 # Minimal grayscale palette
 BG = "#F2F2F2"          # main background
@@ -33,99 +55,6 @@ HDR_BG = "#EDEDED"      # header background
 BORDER = "#BFBFBF"      # borders / separators
 TEXT = "#000000"        # text color
 
-# ---------------------------
-# DATABASE CONNECTION (light OOP)
-# ---------------------------
-class Database:
-    def __init__(self):
-        # Update to your DB credentials
-        self.host = "localhost"
-        self.user = "root"
-        self.password = ""
-        self.database = "exam_system"
-        self.conn = None
-        self.cursor = None
-
-    def __enter__(self):
-        self.conn = mysql.connector.connect(
-            host=self.host,
-            user=self.user,
-            password=self.password,
-            database=self.database,
-            autocommit=False
-        )
-        self.cursor = self.conn.cursor()
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn:
-            if exc_type:
-                self.conn.rollback()
-            else:
-                self.conn.commit()
-            try:
-                self.cursor.close()
-            except Exception:
-                pass
-            try:
-                self.conn.close()
-            except Exception:
-                pass
-
-# ---------------------------
-# TABLE CREATION (no is_active used)
-# ---------------------------
-def create_tables():
-    try:
-        with Database() as db:
-            # Users table
-            db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS users (
-                    user_id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_name VARCHAR(255) UNIQUE NOT NULL,
-                    pin VARCHAR(10) NOT NULL
-                )
-            """)
-            
-            # Sets table
-            db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sets (
-                    set_id INT AUTO_INCREMENT PRIMARY KEY,
-                    set_name VARCHAR(255) UNIQUE NOT NULL,
-                    date_created DATETIME
-                )
-            """)
-            
-            # Questions table
-            db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS questions (
-                    question_id INT AUTO_INCREMENT PRIMARY KEY,
-                    set_id INT,
-                    question_text TEXT,
-                    answer TEXT,
-                    FOREIGN KEY (set_id) REFERENCES sets(set_id) ON DELETE CASCADE
-                )
-            """)
-            
-            # Results table
-            db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS results (
-                    result_id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_name VARCHAR(255),
-                    set_id INT,
-                    score INT,
-                    total INT,
-                    date_taken DATETIME,
-                    FOREIGN KEY (set_id) REFERENCES sets(set_id) ON DELETE CASCADE
-                )
-            """)
-            
-            print("Tables created successfully!")
-    except mysql.connector.Error as e:
-        print("Table creation error:", e)
-        messagebox.showerror("Database Error", f"Could not create tables:\n{e}")
-
-
 # ---------------------------
 # Helper: simple button creation to preserve minimal look
 # ---------------------------
@@ -136,6 +65,12 @@ def simple_button(parent, text, command=None, width=None):
         btn.config(width=width)
     return btn
 
+def dashboard_model():
+    """(total_sets, users_with_results, [(set_id, set_name, avg_percent, score_stats.summary)])."""
+    total_sets, total_users, averages = exam_services.dashboard_stats()
+    dists = score_stats.set_distributions(set_id for set_id, _, _ in averages)
+    return total_sets, total_users, [(set_id, name, avg, dists[set_id]) for set_id, name, avg in averages]
+
 # ---------------------------
 # Main App
 # ---------------------------
@@ -164,6 +99,55 @@ class ExamAdminApp(tk.Tk):
         popup.wait_window()
         return result["value"]
 
+    def question_dialog(self, title, qtext="", qtype="text", options_text="", answer_text=""):
+        """Author any question type; returns (qtext, qtype, options, mask, answer) or None."""
+        popup = tk.Toplevel()
+        popup.title(title)
+        popup.geometry("520x460")
+        popup.resizable(True, True)
+        popup.grab_set()
+
+        tk.Label(popup, text="Question text:", font=("Segoe UI", 10)).pack(anchor="w", padx=10, pady=(8,2))
+        text_widget = tk.Text(popup, font=("Segoe UI", 10), wrap="word", height=8)
+        text_widget.pack(fill="both", expand=True, padx=10)
+        text_widget.insert("1.0", qtext)
+
+        form = tk.Frame(popup)
+        form.pack(fill="x", padx=10, pady=8)
+        type_var = tk.StringVar(value=QTYPE_LABELS[qtype])
+        opts_var = tk.StringVar(value=options_text)
+        ans_var = tk.StringVar(value=answer_text)
+        tk.Label(form, text="Type:", font=("Segoe UI", 10)).grid(row=0, column=0, sticky="w")
+        ttk.Combobox(form, textvariable=type_var, state="readonly", width=20,
+                     values=[QTYPE_LABELS[t] for t in QTYPES]).grid(row=0, column=1, sticky="w", pady=3)
+        tk.Label(form, text="Options (a; b; c):", font=("Segoe UI", 10)).grid(row=1, column=0, sticky="w")
+        tk.Entry(form, textvariable=opts_var, font=("Segoe UI", 10), width=46).grid(row=1, column=1, sticky="w", pady=3)
+        tk.Label(form, text="Answer:", font=("Segoe UI", 10)).grid(row=2, column=0, sticky="w")
+        tk.Entry(form, textvariable=ans_var, font=("Segoe UI", 10), width=46).grid(row=2, column=1, sticky="w", pady=3)
+        tk.Label(form, text="Answer = text, True/False, or option letter(s) e.g. B or A, C",
+                 font=("Segoe UI", 9), fg="#555555").grid(row=3, column=1, sticky="w")
+
+        result = {"value": None}
+
+        def save_and_close():
+            new_q = text_widget.get("1.0", "end-1c").strip()
+            new_type = next(t for t in QTYPES if QTYPE_LABELS[t] == type_var.get())
+            if not new_q:
+                messagebox.showwarning("Input required", "Question text cannot be empty.", parent=popup)
+                return
+            try:
+                options, mask, answer = parse_authoring(new_type, opts_var.get(), ans_var.get())
+            except ValueError as e:
+                messagebox.showwarning("Invalid question", str(e), parent=popup)
+                return
+            result["value"] = (new_q, new_type, options, mask, answer)
+            popup.destroy()
+
+        tk.Button(popup, text="Save", width=12, command=save_and_close).pack(pady=8)
+
+        popup.wait_window()
+        return result["value"]
+
     
     def __init__(self):
         super().__init__()
@@ -184,7 +168,22 @@ class ExamAdminApp(tk.Tk):
         self.main_frame = None
         self.content_frame = None
 
-        create_tables()
+        # change feed: pages register (tables, callback) watchers
+        self.change_tail = ChangeTail()
+        self.page_watchers = []
+        self.poll_job = None
+        self.sweep_job = None
+        self.scheduler = None      # background jobs: rollups, archiving (job_scheduler.py)
+        self.purge_job = None      # background purge of deleted sets (set_purge.py)
+        self.backfill_job = None   # result snapshot backfill (result_backfill.py)
+        self.cert_job = None       # certificate batch (certificates.py)
+        self.dashboard_cache = exam_services.DashboardCache(dashboard_model)
+
+        try:
+            create_tables()
+        except DB_ERRORS as e:
+            print("Table creation error:", e)
+            messagebox.showerror("Database Error", f"Could not create tables:\n{e}")
         self.show_login()
         
     def make_treeview_sortable(self, tree):
@@ -271,7 +270,7 @@ class ExamAdminApp(tk.Tk):
 
     def handle_login(self):
         key = self.key_entry.get()
-        if key != ADMIN_KEY:
+        if not exam_services.check_admin_key(key):
             messagebox.showerror("Access Denied", "Invalid admin key.")
             return
         self.login_frame.destroy()
@@ -318,16 +317,39 @@ class ExamAdminApp(tk.Tk):
         self.nav_buttons['manage_users'].pack(**nav_cfg)
         self.nav_buttons['results'] = simple_button(sidebar, "📑  View Results", command=lambda: self.load_page(self.page_view_results))
         self.nav_buttons['results'].pack(**nav_cfg)
+        self.nav_buttons['monitor'] = simple_button(sidebar, "🛰  Exam Monitor", command=lambda: self.load_page(self.page_exam_monitor))
+        self.nav_buttons['monitor'].pack(**nav_cfg)
+        self.nav_buttons['certificates'] = simple_button(sidebar, "🎓  Certificates", command=lambda: self.load_page(self.page_certificates))
+        self.nav_buttons['certificates'].pack(**nav_cfg)
+        self.nav_buttons['trends'] = simple_button(sidebar, "📈  Trends", command=lambda: self.load_page(self.page_trends))
+        self.nav_buttons['trends'].pack(**nav_cfg)
 
         # Logout (bottom)
         logout_btn = simple_button(sidebar, "🔓  Logout", command=self.logout)
         logout_btn.pack(side="bottom", fill="x", padx=12, pady=12)
 
+        # Hidden: query latency page (not in the sidebar)
+        self.bind("<Control-Q>", lambda e: self.load_page(self.page_query_stats))
+
         # Load default page
         self.load_page(self.page_dashboard)
+        self.start_change_polling()
+        self.sweep_job = self.after(SWEEP_MS, self.sweep_attempts)
+        if self.scheduler is None:
+            self.scheduler = start_scheduler()
+        if self.backfill_job is None:
+            self.backfill_job = BackfillJob()  # once per session; cheap when nothing is missing
+            self.backfill_job.start()
 
     def logout(self):
         if messagebox.askyesno("Logout", "Log out from admin panel?"):
+            self.stop_change_polling()
+            self.dashboard_cache.invalidate()  # changes made while logged out are not in the feed tail
+            score_stats.sketches.invalidate()
+            if self.scheduler:
+                self.scheduler.stop()
+                self.scheduler = None
+            self.unbind("<Control-Q>")
             if self.main_frame:
                 self.main_frame.destroy()
             self.main_frame = None
@@ -337,8 +359,68 @@ class ExamAdminApp(tk.Tk):
         # clear content frame
         for w in self.content_frame.winfo_children():
             w.destroy()
+        self.page_watchers = []
         page_func(self.content_frame)
 
+    # ---------------------------
+    # Change feed (live pages)
+    # ---------------------------
+    def watch_changes(self, tables, callback):
+        """Call callback(delta) when any of `tables` changes while the page is open."""
+        self.page_watchers.append((set(tables), callback))
+
+    def start_change_polling(self):
+        try:
+            with Database() as db:
+                self.change_tail.sync(db)
+        except DB_ERRORS:
+            pass
+        self.stop_change_polling()
+        self.poll_job = self.after(CHANGE_POLL_MS, self.poll_changes)
+
+    def stop_change_polling(self):
+        if self.poll_job:
+            self.after_cancel(self.poll_job)
+            self.poll_job = None
+        if self.sweep_job:
+            self.after_cancel(self.sweep_job)
+            self.sweep_job = None
+
+    def poll_changes(self):
+        self.poll_job = None
+        try:
+            with Database() as db:
+                delta = self.change_tail.poll(db)
+        except DB_ERRORS:
+            delta = {}
+        if delta:
+            if "results" in delta or "sets" in delta:
+                score_stats.sketches.invalidate()
+                self.dashboard_cache.invalidate()
+            for tables, callback in list(self.page_watchers):
+                hit = {t: delta[t] for t in tables if t in delta}
+                if hit:
+                    callback(hit)
+        if self.main_frame:
+            self.poll_job = self.after(CHANGE_POLL_MS, self.poll_changes)
+
+    # ---------------------------
+    # Expired attempt sweeper
+    # ---------------------------
+    def sweep_attempts(self):
+        """Finalize overdue timed attempts in batches (one transaction per batch)."""
+        self.sweep_job = None
+        try:
+            while True:
+                with Database() as db:
+                    closed = sweep_expired(db)
+                if closed < SWEEP_BATCH:
+                    break
+        except DB_ERRORS:
+            pass
+        if self.main_frame:
+            self.sweep_job = self.after(SWEEP_MS, self.sweep_attempts)
+
     # ---------------------------
     # Page: Dashboard
     # ---------------------------
@@ -352,28 +434,24 @@ class ExamAdminApp(tk.Tk):
         stats_frame = tk.Frame(frame, bg=BG)
         stats_frame.pack(fill="x", padx=20)
 
-        try:
-            with Database() as db:
-                db.cursor.execute("SELECT COUNT(*) FROM sets")
-                total_sets = db.cursor.fetchone()[0] or 0
-                db.cursor.execute("SELECT COUNT(DISTINCT user_name) FROM results")
-                total_users = db.cursor.fetchone()[0] or 0
-        except mysql.connector.Error as e:
-            messagebox.showerror("Database Error", str(e))
-            return
-
-        tk.Label(stats_frame, text=f"Total Sets: {total_sets}", font=self.default_font, bg=BG).pack(anchor="w", pady=2)
-        tk.Label(stats_frame, text=f"Total Users Who Took Exams: {total_users}", font=self.default_font, bg=BG).pack(anchor="w", pady=2)
+        sets_lbl = tk.Label(stats_frame, text="Total Sets: -", font=self.default_font, bg=BG)
+        sets_lbl.pack(anchor="w", pady=2)
+        users_lbl = tk.Label(stats_frame, text="Total Users Who Took Exams: -", font=self.default_font, bg=BG)
+        users_lbl.pack(anchor="w", pady=2)
+        status_lbl = tk.Label(stats_frame, text="", font=self.default_font, bg=BG, fg="#555555")
+        status_lbl.pack(anchor="w", pady=2)
 
         # Averages table
         table_frame = tk.Frame(frame, bg=BG)
         table_frame.pack(fill="both", expand=True, padx=20, pady=12)
 
-        cols = ("Set ID", "Set Name", "Average Score")
+        cols = ("Set ID", "Set Name", "Average Score", "Median", "Middle 50%")
         tree = ttk.Treeview(table_frame, columns=cols, show="headings", height=12)
         tree.column("Set ID", width=40, minwidth=60, anchor="w", stretch=True)
         tree.column("Set Name", width=200, minwidth=120, anchor="w", stretch=True)
         tree.column("Average Score", width=40, minwidth=140, anchor="w", stretch=True)
+        tree.column("Median", width=40, minwidth=90, anchor="w", stretch=True)
+        tree.column("Middle 50%", width=40, minwidth=120, anchor="w", stretch=True)
         for c in cols:
             tree.heading(c, text=c)
         tree.pack(fill="both", expand=True, side="left")
@@ -385,18 +463,94 @@ class ExamAdminApp(tk.Tk):
         scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
         tree.configure(yscroll=scrollbar.set)
         scrollbar.pack(side="right", fill="y")
+        tk.Label(frame, text="Double-click a set for its score distribution.", font=self.default_font,
+                 bg=BG).pack(anchor="w", padx=20, pady=(0,8))
 
+        shown = {"version": None, "polling": False}
+
+        def render(model):
+            total_sets, total_users, rows = model
+            sets_lbl.config(text=f"Total Sets: {total_sets}")
+            users_lbl.config(text=f"Total Users Who Took Exams: {total_users}")
+            tree.delete(*tree.get_children())
+            for set_id, set_name, avg, (n, _, p25, p50, p75, _) in rows:
+                tree.insert("", "end", values=(set_id, set_name, exam_services.format_average(avg),
+                                               f"{p50:.1f}%" if n else "-",
+                                               f"{p25:.1f}% – {p75:.1f}%" if n else "-"))
+
+        def poll():
+            shown["polling"] = False
+            load_stats()
+
+        def load_stats():
+            # render whatever is cached at once; poll while the background refresh runs
+            if not tree.winfo_exists():
+                return
+            cache = self.dashboard_cache
+            model, version = cache.get()
+            if model is not None and version != shown["version"]:
+                shown["version"] = version
+                render(model)
+            if cache.refreshing:
+                status_lbl.config(text="Refreshing…" if model is not None else "Loading…")
+                if not shown["polling"]:
+                    shown["polling"] = True
+                    tree.after(200, poll)
+            elif cache.error is not None:
+                status_lbl.config(text=f"Could not refresh: {cache.error}")
+                if model is None:
+                    messagebox.showerror("Database Error", str(cache.error))
+            elif cache.updated_at is not None:
+                status_lbl.config(text=f"Updated {cache.updated_at:%H:%M:%S}")
+            else:
+                status_lbl.config(text="Loading…")
+
+        def on_open(event):
+            item = tree.identify_row(event.y)
+            if item:
+                set_id, set_name = tree.item(item)["values"][:2]
+                self.show_distribution(set_id, set_name)
+
+        tree.bind("<Double-1>", on_open)
+
+        # live: the change poller invalidates the cache; this picks up the refresh
+        self.watch_changes(("sets", "results"), lambda delta: load_stats())
+        load_stats()
+
+    def show_distribution(self, set_id, set_name):
+        """Popup: histogram (10% buckets) and percentiles of one set, from its score sketch."""
         try:
-            with Database() as db:
-                db.cursor.execute("SELECT set_id, set_name FROM sets ORDER BY set_id DESC")
-                sets = db.cursor.fetchall()
-                for s in sets:
-                    db.cursor.execute("SELECT AVG(score/NULLIF(total,0))*100 FROM results WHERE set_id=%s", (s[0],))
-                    avg = db.cursor.fetchone()[0]
-                    avg_display = f"{avg:.2f}%" if avg is not None else "No results"
-                    tree.insert("", "end", values=(s[0], s[1], avg_display))
-        except mysql.connector.Error as e:
+            counts = score_stats.sketches.get(set_id)
+        except DB_ERRORS as e:
             messagebox.showerror("Database Error", str(e))
+            return
+        n, mean, p25, p50, p75, p90 = score_stats.summary(counts)
+        popup = tk.Toplevel(self)
+        popup.title(f"Score distribution - {set_name}")
+        popup.configure(bg=BG)
+        popup.resizable(False, False)
+        if not n:
+            tk.Label(popup, text="No graded results yet.", font=self.default_font, bg=BG).pack(padx=20, pady=20)
+            return
+        tk.Label(popup, text=f"{n} graded attempts · median {p50:.1f}% · p25 {p25:.1f}% · "
+                             f"p75 {p75:.1f}% · p90 {p90:.1f}%",
+                 font=self.default_font, bg=BG).pack(anchor="w", padx=12, pady=(10,4))
+        w, h, left, bottom = 520, 260, 40, 230
+        canvas = tk.Canvas(popup, width=w, height=h, bg=PANEL_BG, highlightthickness=1, highlightbackground=BORDER)
+        canvas.pack(padx=12, pady=(0,12))
+        buckets = score_stats.coarse(counts)
+        most = max(buckets) or 1
+        step = (w - left - 16) / len(buckets)
+        for i, c in enumerate(buckets):
+            x0 = left + i * step
+            top = bottom - (bottom - 24) * c / most
+            canvas.create_rectangle(x0 + 4, top, x0 + step - 4, bottom, fill="#C8C8C8", outline=BORDER)
+            canvas.create_text(x0 + step / 2, top - 8, text=str(c), fill=TEXT)
+            canvas.create_text(x0 + step / 2, bottom + 12, text=f"{i * 10}%", fill=TEXT)
+        canvas.create_line(left, bottom, w - 16, bottom, fill=BORDER)
+        x = left + (w - left - 16) * p50 / 100
+        canvas.create_line(x, 16, x, bottom, fill=TEXT, dash=(4, 2))
+        canvas.create_text(x + 4, 16, text="median", anchor="w", fill=TEXT)
 
     # ---------------------------
     # Page: Create Set
@@ -414,6 +568,16 @@ class ExamAdminApp(tk.Tk):
         set_name_var = tk.StringVar()
         tk.Entry(form, textvariable=set_name_var, font=self.default_font, width=48).grid(row=0, column=1, sticky="w", padx=8, pady=6)
 
+        tk.Label(form, text="Time limit (min):", font=self.default_font, bg=BG).grid(row=1, column=0, sticky="w")
+        limit_var = tk.StringVar()
+        limit_row = tk.Frame(form, bg=BG)
+        limit_row.grid(row=1, column=1, sticky="w", padx=8)
+        tk.Entry(limit_row, textvariable=limit_var, font=self.default_font, width=8).pack(side="left")
+        tk.Label(limit_row, text="  Per question (sec):", font=self.default_font, bg=BG).pack(side="left")
+        q_limit_var = tk.StringVar()
+        tk.Entry(limit_row, textvariable=q_limit_var, font=self.default_font, width=8).pack(side="left")
+        tk.Label(limit_row, text="  (blank = no limit)", font=self.default_font, bg=BG).pack(side="left")
+
         qframe = tk.Frame(frame, bg=BG)
         qframe.pack(fill="both", padx=20, pady=(6,12), expand=True)
 
@@ -423,24 +587,41 @@ class ExamAdminApp(tk.Tk):
         qinput_frame.pack(fill="x", pady=6)
         q_text_var = tk.StringVar()
         a_text_var = tk.StringVar()
+        type_var = tk.StringVar(value=QTYPE_LABELS["text"])
+        opts_var = tk.StringVar()
 
         q_entry = tk.Entry(qinput_frame, textvariable=q_text_var, font=self.default_font, width=70)
         q_entry.grid(row=0, column=0, padx=(0,8))
         a_entry = tk.Entry(qinput_frame, textvariable=a_text_var, font=self.default_font, width=20)
         a_entry.grid(row=0, column=1)
 
+        type_frame = tk.Frame(qinput_frame, bg=BG)
+        type_frame.grid(row=1, column=0, columnspan=3, sticky="w", pady=(6,0))
+        ttk.Combobox(type_frame, textvariable=type_var, state="readonly", width=16,
+                     values=[QTYPE_LABELS[t] for t in QTYPES]).pack(side="left")
+        tk.Label(type_frame, text="  Options (a; b; c):", font=self.default_font, bg=BG).pack(side="left")
+        tk.Entry(type_frame, textvariable=opts_var, font=self.default_font, width=44).pack(side="left")
+        tk.Label(type_frame, text="  Answer: text, True/False or letter(s)", font=self.default_font, bg=BG).pack(side="left")
+
+        # (question_text, qtype, options, correct_mask, answer)
         questions_list = []
 
         def add_question_to_list():
             qtext = q_text_var.get().strip()
-            atext = a_text_var.get().strip()
-            if not qtext or not atext:
+            qtype = next(t for t in QTYPES if QTYPE_LABELS[t] == type_var.get())
+            if not qtext:
                 messagebox.showwarning("Input required", "Both question and answer are required.")
                 return
-            questions_list.append((qtext, atext))
-            lstbox.insert("end", f"Q: {qtext}  |  A: {atext}")
+            try:
+                options, mask, answer = parse_authoring(qtype, opts_var.get(), a_text_var.get())
+            except ValueError as e:
+                messagebox.showwarning("Input required", str(e))
+                return
+            questions_list.append((qtext, qtype, options, mask, answer))
+            lstbox.insert("end", f"[{QTYPE_LABELS[qtype]}] Q: {qtext}  |  A: {answer}")
             q_text_var.set("")
             a_text_var.set("")
+            opts_var.set("")
             q_entry.focus()
 
         add_btn = simple_button(qinput_frame, "Add", command=add_question_to_list)
@@ -466,30 +647,24 @@ class ExamAdminApp(tk.Tk):
             if not set_name:
                 messagebox.showwarning("Input required", "Set name cannot be empty.")
                 return
+            try:
+                time_limit, q_limit = exam_services.parse_time_limits(limit_var.get(), q_limit_var.get())
+            except ValueError as e:
+                messagebox.showwarning("Input required", str(e))
+                return
             if not questions_list:
                 if not messagebox.askyesno("No questions", "No questions added. Create empty set?"):
                     return
             try:
-                with Database() as db:
-                    db.cursor.execute(
-                        "INSERT INTO sets (set_name, date_created) VALUES (%s, %s)",
-                        (set_name, datetime.now())
-                    )
-                    db.cursor.execute("SELECT set_id FROM sets WHERE set_name=%s", (set_name,))
-                    row = db.cursor.fetchone()
-                    if row:
-                        set_id = row[0]
-                        for q, a in questions_list:
-                            db.cursor.execute(
-                                "INSERT INTO questions (set_id, question_text, answer) VALUES (%s, %s, %s)",
-                                (set_id, q, a)
-                            )
+                exam_services.create_set(set_name, questions_list, time_limit, q_limit)
                 messagebox.showinfo("Success", f"Set '{set_name}' created successfully!")
                 # clear
                 set_name_var.set("")
+                limit_var.set("")
+                q_limit_var.set("")
                 lstbox.delete(0, "end")
                 questions_list.clear()
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 # Integrity error (duplicate name) or others
                 messagebox.showerror("Database Error", str(e))
 
@@ -519,6 +694,7 @@ class ExamAdminApp(tk.Tk):
         sets_tree.column("ID", width=60, anchor="center", stretch=True)
         sets_tree.column("Name", width=220, minwidth=140, anchor="w", stretch=True)
         sets_tree.pack(fill="both", expand=True, padx=8, pady=(0,8))
+        simple_button(left, "🗑 Deleted Sets…", command=self.purge_dialog).pack(anchor="w", padx=8, pady=(0,8))
 
         # Right: questions for selected set
         right = tk.Frame(pane, bg=PANEL_BG)
@@ -527,15 +703,17 @@ class ExamAdminApp(tk.Tk):
         tk.Label(right, text="Questions in selected set:", font=self.default_font, bg=PANEL_BG).pack(anchor="nw", padx=8, pady=(8,6))
         q_tree = ttk.Treeview(
             right,
-            columns=("ID", "Question", "Answer"),
+            columns=("ID", "Type", "Question", "Answer"),
             show="headings",
             height=14,
             selectmode="extended"   # allow multi-select
             )
         q_tree.heading("ID", text="Q ID")
+        q_tree.heading("Type", text="Type")
         q_tree.heading("Question", text="Question")
         q_tree.heading("Answer", text="Answer")
         q_tree.column("ID", width=30, anchor="center", stretch=False)
+        q_tree.column("Type", width=50, anchor="center", stretch=False)
         q_tree.column("Question", width=90, anchor="w", stretch=True)
         q_tree.column("Answer", width=20, minwidth=140, anchor="w", stretch=True)
         q_tree.pack(fill="both", expand=True, padx=8, pady=(0,8))
@@ -547,22 +725,30 @@ class ExamAdminApp(tk.Tk):
         btn_frame.pack(fill="x", padx=8, pady=(4,8))
 
         def load_sets():
+            sel = sets_tree.selection()
+            current = sets_tree.item(sel[0])["values"][0] if sel else None
             sets_tree.delete(*sets_tree.get_children())
             try:
                 with Database() as db:
-                    db.cursor.execute("SELECT set_id, set_name FROM sets ORDER BY set_id DESC")
-                    rows = db.cursor.fetchall()
+                    rows = exam_db.list_sets(db)
                     for r in rows:
                         sets_tree.insert("", "end", values=r)
-                # select first set automatically
-                if sets_tree.get_children():
-                    first = sets_tree.get_children()[0]
-                    sets_tree.selection_set(first)
-                    sets_tree.focus(first)
+                # keep the set being edited; the first set only when it is gone (or on first load)
+                items = sets_tree.get_children()
+                if items:
+                    keep = [i for i in items if sets_tree.item(i)["values"][0] == current]
+                    item = keep[0] if keep else items[0]
+                    sets_tree.selection_set(item)
+                    sets_tree.focus(item)
+                    sets_tree.see(item)
                     load_questions_for_set()
             except Exception as e:
                 messagebox.showerror("DB Error", str(e))
 
+        # question_id -> (question_text, answer, qtype, options, correct_mask);
+        # the tree only holds display strings
+        q_meta = {}
+
         # --- Single loader for selection ---
         def load_questions_for_set(event=None):
             sel = sets_tree.selection()
@@ -570,16 +756,20 @@ class ExamAdminApp(tk.Tk):
             if not sel:
                 return
             set_id = sets_tree.item(sel[0])["values"][0]
+            q_meta.clear()
             try:
-                with Database() as db:
-                    db.cursor.execute("SELECT question_id, question_text, answer FROM questions WHERE set_id=%s", (set_id,))
-                    for q in db.cursor.fetchall():
-                        q_tree.insert("", "end", values=(q[0], q[1], q[2]))
-            except mysql.connector.Error as e:
+                for q in exam_services.set_questions(set_id):
+                    q_meta[q[0]] = q[1:]
+                    q_tree.insert("", "end", values=(q[0], q[3], q[1], q[2]))
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         sets_tree.bind("<<TreeviewSelect>>", load_questions_for_set)
 
+        # live: other admins editing sets/questions
+        self.watch_changes(("sets",), lambda delta: load_sets())
+        self.watch_changes(("questions",), load_questions_for_set)
+
         def on_set_select(event):
             # wrapper to reload questions (keeps old API used by some buttons)
             load_questions_for_set(event)
@@ -590,18 +780,16 @@ class ExamAdminApp(tk.Tk):
                 messagebox.showinfo("Select Set", "Select a set to add a question.")
                 return
             set_id = sets_tree.item(sel[0])["values"][0]
-            qtext = simpledialog.askstring("Add Question", "Enter question text:")
-            if qtext is None or qtext.strip() == "":
-                return
-            ans = simpledialog.askstring("Answer", "Enter answer text:")
-            if ans is None:
+            details = self.question_dialog("Add Question")
+            if details is None:
                 return
+            qtext, qtype, options, mask, ans = details
             try:
                 with Database() as db:
-                    db.cursor.execute("INSERT INTO questions (set_id, question_text, answer) VALUES (%s, %s, %s)", (set_id, qtext.strip(), ans.strip()))
+                    exam_db.insert_question(db, set_id, qtext, ans, qtype, pack_options(options), mask)
                 load_questions_for_set()
                 messagebox.showinfo("Success", "Question added.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def edit_question():
@@ -609,19 +797,22 @@ class ExamAdminApp(tk.Tk):
             if not sel:
                 messagebox.showinfo("Select Question", "Select a question to edit.")
                 return
-            q_id, qtext, ans = q_tree.item(sel[0])["values"]
-            new_q = self.large_text_dialog("Edit Question", "New question text:", qtext)
-            if new_q is None or new_q.strip() == "":
-                return
-            new_a = self.large_text_dialog("Edit Answer", "New answer:", ans)
-            if new_a is None:
+            q_id = q_tree.item(sel[0])["values"][0]
+            qtext, ans, qtype, packed, mask = q_meta[q_id]
+            options = unpack_options(packed)
+            options_text, answer_text = authoring_text(qtype, options, mask, ans)
+            details = self.question_dialog("Edit Question", qtext, qtype, options_text, answer_text)
+            if details is None:
                 return
+            new_q, new_type, new_opts, new_mask, new_a = details
             try:
                 with Database() as db:
-                    db.cursor.execute("UPDATE questions SET question_text=%s, answer=%s WHERE question_id=%s", (new_q.strip(), new_a.strip(), q_id))
+                    exam_db.update_question(db, q_id, new_q, new_a, new_type, pack_options(new_opts), new_mask)
                 load_questions_for_set()
                 messagebox.showinfo("Success", "Question updated.")
-            except mysql.connector.Error as e:
+            except ValueError as e:
+                messagebox.showwarning("Question changed", str(e))
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def delete_question():
@@ -641,32 +832,54 @@ class ExamAdminApp(tk.Tk):
 
             try:
                 with Database() as db:
-                    db.cursor.executemany(
-                        "DELETE FROM questions WHERE question_id=%s",
-                        [(qid,) for qid in q_ids]
-                    )
+                    exam_db.delete_questions(db, q_ids)
                 load_questions_for_set()
                 messagebox.showinfo("Deleted", f"Deleted {len(q_ids)} question(s).")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
 
+        def edit_time_limits():
+            sel = sets_tree.selection()
+            if not sel:
+                messagebox.showinfo("Select Set", "Select a set to change its time limits.")
+                return
+            set_id = sets_tree.item(sel[0])["values"][0]
+            try:
+                with Database() as db:
+                    cur_limit, cur_q = get_time_limits(db, set_id)
+                minutes = simpledialog.askinteger(
+                    "Time Limit", "Whole set time limit in minutes (0 = none):",
+                    initialvalue=(cur_limit or 0) // 60, minvalue=0)
+                if minutes is None:
+                    return
+                q_secs = simpledialog.askinteger(
+                    "Time Limit", "Per-question limit in seconds (0 = none):",
+                    initialvalue=cur_q or 0, minvalue=0)
+                if q_secs is None:
+                    return
+                with Database() as db:
+                    set_time_limits(db, set_id, minutes * 60, q_secs)
+                messagebox.showinfo("Success", "Time limits updated.")
+            except DB_ERRORS as e:
+                messagebox.showerror("Database Error", str(e))
+
         def delete_set():
             sel = sets_tree.selection()
             if not sel:
                 messagebox.showinfo("Select Set", "Select a set to delete.")
                 return
             set_id = sets_tree.item(sel[0])["values"][0]
-            if not messagebox.askyesno("Confirm", "Delete set and all its questions?"):
+            if not messagebox.askyesno("Confirm", "Delete this set? Past results are kept."):
                 return
             try:
                 with Database() as db:
-                    db.cursor.execute("DELETE FROM sets WHERE set_id=%s", (set_id,))
+                    exam_db.delete_set(db, set_id)
                 load_sets()
                 for r in q_tree.get_children():
                     q_tree.delete(r)
                 messagebox.showinfo("Deleted", "Set deleted.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         # Buttons
@@ -675,10 +888,81 @@ class ExamAdminApp(tk.Tk):
         simple_button(btn_frame, "Edit Question", command=edit_question).pack(**left_pad)
         simple_button(btn_frame, "Delete Question", command=delete_question).pack(**left_pad)
         simple_button(btn_frame, "Delete Set", command=delete_set).pack(**left_pad)
+        simple_button(btn_frame, "⏱ Time Limits", command=edit_time_limits).pack(**left_pad)
 
         # initial load
         load_sets()
 
+    # ---------------------------
+    # Dialog: purge deleted sets (chunked, in the background)
+    # ---------------------------
+    def purge_dialog(self):
+        popup = tk.Toplevel(self)
+        popup.title("Deleted Sets")
+        popup.geometry("520x380")
+        popup.configure(bg=BG)
+
+        tk.Label(popup, text="Deleted sets (results kept until purged):",
+                 font=self.default_font, bg=BG).pack(anchor="w", padx=10, pady=(10,4))
+        tree = ttk.Treeview(popup, columns=("ID", "Name", "Deleted"), show="headings",
+                            height=10, selectmode="extended")
+        for col, width in (("ID", 60), ("Name", 260), ("Deleted", 150)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor="w")
+        tree.pack(fill="both", expand=True, padx=10)
+
+        bar = ttk.Progressbar(popup, maximum=1.0, length=480)
+        bar.pack(padx=10, pady=(8,2))
+        status = tk.Label(popup, text="", font=self.default_font, bg=BG)
+        status.pack(anchor="w", padx=10)
+
+        def load_deleted():
+            tree.delete(*tree.get_children())
+            try:
+                with Database() as db:
+                    for row in exam_db.list_deleted_sets(db):
+                        tree.insert("", "end", values=row)
+            except DB_ERRORS as e:
+                messagebox.showerror("Database Error", str(e), parent=popup)
+
+        def track():
+            job = self.purge_job
+            if job is None or not popup.winfo_exists():
+                return
+            bar["value"] = job.fraction()
+            if job.is_alive():
+                status.config(text=f"Purging… {job.done}/{job.total or '?'} rows")
+                popup.after(200, track)
+                return
+            self.purge_job = None
+            if job.error:
+                status.config(text=f"Stopped: {job.error}")
+            else:
+                status.config(text=f"Purged {len(job.purged)} set(s).")
+            load_deleted()
+
+        def purge_selected():
+            if self.purge_job is not None:
+                messagebox.showinfo("Purge", "A purge is already running.", parent=popup)
+                return
+            set_ids = [tree.item(item)["values"][0] for item in tree.selection()]
+            if not set_ids:
+                messagebox.showinfo("Select Set", "Select one or more deleted sets.", parent=popup)
+                return
+            if not messagebox.askyesno(
+                "Confirm",
+                f"Permanently remove {len(set_ids)} set(s) with all their questions, "
+                "attempts and results?", parent=popup
+            ):
+                return
+            self.purge_job = PurgeJob(set_ids)
+            self.purge_job.start()
+            track()
+
+        simple_button(popup, "Purge Selected", command=purge_selected).pack(pady=8)
+        load_deleted()
+        track()  # a purge started earlier keeps reporting here
+
     def page_manage_users(self, frame):
         frame.configure(bg=BG)
         header = tk.Frame(frame, bg=HDR_BG, padx=12, pady=8)
@@ -701,14 +985,13 @@ class ExamAdminApp(tk.Tk):
 
         self.make_treeview_sortable(tree)
 
-        def load_users():
+        def load_users(delta=None):
             tree.delete(*tree.get_children())
             try:
                 with Database() as db:
-                    db.cursor.execute("SELECT user_id, user_name, pin FROM users ORDER BY user_id DESC")
-                    for row in db.cursor.fetchall():
+                    for row in exam_db.list_users(db):
                         tree.insert("", "end", values=row)
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def add_user():
@@ -718,10 +1001,10 @@ class ExamAdminApp(tk.Tk):
             if not pin: return
             try:
                 with Database() as db:
-                    db.cursor.execute("INSERT INTO users (user_name, pin) VALUES (%s, %s)", (username, pin))
+                    exam_db.insert_user(db, username, pin)
                 load_users()
                 messagebox.showinfo("Success", f"User '{username}' added.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def edit_user():
@@ -732,10 +1015,10 @@ class ExamAdminApp(tk.Tk):
             if not new_pin: return
             try:
                 with Database() as db:
-                    db.cursor.execute("UPDATE users SET pin=%s WHERE user_id=%s", (new_pin, user_id))
+                    exam_db.update_user_pin(db, user_id, new_pin)
                 load_users()
                 messagebox.showinfo("Success", "PIN updated.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def delete_user():
@@ -746,10 +1029,10 @@ class ExamAdminApp(tk.Tk):
                 return
             try:
                 with Database() as db:
-                    db.cursor.execute("DELETE FROM users WHERE user_id=%s", (user_id,))
+                    exam_db.delete_user(db, user_id)
                 load_users()
                 messagebox.showinfo("Deleted", f"User '{username}' deleted.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         btn_frame = tk.Frame(frame, bg=BG)
@@ -758,6 +1041,7 @@ class ExamAdminApp(tk.Tk):
         simple_button(btn_frame, "Edit User PIN", command=edit_user).pack(side="left", padx=6)
         simple_button(btn_frame, "Delete User", command=delete_user).pack(side="left", padx=6)
 
+        self.watch_changes(("users",), load_users)
         load_users()
 
 
@@ -798,35 +1082,406 @@ class ExamAdminApp(tk.Tk):
         def load_results():
             tree.delete(*tree.get_children())
             try:
-                with Database() as db:
-                    db.cursor.execute("""
-                        SELECT r.result_id, r.user_name, s.set_name, r.score, r.total, r.date_taken
-                        FROM results r
-                        LEFT JOIN sets s ON r.set_id = s.set_id
-                        ORDER BY r.date_taken DESC
-                    """)
-                    rows = db.cursor.fetchall()
-                    for r in rows:
-                        date_val = r[5]
-                        if isinstance(date_val, datetime):
-                            date_val = date_val.strftime("%Y-%m-%d %H:%M:%S")
-                        display_set = r[2] or "(deleted set)"
-                        tree.insert("", "end", values=(r[0], r[1], display_set, r[3], r[4], date_val))
-            except mysql.connector.Error as e:
+                for values in exam_services.recent_results():
+                    tree.insert("", "end", values=values)
+            except DB_ERRORS as e:
+                messagebox.showerror("Database Error", str(e))
+
+        def on_results_changed(delta):
+            # new attempts only -> fetch just those rows and put them on top
+            new_ids = [rid for rid, op in delta.get("results", []) if op == "insert" and rid]
+            if "sets" in delta or len(new_ids) != len(delta.get("results", [])):
+                load_results()
+                return
+            try:
+                for values in exam_services.new_results(new_ids):
+                    tree.insert("", 0, values=values)
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
+        self.watch_changes(("results", "sets"), on_results_changed)
 
-        # Refresh button
-        refresh_btn = simple_button(frame, "🔁  Refresh Results", command=load_results)
-        refresh_btn.pack(anchor="ne", padx=24, pady=(0,8))
+
+        def lookup_code():
+            code = simpledialog.askstring("Result Code", "Scan or type the result code:")
+            if not code:
+                return
+            try:
+                row = result_qr.lookup_result(code)
+            except ValueError as e:
+                messagebox.showwarning("Result Code", str(e))
+                return
+            except DB_ERRORS as e:
+                messagebox.showerror("Database Error", str(e))
+                return
+            if row is None:
+                messagebox.showinfo("Result Code", "Valid code, but the result no longer exists.")
+                return
+            result_id, user_name, set_name, score, total, taken = row
+            for item in tree.get_children():
+                if tree.item(item)["values"][0] == result_id:
+                    tree.selection_set(item)
+                    tree.see(item)
+                    break
+            messagebox.showinfo("Result Code", f"Result #{result_id}\n{user_name} - {set_name or '(deleted set)'}\n"
+                                               f"Score: {score}/{total}\nTaken: {taken}")
+
+        def show_percentile():
+            sel = tree.selection()
+            if not sel:
+                messagebox.showinfo("Select Result", "Select a result first.")
+                return
+            result_id, user_name, set_name = tree.item(sel[0])["values"][:3]
+            try:
+                row = score_stats.result_percentile(result_id)
+            except DB_ERRORS as e:
+                messagebox.showerror("Database Error", str(e))
+                return
+            if row is None:
+                messagebox.showinfo("Percentile", "This result no longer exists.")
+                return
+            _, score, total, rank = row
+            if rank is None:
+                messagebox.showinfo("Percentile", f"{user_name}: {score}/{total} is not graded against a set.")
+                return
+            messagebox.showinfo("Percentile", f"{user_name} - {set_name}\nScore: {score}/{total}\n"
+                                              f"Percentile rank: {rank:.0f}\n(share of attempts on this set that scored lower, "
+                                              "counting half of those within the same 1% of the score)")
+
+        # Refresh / lookup buttons
+        btns = tk.Frame(frame, bg=BG)
+        btns.pack(anchor="ne", padx=24, pady=(0,8))
+        simple_button(btns, "📊  Percentile", command=show_percentile).pack(side="left", padx=4)
+        simple_button(btns, "🔎  Look Up Result Code", command=lookup_code).pack(side="left", padx=4)
+        simple_button(btns, "🔁  Refresh Results", command=load_results).pack(side="left", padx=4)
 
         load_results()
 
+    # ---------------------------
+    # Page: Exam Monitor (live attempts)
+    # ---------------------------
+    def page_exam_monitor(self, frame):
+        frame.configure(bg=BG)
+        header = tk.Frame(frame, bg=HDR_BG, padx=12, pady=8)
+        header.pack(fill="x", padx=16, pady=(16,8))
+        tk.Label(header, text="🛰 Exam Monitor", font=self.header_font, bg=HDR_BG).pack(anchor="w")
+
+        count_lbl = tk.Label(frame, text="Active examinees: -", font=self.default_font, bg=BG)
+        count_lbl.pack(anchor="w", padx=20)
+
+        table_frame = tk.Frame(frame, bg=BG)
+        table_frame.pack(fill="both", expand=True, padx=20, pady=10)
+
+        cols = ("User", "Set", "Question", "Elapsed", "Last Seen")
+        tree = ttk.Treeview(table_frame, columns=cols, show="headings", height=20)
+        tree.column("User", width=160, anchor="w", stretch=True)
+        tree.column("Set", width=240, anchor="w", stretch=True)
+        tree.column("Question", width=90, anchor="center", stretch=False)
+        tree.column("Elapsed", width=90, anchor="center", stretch=False)
+        tree.column("Last Seen", width=90, anchor="center", stretch=False)
+        for c in cols:
+            tree.heading(c, text=c)
+        tree.pack(fill="both", expand=True, side="left")
+
+        scrollbar = ttk.Scrollbar(table_frame, orient="vertical", command=tree.yview)
+        tree.configure(yscroll=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+
+        def fmt_secs(secs):
+            secs = max(int(secs or 0), 0)
+            return f"{secs // 60:02d}:{secs % 60:02d}"
+
+        def refresh():
+            if not tree.winfo_exists():
+                return  # page was switched; stop the loop
+            try:
+                with Database() as db:
+                    rows = active_attempts(db)
+            except DB_ERRORS as e:
+                rows = None
+                count_lbl.config(text=f"Database error: {e}")
+            if rows is not None:
+                tree.delete(*tree.get_children())
+                for user, set_name, idx, total, elapsed, idle in rows:
+                    tree.insert("", "end", values=(
+                        user, set_name or "(deleted set)", f"{(idx or 0) + 1}/{total}",
+                        fmt_secs(elapsed), f"{fmt_secs(idle)} ago"
+                    ))
+                count_lbl.config(text=f"Active examinees: {len(rows)}")
+            tree.after(MONITOR_REFRESH_MS, refresh)
+
+        refresh()
+
+    # ---------------------------
+    # Page: Certificates (certificates.py)
+    # ---------------------------
+    def page_certificates(self, frame):
+        frame.configure(bg=BG)
+        header = tk.Frame(frame, bg=HDR_BG, padx=12, pady=8)
+        header.pack(fill="x", padx=16, pady=(16,8))
+        tk.Label(header, text="🎓 Certificates", font=self.header_font, bg=HDR_BG).pack(anchor="w")
+
+        try:
+            with Database() as db:
+                sets = exam_db.list_sets(db)
+        except DB_ERRORS as e:
+            messagebox.showerror("Database Error", str(e))
+            sets = []
+        set_labels = [f"{set_id} - {name}" for set_id, name in sets]
+
+        form = tk.Frame(frame, bg=BG)
+        form.pack(fill="x", padx=20, pady=6)
+        set_var = tk.StringVar(value=set_labels[0] if set_labels else "")
+        day_var = tk.StringVar(value=date.today().isoformat())
+        pass_var = tk.StringVar(value=f"{CERT_PASS_PERCENT:g}")
+        format_var = tk.StringVar(value=CERT_FORMAT)
+        out_var = tk.StringVar(value=os.path.abspath(CERT_OUT_DIR))
+
+        tk.Label(form, text="Set:", font=self.default_font, bg=BG).grid(row=0, column=0, sticky="w")
+        ttk.Combobox(form, textvariable=set_var, values=set_labels, state="readonly",
+                     width=46).grid(row=0, column=1, sticky="w", padx=8, pady=6)
+        tk.Label(form, text="Day (blank = all):", font=self.default_font, bg=BG).grid(row=1, column=0, sticky="w")
+        day_row = tk.Frame(form, bg=BG)
+        day_row.grid(row=1, column=1, sticky="w", padx=8, pady=6)
+        tk.Entry(day_row, textvariable=day_var, font=self.default_font, width=12).pack(side="left")
+        tk.Label(day_row, text="  Pass mark (%):", font=self.default_font, bg=BG).pack(side="left")
+        tk.Entry(day_row, textvariable=pass_var, font=self.default_font, width=6).pack(side="left")
+        tk.Label(day_row, text="  Format:", font=self.default_font, bg=BG).pack(side="left")
+        ttk.Combobox(day_row, textvariable=format_var, values=CERT_FORMATS, state="readonly",
+                     width=6).pack(side="left")
+        tk.Label(form, text="Output folder:", font=self.default_font, bg=BG).grid(row=2, column=0, sticky="w")
+        out_row = tk.Frame(form, bg=BG)
+        out_row.grid(row=2, column=1, sticky="w", padx=8, pady=6)
+        tk.Entry(out_row, textvariable=out_var, font=self.default_font, width=48).pack(side="left")
+        simple_button(out_row, "Browse…", command=lambda: out_var.set(
+            filedialog.askdirectory(initialdir=out_var.get()) or out_var.get())).pack(side="left", padx=6)
+
+        bar = ttk.Progressbar(frame, maximum=1.0, length=600)
+        bar.pack(anchor="w", padx=20, pady=(12,2))
+        status = tk.Label(frame, text="Runs resume where they stopped; existing certificates are kept.",
+                          font=self.default_font, bg=BG)
+        status.pack(anchor="w", padx=20)
+
+        def track():
+            job = self.cert_job
+            if job is None or not bar.winfo_exists():
+                return
+            bar["value"] = job.fraction()
+            if job.is_alive():
+                status.config(text=f"Rendering… {job.written} new, {job.skipped} already done"
+                                   f" of {job.total if job.total is not None else '?'}")
+                bar.after(200, track)
+                return
+            self.cert_job = None
+            if job.error:
+                status.config(text=f"Stopped: {job.error}")
+            else:
+                status.config(text=f"Done: {job.written} new, {job.skipped} already there.")
+
+        def start():
+            if self.cert_job is not None:
+                messagebox.showinfo("Certificates", "Certificates are already being generated.")
+                return
+            if not set_var.get():
+                messagebox.showinfo("Select Set", "Select a set first.")
+                return
+            try:
+                set_id = int(set_var.get().split(" - ", 1)[0])
+                day = date.fromisoformat(day_var.get().strip()) if day_var.get().strip() else None
+                pass_percent = float(pass_var.get())
+            except ValueError:
+                messagebox.showwarning("Input required", "Day must be YYYY-MM-DD and the pass mark a number.")
+                return
+            self.cert_job = CertificateJob(set_id, out_var.get(), day, pass_percent, format_var.get())
+            self.cert_job.start()
+            track()
+
+        def stop():
+            if self.cert_job is not None:
+                self.cert_job.stop()
+                status.config(text="Stopping after the current batch…")
+
+        btns = tk.Frame(frame, bg=BG)
+        btns.pack(anchor="w", padx=20, pady=8)
+        simple_button(btns, "▶  Generate", command=start).pack(side="left", padx=4)
+        simple_button(btns, "⏹  Stop", command=stop).pack(side="left", padx=4)
+        track()  # a run started earlier keeps reporting here
+
+    # ---------------------------
+    # Page: Trends (reads only the rollup tables, see rollups.py)
+    # ---------------------------
+    def page_trends(self, frame):
+        frame.configure(bg=BG)
+        header = tk.Frame(frame, bg=HDR_BG, padx=12, pady=8)
+        header.pack(fill="x", padx=16, pady=(16,8))
+        tk.Label(header, text="📈 Trends", font=self.header_font, bg=HDR_BG).pack(anchor="w")
+
+        try:
+            with Database() as db:
+                sets = exam_db.list_sets(db)
+        except DB_ERRORS as e:
+            messagebox.showerror("Database Error", str(e))
+            sets = []
+        set_labels = ["All sets"] + [f"{set_id} - {name}" for set_id, name in sets]
+
+        form = tk.Frame(frame, bg=BG)
+        form.pack(fill="x", padx=20, pady=6)
+        set_var = tk.StringVar(value=set_labels[0])
+        period_var = tk.StringVar(value="Weekly")
+        tk.Label(form, text="Set:", font=self.default_font, bg=BG).pack(side="left")
+        set_box = ttk.Combobox(form, textvariable=set_var, values=set_labels, state="readonly", width=40)
+        set_box.pack(side="left", padx=8)
+        period_box = ttk.Combobox(form, textvariable=period_var, values=("Daily", "Weekly"),
+                                  state="readonly", width=8)
+        period_box.pack(side="left", padx=8)
+
+        canvas = tk.Canvas(frame, bg=PANEL_BG, highlightthickness=1, highlightbackground=BORDER, height=320)
+        canvas.pack(fill="both", expand=True, padx=20, pady=8)
+        status = tk.Label(frame, text="", font=self.default_font, bg=BG)
+        status.pack(anchor="w", padx=20)
+        points = []
+
+        def draw(event=None):
+            canvas.delete("all")
+            w, h = canvas.winfo_width(), canvas.winfo_height()
+            left, right, top, bottom = 48, w - 48, 16, h - 36
+            if not points:
+                canvas.create_text(w // 2, h // 2, text="No rolled-up results yet.", fill=TEXT)
+                return
+            canvas.create_line(left, bottom, right, bottom, fill=BORDER)
+            for pct in (0, 50, 100):
+                y = bottom - (bottom - top) * pct / 100
+                canvas.create_line(left, y, right, y, fill="#E0E0E0", dash=(2, 2))
+                canvas.create_text(left - 6, y, text=f"{pct}%", anchor="e", fill=TEXT)
+            most = max(n for _, n, _ in points) or 1
+            canvas.create_text(right + 6, top, text=str(most), anchor="w", fill="#808080")
+            step = (right - left) / len(points)
+            label_every = max(1, len(points) // 8)
+            line = []
+            for i, (start, n, avg) in enumerate(points):
+                x0 = left + i * step
+                bar_h = (bottom - top) * n / most
+                canvas.create_rectangle(x0 + step * 0.2, bottom - bar_h, x0 + step * 0.8, bottom,
+                                        fill="#D0D0D0", outline="")
+                if avg is not None:
+                    line.append((x0 + step / 2, bottom - (bottom - top) * float(avg) / 100))
+                if i % label_every == 0:
+                    canvas.create_text(x0 + step / 2, bottom + 12, text=str(start)[5:10], fill=TEXT)
+            if len(line) > 1:
+                canvas.create_line(*[c for p in line for c in p], fill=TEXT, width=2)
+            for x, y in line:
+                canvas.create_oval(x - 3, y - 3, x + 3, y + 3, fill=TEXT, outline="")
+            canvas.create_text(right, h - 10, anchor="e", fill="#808080",
+                               text="line: average score · bars: attempts")
+
+        def load(*_):
+            set_id = None if set_var.get() == "All sets" else int(set_var.get().split(" - ", 1)[0])
+            period = "d" if period_var.get() == "Daily" else "w"
+            try:
+                with Database() as db:
+                    points[:] = rollups.set_trend(db, set_id, period, 60 if period == "d" else 26)
+                    state = rollups.rollup_status(db)
+            except DB_ERRORS as e:
+                messagebox.showerror("Database Error", str(e))
+                return
+            when = state[2] if state and state[2] else "never"
+            status.config(text=f"Rollups updated: {when}")
+            draw()
+
+        def refresh_now():
+            if self.scheduler is None or not self.scheduler.run_now("rollups"):
+                messagebox.showinfo("Trends", "Rollups are disabled ([rollups] enabled = 0).")
+                return
+            job = self.scheduler.job("rollups")
+            started = job.last_run
+            status.config(text="Rolling up new results…")
+
+            def wait():
+                if not canvas.winfo_exists():
+                    return
+                if job.last_run == started or job.running:
+                    canvas.after(300, wait)
+                elif job.last_error:
+                    status.config(text=f"Rollup failed: {job.last_error}")
+                else:
+                    load()
+            wait()
+
+        set_box.bind("<<ComboboxSelected>>", load)
+        period_box.bind("<<ComboboxSelected>>", load)
+        canvas.bind("<Configure>", draw)
+        simple_button(form, "⟳  Refresh now", command=refresh_now).pack(side="left", padx=8)
+        load()
+
+    # ---------------------------
+    # Page: Query Stats (hidden, Ctrl+Shift+Q)
+    # ---------------------------
+    def page_query_stats(self, frame):
+        frame.configure(bg=BG)
+        header = tk.Frame(frame, bg=HDR_BG, padx=12, pady=8)
+        header.pack(fill="x", padx=16, pady=(16,8))
+        tk.Label(header, text="⏱ Query Latency", font=self.header_font, bg=HDR_BG).pack(anchor="w")
+
+        connect_lbl = tk.Label(frame, text="", font=self.default_font, bg=BG)
+        connect_lbl.pack(anchor="w", padx=20)
+
+        cols = ("Query", "Calls", "Rows", "p50 ms", "p95 ms", "p99 ms", "Max ms", "Exec ms", "Fetch ms")
+        tree = ttk.Treeview(frame, columns=cols, show="headings", height=11)
+        tree.column("Query", width=250, anchor="w", stretch=True)
+        for c in cols[1:]:
+            tree.column(c, width=56, anchor="center", stretch=False)
+        for c in cols:
+            tree.heading(c, text=c)
+        tree.pack(fill="both", expand=True, padx=20, pady=(6,4))
+        self.make_treeview_sortable(tree)
+
+        tk.Label(frame, text=f"Slow queries (≥ {query_stats.SLOW_QUERY_MS:g} ms)",
+                 font=self.default_font, bg=BG).pack(anchor="w", padx=20)
+        slow_cols = ("Time", "Page", "ms", "Rows", "Query")
+        slow_tree = ttk.Treeview(frame, columns=slow_cols, show="headings", height=6)
+        slow_tree.column("Time", width=130, anchor="w", stretch=False)
+        slow_tree.column("Page", width=170, anchor="w", stretch=False)
+        slow_tree.column("ms", width=60, anchor="center", stretch=False)
+        slow_tree.column("Rows", width=50, anchor="center", stretch=False)
+        slow_tree.column("Query", width=300, anchor="w", stretch=True)
+        for c in slow_cols:
+            slow_tree.heading(c, text=c)
+        slow_tree.pack(fill="x", padx=20, pady=(4,4))
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            for fp, calls, rows, p50, p95, p99, mx, _total, ex, fe in query_stats.stats.snapshot():
+                tree.insert("", "end", values=(
+                    fp, calls, rows, f"{p50:.2f}", f"{p95:.2f}", f"{p99:.2f}",
+                    f"{mx:.2f}", f"{ex:.2f}", f"{fe:.2f}"
+                ))
+            slow_tree.delete(*slow_tree.get_children())
+            for entry in query_stats.stats.recent_slow():
+                slow_tree.insert("", "end", values=entry)
+            n, p50, p95, p99, mx = query_stats.stats.connect_summary()
+            state = "" if query_stats.ENABLED else "  (instrumentation disabled)"
+            connect_lbl.config(text=f"Connect / pool acquire: {n} calls, p50 {p50:.2f} ms, "
+                                    f"p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {mx:.2f} ms{state}")
+
+        def reset():
+            query_stats.stats.reset()
+            refresh()
+
+        btns = tk.Frame(frame, bg=BG)
+        btns.pack(anchor="ne", padx=20, pady=(0,8))
+        simple_button(btns, "🔁  Refresh", command=refresh).pack(side="left", padx=4)
+        simple_button(btns, "🧹  Reset", command=reset).pack(side="left", padx=4)
+
+        refresh()
+
 # ---------------------------
 # Run
 # ---------------------------
 if __name__ == "__main__":
+    profiler = ui_profiler.from_config()  # opt-in, must hook Tk before widgets exist
     app = ExamAdminApp()
+    if profiler:
+        profiler.attach(app, app)
     try:
         app.mainloop()
     except Exception:
@@ -0,0 +1,272 @@
+"""
+E-XAM attempts (timed exams)
+- `attempts`: one row per quiz attempt with server-side started_at / deadline
+- sets.time_limit_sec (whole set) and sets.question_time_sec (each question);
+  NULL means no limit
+- Deadlines are computed with the database clock, clients only count down
+  (db.dialect supplies NOW() / interval arithmetic for MySQL and SQLite)
+- sweep_expired() finalizes overdue attempts in batches through the
+  (status, deadline) index, never scanning finished attempts
+- Checkpoints (current_index, score, answers) are written by a coalescing
+  CheckpointWriter so a crashed client can resume the attempt
+- An attempt pins the set version it started on (attempts.set_version), so
+  edits made meanwhile never change its questions or grading
+- Per-question limits are enforced on the attempt record too: it keeps the
+  limit (attempts.question_time) and when the current question started
+  (question_started_at, DB clock); mark_late() rules answers that arrive
+  after limit + grace late, and late answers are stored as None (scored 0)
+
+Table DDL lives in exam_db.create_tables(). No tkinter import here.
+"""
+import json
+import time
+
+import exam_config
+from change_feed import record_change
+from exam_db import insert_results, next_version
+from exam_monitor import clear_progress
+
+FINISH_GRACE = exam_config.getint("attempts", "finish_grace")  # seconds a late submit is still accepted
+SWEEP_BATCH = exam_config.getint("attempts", "sweep_batch")    # attempts finalized per sweep round
+CHECKPOINT_EVERY_N = exam_config.getint("attempts", "checkpoint_every_n")  # answers between checkpoint writes
+CHECKPOINT_EVERY_S = exam_config.getint("attempts", "checkpoint_every_s")  # ...or seconds, whichever comes first
+
+
+# ---------------------------
+# Limits
+# ---------------------------
+def get_time_limits(db, set_id):
+    """(time_limit_sec, question_time_sec) for a set; None = unlimited."""
+    db.cursor.execute(
+        "SELECT time_limit_sec, question_time_sec FROM sets WHERE set_id=%s", (set_id,)
+    )
+    row = db.cursor.fetchone()
+    return (row[0], row[1]) if row else (None, None)
+
+
+def set_time_limits(db, set_id, time_limit_sec, question_time_sec):
+    """Limits are part of a set version (cached per version), so this opens a new one."""
+    next_version(db, set_id)
+    db.cursor.execute(
+        "UPDATE sets SET time_limit_sec=%s, question_time_sec=%s WHERE set_id=%s",
+        (time_limit_sec or None, question_time_sec or None, set_id)
+    )
+    record_change(db, "sets", set_id, "update")
+
+
+# ---------------------------
+# Attempt lifecycle
+# ---------------------------
+def start_attempt(db, user_name, set_id, total, set_version=None):
+    """Open an attempt pinned to `set_version`; returns (attempt_id, remaining_sec or None).
+
+    Any older active attempt of the same user is closed first so a user never
+    holds two clocks at once.
+    """
+    now = db.dialect.now
+    db.cursor.execute(
+        f"UPDATE attempts SET status='abandoned', finished_at={now} "
+        "WHERE user_name=%s AND status='active'",
+        (user_name,)
+    )
+    time_limit, question_time = get_time_limits(db, set_id)
+    db.cursor.execute(f"""
+        INSERT INTO attempts (user_name, set_id, status, started_at, deadline, total, set_version,
+                              question_time, question_started_at)
+        VALUES (%s, %s, 'active', {now}, {db.dialect.add_seconds(now)}, %s, %s, %s, {now})
+    """, (user_name, set_id, time_limit, total, set_version, question_time))
+    attempt_id = db.cursor.lastrowid
+    return attempt_id, remaining_seconds(db, attempt_id)
+
+
+def remaining_seconds(db, attempt_id):
+    """Seconds until the deadline by the DB clock (None when untimed)."""
+    db.cursor.execute(
+        f"SELECT {db.dialect.seconds_between(db.dialect.now, 'deadline')} "
+        "FROM attempts WHERE attempt_id=%s",
+        (attempt_id,)
+    )
+    row = db.cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    return max(int(row[0]), 0)
+
+
+def finish_attempt(db, attempt_id, score, total, grace=FINISH_GRACE):
+    """Close an active attempt if it is still within its deadline (+grace).
+
+    Returns True when accepted; False means the server already expired it
+    (or it is too late) and the caller must not store a result.
+    """
+    now = db.dialect.now
+    db.cursor.execute(f"""
+        UPDATE attempts SET status='finished', finished_at={now}, score=%s, total=%s
+        WHERE attempt_id=%s AND status='active'
+          AND (deadline IS NULL OR {now} <= {db.dialect.add_seconds('deadline')})
+    """, (score, total, attempt_id, grace))
+    return db.cursor.rowcount == 1
+
+
+def abandon_attempt(db, attempt_id):
+    db.cursor.execute(
+        f"UPDATE attempts SET status='abandoned', finished_at={db.dialect.now} "
+        "WHERE attempt_id=%s AND status='active'",
+        (attempt_id,)
+    )
+
+
+# ---------------------------
+# Per-question limits
+# ---------------------------
+def mark_late(db, attempt_id, index, grace=FINISH_GRACE):
+    """Rule on the answers up to `index`; returns every late question index so far.
+
+    The question at current_index has been open since question_started_at.
+    When k answers arrive at once (coalesced checkpoints, a resume) they may
+    use k limits together; past that (+grace) all k are late. Moving on
+    restarts the clock. No-op for attempts without a per-question limit.
+    """
+    d = db.dialect
+    db.cursor.execute(f"""
+        SELECT current_index, question_time, {d.seconds_between('question_started_at', d.now)}, late
+        FROM attempts WHERE attempt_id=%s AND status='active'
+        {d.for_update}
+    """, (attempt_id,))
+    row = db.cursor.fetchone()
+    if row is None:
+        return []
+    current, question_time, elapsed, late_json = row
+    late = json.loads(late_json) if late_json else []
+    if not question_time or index <= current:
+        return late
+    if elapsed is not None and elapsed > (index - current) * question_time + grace:
+        late += range(current, index)
+    db.cursor.execute(
+        f"UPDATE attempts SET current_index=%s, question_started_at={d.now}, late=%s WHERE attempt_id=%s",
+        (index, json.dumps(late), attempt_id)
+    )
+    return late
+
+
+def drop_late(answers, late):
+    """answers with the late ones replaced by None (graded wrong)."""
+    late = set(late)
+    return [None if i in late else a for i, a in enumerate(answers)]
+
+
+# ---------------------------
+# Checkpoints / resume
+# ---------------------------
+def save_checkpoint(db, attempt_id, current_index, score, answers):
+    db.cursor.execute(
+        "UPDATE attempts SET current_index=%s, score=%s, answers=%s "
+        "WHERE attempt_id=%s AND status='active'",
+        (current_index, score, json.dumps(answers), attempt_id)
+    )
+
+
+def get_attempt(db, attempt_id):
+    """(user_name, set_id, status, set_version) or None."""
+    db.cursor.execute(
+        "SELECT user_name, set_id, status, set_version FROM attempts WHERE attempt_id=%s", (attempt_id,)
+    )
+    return db.cursor.fetchone()
+
+
+def find_resumable(db, user_name):
+    """The user's unfinished, unexpired attempt or None.
+
+    Returns (attempt_id, set_id, set_name, current_index, score, answers,
+    remaining_sec or None, set_version or None, question_remaining_sec or None);
+    the last one is what is left of the current question's limit.
+    """
+    now = db.dialect.now
+    db.cursor.execute(f"""
+        SELECT a.attempt_id, a.set_id, s.set_name, a.current_index, a.score, a.answers,
+               {db.dialect.seconds_between(now, 'a.deadline')}, a.set_version,
+               a.question_time - {db.dialect.seconds_between('a.question_started_at', now)}
+        FROM attempts a
+        JOIN sets s ON a.set_id = s.set_id
+        WHERE a.user_name=%s AND a.status='active'
+          AND (a.deadline IS NULL OR a.deadline > {now})
+        ORDER BY a.attempt_id DESC
+        LIMIT 1
+    """, (user_name,))
+    row = db.cursor.fetchone()
+    if not row:
+        return None
+    answers = json.loads(row[5]) if row[5] else []
+    remaining = None if row[6] is None else max(int(row[6]), 0)
+    question_remaining = None if row[8] is None else max(int(row[8]), 0)
+    return row[0], row[1], row[2], row[3], row[4], answers, remaining, row[7], question_remaining
+
+
+class CheckpointWriter:
+    """Coalesces per-answer state; due() after N answers or T seconds.
+
+    Sets with a per-question limit pass every_n=1, so each answer reaches
+    mark_late() while its question's clock is still the current one.
+    """
+
+    def __init__(self, attempt_id, every_n=CHECKPOINT_EVERY_N, every_s=CHECKPOINT_EVERY_S):
+        self.attempt_id = attempt_id
+        self.every_n = every_n
+        self.every_s = every_s
+        self.state = None
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+
+    def note(self, current_index, score, answers):
+        self.state = (current_index, score, list(answers))
+        self.unsaved += 1
+
+    def due(self):
+        if not self.unsaved:
+            return False
+        return self.unsaved >= self.every_n or time.monotonic() - self.saved_at >= self.every_s
+
+    def flush(self, db):
+        if not self.unsaved:
+            return False
+        save_checkpoint(db, self.attempt_id, *self.state)
+        self.mark_saved()
+        return True
+
+    def mark_saved(self):
+        self.unsaved = 0
+        self.saved_at = time.monotonic()
+
+
+# ---------------------------
+# Expiry sweeper
+# ---------------------------
+def sweep_expired(db, batch=SWEEP_BATCH, grace=FINISH_GRACE):
+    """Finalize up to `batch` overdue attempts; returns how many were closed.
+
+    Each expired attempt gets a results row with the last score the server
+    knows about. Call repeatedly (e.g. from an after() loop) until it returns
+    less than `batch`.
+    """
+    db.cursor.execute(f"""
+        SELECT attempt_id, user_name, set_id, score, total, deadline, set_version
+        FROM attempts
+        WHERE status='active' AND deadline < {db.dialect.add_seconds(db.dialect.now, '-')}
+        ORDER BY deadline
+        LIMIT %s
+        {db.dialect.for_update}
+    """, (grace, batch))
+    rows = db.cursor.fetchall()
+    if not rows:
+        return 0
+
+    ids = [r[0] for r in rows]
+    placeholders = ", ".join(["%s"] * len(ids))
+    db.cursor.execute(
+        f"UPDATE attempts SET status='expired', finished_at=deadline "
+        f"WHERE status='active' AND attempt_id IN ({placeholders})",
+        tuple(ids)
+    )
+    insert_results(db, [(r[1], r[2], r[3], r[4], r[5], r[6]) for r in rows])
+    for r in rows:
+        clear_progress(db, r[1])
+    return len(rows)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+E-XAM benchmark suite (headless, no tkinter)
+- Data generator: N sets x M questions, U users, R results (deterministic seed)
+- Timed scenarios: the DB work behind the admin data paths
+    page_dashboard         count_sets + count_result_users + set_averages
+    load_results           newest results page (admin results table)
+    load_questions_for_set questions of one set (manage sets page)
+    save_set_gui           insert a set + its questions in one transaction
+- Results go to JSON (timings + scale + backend + git revision); --compare
+  prints the ratio against an earlier JSON file
+
+Runs against a throwaway SQLite file by default; --backend mysql uses the
+configured MySQL database (generated rows are prefixed "bench_").
+
+Usage:
+    python bench.py --sets 50 --questions 40 --users 2000 --results 50000 --out bench.json
+    python bench.py --compare bench_before.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import exam_config
+import exam_db
+import exam_services
+from exam_db import Database, create_tables
+from question_types import pack_options, unpack_options, answer_label
+
+BENCH_PREFIX = "bench_"
+
+
+# ---------------------------
+# Data generator
+# ---------------------------
+def generate(sets, questions, users, results, seed=1, chunk=5000):
+    """Fill the database; returns the generated set ids."""
+    rng = random.Random(seed)
+    set_ids = []
+    with Database() as db:
+        for i in range(sets):
+            set_id = exam_db.insert_set(db, f"{BENCH_PREFIX}set_{i}", datetime.now())
+            exam_db.insert_questions(db, set_id, question_rows(rng, questions, i))
+            set_ids.append(set_id)
+        for u in range(users):
+            exam_db.insert_user(db, f"{BENCH_PREFIX}user_{u}", f"{u % 10000:04d}")
+
+    start = datetime.now() - timedelta(days=365)
+    for offset in range(0, results, chunk):
+        rows = []
+        for _ in range(min(chunk, results - offset)):
+            total = questions or 1
+            rows.append((f"{BENCH_PREFIX}user_{rng.randrange(max(users, 1))}", rng.choice(set_ids),
+                         rng.randint(0, total), total,
+                         start + timedelta(seconds=rng.randrange(365 * 86400))))
+        with Database() as db:
+            exam_db.insert_results(db, rows)
+    return set_ids
+
+
+def question_rows(rng, count, set_index):
+    rows = []
+    for q in range(count):
+        if q % 3 == 0:
+            rows.append((f"Set {set_index} question {q}: type the answer", f"answer {q}", "text", None, 0))
+        else:
+            options = [f"Option {k} for question {q}" for k in range(4)]
+            mask = 1 << rng.randrange(4)
+            rows.append((f"Set {set_index} question {q}: pick one", answer_label(options, mask),
+                         "mc", pack_options(options), mask))
+    return rows
+
+
+# ---------------------------
+# Scenarios (the exam_services calls the admin pages make, minus the widgets)
+# ---------------------------
+def scenario_page_dashboard(ctx):
+    _, _, averages = exam_services.dashboard_stats()
+    return [exam_services.format_average(avg) for _, _, avg in averages]
+
+
+def scenario_load_results(ctx):
+    return exam_services.recent_results(ctx["page_size"])
+
+
+def scenario_load_questions_for_set(ctx):
+    set_id = ctx["rng"].choice(ctx["set_ids"])
+    return {q[0]: q[1:] for q in exam_services.set_questions(set_id)}
+
+
+def scenario_user_history_page(ctx):
+    user_name = f"{BENCH_PREFIX}user_{ctx['rng'].randrange(max(ctx['users'], 1))}"
+    return exam_services.history_page(user_name), exam_services.history_summary(user_name)
+
+
+def scenario_save_set_gui(ctx):
+    ctx["saved"] += 1
+    name = f"{BENCH_PREFIX}saved_{os.getpid()}_{ctx['saved']}"
+    ctx["cleanup"].append(exam_services.create_set(name, ctx["new_questions"]))
+
+
+SCENARIOS = {
+    "page_dashboard": scenario_page_dashboard,
+    "load_results": scenario_load_results,
+    "load_questions_for_set": scenario_load_questions_for_set,
+    "user_history_page": scenario_user_history_page,
+    "save_set_gui": scenario_save_set_gui,
+}
+
+
+def time_scenario(func, ctx, repeat, warmup):
+    for _ in range(warmup):
+        func(ctx)
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(ctx)
+        samples.append(time.perf_counter() - t0)
+    samples.sort()
+    return {
+        "repeat": repeat,
+        "min_ms": samples[0] * 1000,
+        "median_ms": statistics.median(samples) * 1000,
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p95_ms": samples[min(int(0.95 * (len(samples) - 1) + 0.5), len(samples) - 1)] * 1000,
+        "max_ms": samples[-1] * 1000,
+    }
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def run(args):
+    tmpdir = None
+    if args.backend == "sqlite":
+        path = args.db_path
+        if not path:
+            tmpdir = tempfile.mkdtemp(prefix="exam_bench_")
+            path = os.path.join(tmpdir, "bench.db")
+        exam_db.use_backend("sqlite", path)
+    else:
+        exam_db.use_backend(args.backend)
+    create_tables()
+
+    t0 = time.perf_counter()
+    set_ids = generate(args.sets, args.questions, args.users, args.results, args.seed)
+    generate_s = time.perf_counter() - t0
+
+    ctx = {
+        "rng": random.Random(args.seed),
+        "set_ids": set_ids,
+        "page_size": args.page_size,
+        "users": args.users,
+        # save_set_gui's questions_list shape: (text, qtype, options, mask, answer)
+        "new_questions": [(q, qtype, unpack_options(packed), mask, a)
+                          for q, a, qtype, packed, mask in question_rows(random.Random(args.seed), args.questions, -1)],
+        "saved": 0,
+        "cleanup": [],
+    }
+    names = args.only or list(SCENARIOS)
+    timings = {name: time_scenario(SCENARIOS[name], ctx, args.repeat, args.warmup) for name in names}
+
+    if args.backend != "sqlite" or args.db_path:
+        cleanup(set_ids + ctx["cleanup"])
+    exam_db.get_pool().close_all()
+    if tmpdir:
+        for name in os.listdir(tmpdir):
+            os.remove(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+    return {
+        "when": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "scale": {"sets": args.sets, "questions": args.questions, "users": args.users,
+                  "results": args.results, "page_size": args.page_size},
+        "generate_s": generate_s,
+        "scenarios": timings,
+    }
+
+
+def cleanup(set_ids):
+    """Remove generated rows from a persistent database."""
+    with Database() as db:
+        db.cursor.execute("DELETE FROM results WHERE user_name LIKE %s", (BENCH_PREFIX + "%",))
+        db.cursor.execute("DELETE FROM results_archive WHERE user_name LIKE %s", (BENCH_PREFIX + "%",))
+        db.cursor.execute("DELETE FROM user_summary WHERE user_name LIKE %s", (BENCH_PREFIX + "%",))
+        db.cursor.execute("DELETE FROM rollup_user WHERE user_name LIKE %s", (BENCH_PREFIX + "%",))
+        for set_id in set_ids:  # hard delete: exam_db.delete_set() only hides a set
+            db.cursor.execute("DELETE FROM sets WHERE set_id=%s", (set_id,))
+            db.cursor.execute("DELETE FROM results_archive_totals WHERE set_id=%s", (set_id,))
+            db.cursor.execute("DELETE FROM rollup_set WHERE set_id=%s", (set_id,))
+            db.cursor.execute("DELETE FROM score_sketch WHERE set_id=%s", (set_id,))
+        db.cursor.execute("DELETE FROM users WHERE user_name LIKE %s", (BENCH_PREFIX + "%",))
+
+
+def print_report(report, baseline=None):
+    scale = report["scale"]
+    print(f"E-XAM bench @ {report['revision'] or '?'} ({report['backend']}): "
+          f"{scale['sets']} sets x {scale['questions']} questions, {scale['users']} users, "
+          f"{scale['results']} results  (generated in {report['generate_s']:.1f}s)")
+    header = f"{'scenario':<24}{'median ms':>11}{'p95 ms':>10}{'min ms':>10}"
+    if baseline:
+        header += f"{'vs base':>10}"
+    print(header)
+    for name, t in report["scenarios"].items():
+        line = f"{name:<24}{t['median_ms']:>11.2f}{t['p95_ms']:>10.2f}{t['min_ms']:>10.2f}"
+        base = (baseline or {}).get("scenarios", {}).get(name)
+        if base and base["median_ms"]:
+            line += f"{t['median_ms'] / base['median_ms']:>9.2f}x"
+        print(line)
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Benchmark E-XAM admin data paths.")
+    p.add_argument("--sets", type=int, default=50)
+    p.add_argument("--questions", type=int, default=40, help="questions per set")
+    p.add_argument("--users", type=int, default=2000)
+    p.add_argument("--results", type=int, default=50000)
+    p.add_argument("--page-size", type=int, default=exam_config.getint("admin", "results_page_size"))
+    p.add_argument("--repeat", type=int, default=30)
+    p.add_argument("--warmup", type=int, default=3)
+    p.add_argument("--seed", type=int, default=1)
+    p.add_argument("--only", nargs="*", choices=sorted(SCENARIOS), help="run only these scenarios")
+    p.add_argument("--backend", choices=sorted(exam_db.BACKENDS), default="sqlite")
+    p.add_argument("--db-path", help="SQLite file to keep (default: temporary)")
+    p.add_argument("--out", help="write the JSON report here")
+    p.add_argument("--compare", help="earlier JSON report to compare medians against")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    report = run(args)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
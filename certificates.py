@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+E-XAM certificates (batch per-examinee HTML / PDF)
+- Qualifying results: one set (optionally one day), score >= [certificates]
+  pass_percent, examinee still registered in `users`; one certificate per
+  examinee (their first passing result)
+- Streams results in result_id order, [certificates] batch rows per read,
+  so memory stays bounded however large the session is
+- Rendering runs on a ProcessPoolExecutor ([certificates] workers, 0 = one
+  per CPU); each file is written to a temp name and renamed, so a crash
+  never leaves a half-written certificate
+- Resumable: after every batch the last result_id is saved in
+  <out>/.certificates_resume and existing files are skipped, so re-running
+  the same command continues where it stopped
+- PDF needs the optional `reportlab` package; HTML needs nothing. The signed
+  result code (result_qr.py) is printed on each certificate
+
+CertificateJob runs it in a background thread for the admin page. No tkinter
+import here.
+
+    python certificates.py --set 12 --day 2026-10-19 --out certs_oct19
+    python certificates.py --set 12 --format pdf --pass 80
+"""
+import argparse
+import base64
+import hashlib
+import html
+import json
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import date, datetime, timedelta
+
+import exam_config
+from exam_db import Database, DB_ERRORS, create_tables
+from result_qr import make_token, qr_png, qr_text
+
+try:
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.pdfgen import canvas
+except ImportError:  # HTML certificates only
+    canvas = None
+
+CERT_PASS_PERCENT = exam_config.getfloat("certificates", "pass_percent")
+CERT_BATCH = exam_config.getint("certificates", "batch")      # results read per query
+CERT_WORKERS = exam_config.getint("certificates", "workers")  # render processes (0 = one per CPU)
+CERT_OUT_DIR = exam_config.get("certificates", "out_dir")
+CERT_FORMAT = exam_config.get("certificates", "format")       # html | pdf
+CERT_TITLE = exam_config.get("certificates", "title")
+CERT_ISSUER = exam_config.get("certificates", "issuer")
+
+CERT_FORMATS = ("html", "pdf")
+RESUME_FILE = ".certificates_resume"
+
+
+# ---------------------------
+# Source rows
+# ---------------------------
+def qualifying_batch(db, set_id, after_id=0, day=None, pass_percent=CERT_PASS_PERCENT, batch=CERT_BATCH):
+    """Next `batch` passing results of a set after `after_id`:
+    (result_id, user_name, set_name, score, total, date_taken)."""
+    sql = """
+        SELECT r.result_id, r.user_name, r.set_name, r.score, r.total, r.date_taken
+        FROM results r JOIN users u ON u.user_name = r.user_name
+        WHERE r.set_id = %s AND r.result_id > %s AND r.total > 0 AND r.score * 100 >= %s * r.total
+    """
+    params = [set_id, after_id, pass_percent]
+    if day is not None:
+        start = datetime.combine(day, datetime.min.time())
+        sql += " AND r.date_taken >= %s AND r.date_taken < %s"
+        params += [start, start + timedelta(days=1)]
+    db.cursor.execute(sql + " ORDER BY r.result_id LIMIT %s", tuple(params + [batch]))
+    return db.cursor.fetchall()
+
+
+def count_qualifying(db, set_id, day=None, pass_percent=CERT_PASS_PERCENT):
+    """Examinees who get a certificate (for progress bars)."""
+    sql = """
+        SELECT COUNT(DISTINCT r.user_name)
+        FROM results r JOIN users u ON u.user_name = r.user_name
+        WHERE r.set_id = %s AND r.total > 0 AND r.score * 100 >= %s * r.total
+    """
+    params = [set_id, pass_percent]
+    if day is not None:
+        start = datetime.combine(day, datetime.min.time())
+        sql += " AND r.date_taken >= %s AND r.date_taken < %s"
+        params += [start, start + timedelta(days=1)]
+    db.cursor.execute(sql, tuple(params))
+    return db.cursor.fetchone()[0] or 0
+
+
+def certificate_path(out_dir, set_id, user_name, fmt):
+    safe = re.sub(r"[^\w.-]+", "_", user_name)[:40]
+    digest = hashlib.sha1(user_name.encode()).hexdigest()[:6]  # keeps "a b" and "a_b" apart
+    return os.path.join(out_dir, f"set{set_id}_{safe}_{digest}.{fmt}")
+
+
+# ---------------------------
+# Rendering (runs in pool workers)
+# ---------------------------
+def render_certificate(job):
+    """Write one certificate; job = (path, fmt, fields). Returns the path."""
+    path, fmt, fields = job
+    tmp = path + ".tmp"
+    if fmt == "pdf":
+        _write_pdf(tmp, fields)
+    else:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(_certificate_html(fields))
+    os.replace(tmp, path)
+    return path
+
+
+def _certificate_html(fields):
+    e = {k: html.escape(str(v)) for k, v in fields.items()}
+    try:
+        png = qr_png(qr_text(fields["code"]), box_size=4)
+        qr = f'<img class="qr" src="data:image/png;base64,{base64.b64encode(png).decode()}" alt="">'
+    except RuntimeError:
+        qr = ""  # no qrcode package: the code is printed as text
+    return f"""<!doctype html>
+<html><head><meta charset="utf-8"><title>{e['title']} - {e['user_name']}</title>
+<style>
+@page {{ size: A4 landscape; margin: 15mm; }}
+body {{ font-family: Georgia, serif; text-align: center; color: #222; }}
+.frame {{ border: 6px double #555; padding: 40px 60px; }}
+h1 {{ font-size: 34pt; margin: 0 0 20px; letter-spacing: 2px; }}
+.name {{ font-size: 28pt; margin: 16px 0; font-weight: bold; }}
+.meta {{ font-size: 12pt; color: #555; margin-top: 30px; }}
+.qr {{ width: 110px; margin-top: 20px; }}
+code {{ font-size: 11pt; }}
+</style></head>
+<body><div class="frame">
+<h1>{e['title']}</h1>
+<div>This certifies that</div>
+<div class="name">{e['user_name']}</div>
+<div>has passed <b>{e['set_name']}</b> with a score of <b>{e['score']}/{e['total']}</b> ({e['percent']}%)</div>
+<div class="meta">{e['date']} &middot; {e['issuer']}</div>
+{qr}
+<div><code>{e['code']}</code></div>
+</div></body></html>
+"""
+
+
+def _write_pdf(path, fields):
+    width, height = landscape(A4)
+    c = canvas.Canvas(path, pagesize=(width, height))
+    c.setLineWidth(3)
+    c.rect(30, 30, width - 60, height - 60)
+    c.setFont("Times-Bold", 34)
+    c.drawCentredString(width / 2, height - 130, fields["title"])
+    c.setFont("Times-Roman", 16)
+    c.drawCentredString(width / 2, height - 190, "This certifies that")
+    c.setFont("Times-Bold", 28)
+    c.drawCentredString(width / 2, height - 235, fields["user_name"])
+    c.setFont("Times-Roman", 16)
+    c.drawCentredString(width / 2, height - 280,
+                        f"has passed {fields['set_name']} with a score of "
+                        f"{fields['score']}/{fields['total']} ({fields['percent']}%)")
+    c.setFont("Times-Roman", 12)
+    c.drawCentredString(width / 2, 110, f"{fields['date']} · {fields['issuer']}")
+    c.setFont("Courier", 11)
+    c.drawCentredString(width / 2, 80, fields["code"])
+    c.showPage()
+    c.save()
+
+
+# ---------------------------
+# Batch
+# ---------------------------
+def _resume_key(set_id, day, pass_percent, fmt):
+    return {"set_id": set_id, "day": day.isoformat() if day else None,
+            "pass_percent": pass_percent, "format": fmt}
+
+
+def load_resume(out_dir, key):
+    """after_id saved by an interrupted run with the same parameters, else 0."""
+    try:
+        with open(os.path.join(out_dir, RESUME_FILE), encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return 0
+    return state.get("after_id", 0) if state.get("key") == key else 0
+
+
+def save_resume(out_dir, key, after_id):
+    path = os.path.join(out_dir, RESUME_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"key": key, "after_id": after_id}, f)
+    os.replace(path + ".tmp", path)
+
+
+def generate(set_id, out_dir=CERT_OUT_DIR, day=None, pass_percent=CERT_PASS_PERCENT, fmt=CERT_FORMAT,
+             workers=CERT_WORKERS, batch=CERT_BATCH, stop=None, progress=None):
+    """Render every missing certificate; returns (written, skipped).
+
+    `progress(written, skipped)` is called as files complete; `stop` (an
+    Event) ends the run after the current batch.
+    """
+    if fmt not in CERT_FORMATS:
+        raise ValueError(f"Unknown certificate format: {fmt}")
+    if fmt == "pdf" and canvas is None:
+        raise RuntimeError("PDF certificates need the reportlab package (pip install reportlab).")
+    os.makedirs(out_dir, exist_ok=True)
+    key = _resume_key(set_id, day, pass_percent, fmt)
+    after_id = load_resume(out_dir, key)
+    written = skipped = 0
+    seen = set()  # examinees handled in this run (one certificate each)
+    window = max(workers or os.cpu_count() or 1, 1) * 4  # futures in flight at most
+
+    with ProcessPoolExecutor(max_workers=workers or None) as pool:
+        while stop is None or not stop.is_set():
+            with Database() as db:
+                rows = qualifying_batch(db, set_id, after_id, day, pass_percent, batch)
+            if not rows:
+                break
+            pending = set()
+            for result_id, user_name, set_name, score, total, taken in rows:
+                path = certificate_path(out_dir, set_id, user_name, fmt)
+                if user_name in seen or os.path.exists(path):
+                    if user_name not in seen:
+                        skipped += 1  # done by an earlier run
+                    seen.add(user_name)
+                    continue
+                seen.add(user_name)
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        f.result()
+                        written += 1
+                    if progress:
+                        progress(written, skipped)
+                fields = {
+                    "title": CERT_TITLE, "issuer": CERT_ISSUER, "user_name": user_name,
+                    "set_name": set_name or "(deleted set)", "score": score, "total": total,
+                    "percent": round(score * 100 / total), "code": make_token(result_id),
+                    "date": taken.strftime("%Y-%m-%d") if isinstance(taken, datetime) else str(taken)[:10],
+                }
+                pending.add(pool.submit(render_certificate, (path, fmt, fields)))
+            for f in wait(pending).done:
+                f.result()
+                written += 1
+            after_id = rows[-1][0]
+            save_resume(out_dir, key, after_id)  # everything up to here is on disk
+            if progress:
+                progress(written, skipped)
+            if len(rows) < batch:
+                break
+    return written, skipped
+
+
+class CertificateJob(threading.Thread):
+    """generate() in the background; poll .written / .skipped / .total / .error / is_alive()."""
+
+    def __init__(self, set_id, out_dir=CERT_OUT_DIR, day=None, pass_percent=CERT_PASS_PERCENT,
+                 fmt=CERT_FORMAT, workers=CERT_WORKERS):
+        super().__init__(daemon=True, name="exam-certificates")
+        self.args = (set_id, out_dir, day, pass_percent, fmt, workers)
+        self.total = None
+        self.written = self.skipped = 0
+        self.error = None
+        self.stopping = threading.Event()
+
+    def run(self):
+        set_id, out_dir, day, pass_percent, fmt, workers = self.args
+        try:
+            with Database() as db:
+                self.total = count_qualifying(db, set_id, day, pass_percent)
+            generate(set_id, out_dir, day, pass_percent, fmt, workers,
+                     stop=self.stopping, progress=self.report)
+        except (ValueError, RuntimeError, OSError) + DB_ERRORS as e:
+            self.error = e
+
+    def report(self, written, skipped):
+        self.written, self.skipped = written, skipped
+
+    def stop(self):
+        self.stopping.set()
+
+    def fraction(self):
+        if not self.total:
+            return 0.0
+        return min((self.written + self.skipped) / self.total, 1.0)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Render E-XAM certificates for everyone who passed a set.")
+    p.add_argument("--set", type=int, dest="set_id", required=True, help="set id")
+    p.add_argument("--day", type=date.fromisoformat, help="only results taken on this day (YYYY-MM-DD)")
+    p.add_argument("--pass", type=float, dest="pass_percent", default=CERT_PASS_PERCENT, help="pass mark in percent")
+    p.add_argument("--format", choices=CERT_FORMATS, default=CERT_FORMAT)
+    p.add_argument("--out", default=CERT_OUT_DIR, help="output directory")
+    p.add_argument("--workers", type=int, default=CERT_WORKERS, help="render processes (0 = one per CPU)")
+    p.add_argument("--batch", type=int, default=CERT_BATCH, help="results read per query")
+    args = p.parse_args(argv)
+    create_tables()
+
+    def progress(written, skipped):
+        print(f"\r{written} written, {skipped} already done", end="", flush=True)
+
+    try:
+        written, skipped = generate(args.set_id, args.out, args.day, args.pass_percent, args.format,
+                                    args.workers, args.batch, progress=progress)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print(f"\nCertificates in {args.out}: {written} new, {skipped} already there.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+E-XAM change feed
+- `changes` table: append-only log with a monotonically increasing `seq`
+- Writers call record_change() with the same Database handle (same transaction)
+  that modifies sets / questions / results / users
+- Readers remember the last seq they saw and only fetch the delta; seqs
+  skipped over (a writer that took a lower AUTO_INCREMENT value but had not
+  committed yet) are re-read for [feed] gap_wait_s seconds before giving up
+  on them (rolled-back inserts never show up)
+
+Table DDL lives in exam_db.create_tables(). No tkinter import here.
+"""
+import time
+
+import exam_config
+
+FEED_TABLES = ("sets", "questions", "results", "users")
+CHANGE_RETENTION = exam_config.getint("feed", "retention")  # rows kept in `changes` after prune_changes()
+CHANGE_BATCH = exam_config.getint("feed", "batch")  # rows per poll round
+GAP_WAIT_S = exam_config.getfloat("feed", "gap_wait_s")  # how long a missing seq may still commit
+
+
+# ---------------------------
+# Writers
+# ---------------------------
+def record_change(db, table_name, row_id=None, op="update"):
+    """Append one change row; commits/rolls back together with the caller's write."""
+    db.cursor.execute(
+        "INSERT INTO changes (table_name, row_id, op) VALUES (%s, %s, %s)",
+        (table_name, row_id, op)
+    )
+
+
+def record_changes(db, table_name, row_ids, op="update"):
+    """Same as record_change() for many rows (e.g. multi-select deletes)."""
+    rows = [(table_name, rid, op) for rid in row_ids]
+    if rows:
+        db.cursor.executemany(
+            "INSERT INTO changes (table_name, row_id, op) VALUES (%s, %s, %s)",
+            rows
+        )
+
+
+def prune_changes(db, keep=CHANGE_RETENTION):
+    """Drop everything but the newest `keep` rows (PK range delete)."""
+    db.cursor.execute("SELECT MAX(seq) FROM changes")
+    top = db.cursor.fetchone()[0]
+    if top is not None and top > keep:
+        db.cursor.execute("DELETE FROM changes WHERE seq <= %s", (top - keep,))
+
+
+# ---------------------------
+# Readers
+# ---------------------------
+def latest_seq(db, table_name=None):
+    if table_name is None:
+        db.cursor.execute("SELECT MAX(seq) FROM changes")
+    else:
+        db.cursor.execute("SELECT MAX(seq) FROM changes WHERE table_name=%s", (table_name,))
+    return db.cursor.fetchone()[0] or 0
+
+
+def changes_since(db, seq, limit=1000):
+    """Rows (seq, table_name, row_id, op) with seq > `seq`, oldest first."""
+    db.cursor.execute(
+        "SELECT seq, table_name, row_id, op FROM changes WHERE seq > %s ORDER BY seq LIMIT %s",
+        (seq, limit)
+    )
+    return db.cursor.fetchall()
+
+
+def changes_in(db, seqs):
+    """Rows (seq, table_name, row_id, op) for the given seqs that exist now."""
+    seqs = tuple(seqs)
+    if not seqs:
+        return []
+    db.cursor.execute(
+        f"SELECT seq, table_name, row_id, op FROM changes WHERE seq IN ({', '.join(['%s'] * len(seqs))}) ORDER BY seq",
+        seqs
+    )
+    return db.cursor.fetchall()
+
+
+class ChangeTail:
+    """Remembers the last seen seq and returns only what changed since then.
+
+    poll() returns {table_name: [(row_id, op), ...]} (empty dict when nothing
+    changed). A single indexed range read on the PK, so it is cheap to call
+    from a Tk after() loop.
+
+    AUTO_INCREMENT values are handed out at insert time, not at commit, so a
+    lower seq can become visible after a higher one was read. Seqs jumped
+    over are kept in `gaps` and re-read on every poll until they appear or
+    are older than `gap_wait` seconds.
+    """
+
+    def __init__(self, start_seq=0, batch=CHANGE_BATCH, gap_wait=GAP_WAIT_S):
+        self.last_seq = start_seq
+        self.batch = batch
+        self.gap_wait = gap_wait
+        self.gaps = {}  # seq -> monotonic time it was first missed
+
+    def sync(self, db):
+        """Skip history: start tailing from the current end of the log."""
+        self.last_seq = latest_seq(db)
+        self.gaps.clear()
+
+    def _add(self, delta, table_name, row_id, op):
+        delta.setdefault(table_name, []).append((row_id, op))
+
+    def poll(self, db):
+        delta = {}
+        now = time.monotonic()
+        if self.gaps:
+            for seq, table_name, row_id, op in changes_in(db, self.gaps):
+                self._add(delta, table_name, row_id, op)
+                del self.gaps[seq]
+            for seq in [s for s, t in self.gaps.items() if now - t > self.gap_wait]:
+                del self.gaps[seq]  # rolled back
+        while True:
+            rows = changes_since(db, self.last_seq, self.batch)
+            for seq, table_name, row_id, op in rows:
+                if 0 < seq - self.last_seq - 1 <= self.batch:  # wider jumps are pruned history
+                    for missing in range(self.last_seq + 1, seq):
+                        self.gaps[missing] = now
+                self._add(delta, table_name, row_id, op)
+                self.last_seq = seq
+            if len(rows) < self.batch:
+                return delta
@@ -0,0 +1,256 @@
+"""
+E-XAM API client: the examinee services over HTTP (exam_server.py)
+- Same names and call shapes as the exam_services calls QuizUserApp and
+  load_test.py make: login_or_register(), SetCatalog, QuizSession,
+  user_history(), history_page(), history_summary(), LOGIN_* outcomes
+- One keep-alive connection and one login token per thread; an expired
+  token is renewed with the stored credentials
+- The server grades: QuizSession.answer() returns None and the score is
+  known after finish()
+
+Enabled by [client] api_url. Failures raise ValueError (user-facing message
+from the server) or one of API_ERRORS. No tkinter import here.
+"""
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import exam_config
+import exam_services
+from exam_services import LOGIN_OK, LOGIN_REGISTERED, LOGIN_BAD_PIN, SETS_CACHE_TTL, HISTORY_PAGE_SIZE
+
+__all__ = ["LOGIN_OK", "LOGIN_REGISTERED", "LOGIN_BAD_PIN", "API_ERRORS", "ApiError", "ApiClient",
+           "get_client", "use_server", "login_or_register", "user_history", "history_page",
+           "history_summary", "SetCatalog", "QuizSession"]
+
+API_URL = exam_config.get("client", "api_url")
+API_TIMEOUT = exam_config.getfloat("client", "api_timeout")
+
+
+class ApiError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(f"HTTP {status}: {message}" if message else f"HTTP {status}")
+        self.status = status
+
+
+# Errors a service call can raise in API mode (besides ValueError)
+API_ERRORS = (ApiError, OSError, http.client.HTTPException)
+
+
+# ---------------------------
+# HTTP client
+# ---------------------------
+class ApiClient:
+    def __init__(self, base_url, timeout=API_TIMEOUT):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.local = threading.local()  # conn / token / credentials of this thread
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return conn
+
+    def close(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+    def send(self, method, path, data, auth, idempotent):
+        """(status, payload) of one request.
+
+        Only idempotent requests are re-sent after a dropped connection; the
+        others start on a fresh connection instead of an idle keep-alive one
+        the server may have closed, and are never sent twice.
+        """
+        headers = {"Content-Type": "application/json"}
+        if auth:
+            headers["Authorization"] = f"Bearer {getattr(self.local, 'token', '')}"
+        body = json.dumps(data).encode() if data is not None else None
+        if not idempotent:
+            self.close()
+        for retry in ((True, False) if idempotent else (False,)):
+            conn = self.connection()
+            try:
+                conn.request(method, self.prefix + path, body, headers)
+                response = conn.getresponse()
+                return response.status, json.loads(response.read() or b"null")
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # the server closed an idle keep-alive connection: reconnect once
+                self.close()
+                if not retry:
+                    raise
+            except Exception:
+                self.close()
+                raise
+
+    def request(self, method, path, data=None, auth=True, idempotent=None):
+        """idempotent defaults to GET only; pass True for POSTs that are safe to repeat."""
+        if idempotent is None:
+            idempotent = method == "GET"
+        status, payload = self.send(method, path, data, auth, idempotent)
+        credentials = getattr(self.local, "credentials", None)
+        if status == 401 and auth and credentials:
+            self.login(*credentials)  # server restarted or token expired
+            status, payload = self.send(method, path, data, auth, idempotent)
+        error = payload.get("error") if isinstance(payload, dict) else None
+        if status == 400:
+            raise ValueError(error or "Bad request.")
+        if status != 200:
+            raise ApiError(status, error)
+        return payload
+
+    def login(self, user_name, pin):
+        result = self.request("POST", "/login", {"user_name": user_name, "pin": pin}, auth=False,
+                              idempotent=True)
+        if result["token"]:
+            self.local.token = result["token"]
+            self.local.credentials = (user_name, pin)
+        return result["outcome"]
+
+
+_client = None
+
+
+def get_client():
+    global _client
+    if _client is None:
+        if not API_URL:
+            raise RuntimeError("[client] api_url is not set")
+        _client = ApiClient(API_URL)
+    return _client
+
+
+def use_server(url, timeout=API_TIMEOUT):
+    """Point this process at another exam server (scripts / load tests)."""
+    global _client
+    _client = ApiClient(url, timeout)
+    return _client
+
+
+# ---------------------------
+# Services (same shapes as exam_services)
+# ---------------------------
+def login_or_register(user_name, pin):
+    """LOGIN_OK, LOGIN_REGISTERED (new user created) or LOGIN_BAD_PIN."""
+    user_name, pin = (user_name or "").strip(), (pin or "").strip()
+    if not user_name or not pin:
+        raise ValueError("Please enter both username and PIN!")
+    return get_client().login(user_name, pin)
+
+
+def user_history(user_name):
+    """(set_name, score, total, date_taken) for the logged-in user, newest first."""
+    return [tuple(r) for r in get_client().request("GET", "/results")]
+
+
+def history_page(user_name, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """(rows, next_cursor) like exam_services.history_page (dates arrive as text)."""
+    query = urlencode({"cursor": cursor or "", "limit": limit})
+    page = get_client().request("GET", f"/results/page?{query}")
+    return [tuple(r) for r in page["rows"]], page["next"]
+
+
+def history_summary(user_name):
+    """(attempts, average_percent or None, [(set_name, attempts, best_percent, average_percent)])."""
+    summary = get_client().request("GET", "/results/summary")
+    return summary["attempts"], summary["average"], [tuple(r) for r in summary["sets"]]
+
+
+class SetCatalog:
+    """[(set_id, set_name)] from the server's shared cache, reused for `ttl` seconds."""
+
+    def __init__(self, ttl=SETS_CACHE_TTL):
+        self.ttl = ttl
+        self.cache = None
+        self.checked_at = 0.0
+
+    def sets(self):
+        now = time.monotonic()
+        if self.cache is not None and now - self.checked_at < self.ttl:
+            return self.cache
+        self.cache = [tuple(s) for s in get_client().request("GET", "/sets")]
+        self.checked_at = now
+        return self.cache
+
+
+class QuizSession(exam_services.QuizSession):
+    """exam_services.QuizSession whose writes and grading happen on the server.
+
+    Questions arrive without answers; answers are sent with checkpoints
+    (flush) and finish(), which returns the server's score.
+    """
+
+    @classmethod
+    def from_payload(cls, user_name, payload, heartbeat=None):
+        questions = [(q[0], q[1], None, q[2], q[3], 0) for q in payload["questions"]]
+        return cls(user_name, payload["set_id"], payload["attempt_id"], questions,
+                   payload["remaining"], payload["question_time"], payload.get("index", 0),
+                   payload.get("score", 0), payload.get("answers"), heartbeat, payload.get("version"),
+                   payload.get("question_remaining"))
+
+    @classmethod
+    def start(cls, user_name, set_id, heartbeat=None):
+        """New server-side attempt; None when the set has no questions."""
+        payload = get_client().request("POST", "/attempts", {"set_id": set_id})
+        if payload["attempt_id"] is None:
+            return None
+        return cls.from_payload(user_name, payload, heartbeat)
+
+    @staticmethod
+    def pending(user_name):
+        """(attempt_id, set_id, set_name, index, score, answers, remaining, version,
+        question_remaining) or None."""
+        p = get_client().request("GET", "/attempts/pending")
+        if not p:
+            return None
+        return (p["attempt_id"], p["set_id"], p["set_name"], p["index"], p["score"],
+                p["answers"], p["remaining"], p.get("version"), p.get("question_remaining"))
+
+    @classmethod
+    def resume(cls, user_name, pending, heartbeat=None):
+        payload = get_client().request("POST", f"/attempts/{pending[0]}/resume", {}, idempotent=True)
+        return cls.from_payload(user_name, payload, heartbeat)
+
+    @staticmethod
+    def abandon(pending):
+        get_client().request("POST", f"/attempts/{pending[0]}/abandon", {})
+
+    def answer(self, given):
+        """Record the answer and move on; graded on the server (returns None)."""
+        self.answers.append(given)
+        self.index += 1
+        self.checkpoint.note(self.index, None, self.answers)
+        return None
+
+    def flush(self):
+        """Send the heartbeat (+ answers when a checkpoint is pending) when due."""
+        if not self.flush_due():
+            return False
+        now = time.monotonic()
+        rows = self.heartbeat.due(now)
+        data = {"index": self.index}
+        if self.checkpoint.unsaved:
+            data["answers"] = self.answers
+        get_client().request("POST", f"/attempts/{self.attempt_id}/progress", data, idempotent=True)
+        self.heartbeat.mark_written(rows, now)
+        self.checkpoint.mark_saved()
+        return True
+
+    def finish(self):
+        """Close the attempt; True when the result was stored (False = server expired it)."""
+        # the server answers a repeated finish of this attempt with the first outcome
+        result = get_client().request("POST", f"/attempts/{self.attempt_id}/finish",
+                                      {"answers": self.answers}, idempotent=True)
+        self.score = result["score"]
+        self.result_token = result.get("token")
+        self.heartbeat.discard(self.user_name)
+        self.deadline_at = None
+        return result["accepted"]
@@ -0,0 +1,259 @@
+"""
+E-XAM storage backends
+- MySQLBackend : mysql-connector-python (XAMPP / standalone MySQL or MariaDB)
+- SQLiteBackend: embedded single-file database for small sites and CI
+  (WAL journal, tuned pragmas, same tables and indexes)
+
+A backend opens raw connections and knows its SQL dialect: the few
+expressions that differ between MySQL and SQLite (current time, adding
+seconds, time differences, upserts, schema introspection). Everything else
+in the repo is plain SQL with %s placeholders; the SQLite connection wrapper
+converts those to sqlite3's "?" style.
+
+No tkinter import here.
+"""
+import re
+import sqlite3
+from datetime import datetime, date
+
+try:
+    import mysql.connector
+except ImportError:  # SQLite-only install
+    mysql = None
+
+# Errors a Database block can raise, whichever backend is active
+DB_ERRORS = (sqlite3.Error,) + ((mysql.connector.Error,) if mysql else ())
+
+
+# ---------------------------
+# MySQL
+# ---------------------------
+class MySQLBackend:
+    name = "mysql"
+    autoinc_pk = "INT AUTO_INCREMENT PRIMARY KEY"
+    autoinc_bigpk = "BIGINT AUTO_INCREMENT PRIMARY KEY"
+    now = "NOW()"
+    for_update = "FOR UPDATE"
+    iif = "IF"
+    null_safe_eq = "<=>"
+    int_div = "DIV"
+
+    def __init__(self, host="localhost", user="root", password="", database="exam_system",
+                 connect_timeout=10, query_timeout_ms=None):
+        if mysql is None:
+            raise RuntimeError("MySQL backend needs: pip install mysql-connector-python")
+        self.connect_args = dict(host=host, user=user, password=password, database=database,
+                                 connection_timeout=connect_timeout)
+        self.query_timeout_ms = query_timeout_ms
+
+    def connect(self):
+        conn = mysql.connector.connect(autocommit=False, **self.connect_args)
+        if self.query_timeout_ms:
+            cur = conn.cursor()
+            try:
+                cur.execute("SET SESSION max_execution_time = %s", (self.query_timeout_ms,))
+            except mysql.connector.Error:
+                # MariaDB spells it max_statement_time (seconds)
+                try:
+                    cur.execute("SET SESSION max_statement_time = %s", (self.query_timeout_ms / 1000,))
+                except mysql.connector.Error:
+                    pass
+            finally:
+                cur.close()
+        return conn
+
+    def is_broken(self, exc):
+        return isinstance(exc, mysql.connector.errors.OperationalError)
+
+    def begin(self, db):
+        """Open the block's transaction now (autocommit is off: the first statement already does)."""
+
+    # SQL fragments
+    def add_seconds(self, expr, sign="+"):
+        return f"{expr} {sign} INTERVAL %s SECOND"
+
+    def seconds_between(self, start, end):
+        return f"TIMESTAMPDIFF(SECOND, {start}, {end})"
+
+    def upsert(self, key):
+        return "ON DUPLICATE KEY UPDATE"
+
+    def inserted(self, column):
+        return f"VALUES({column})"
+
+    # Introspection
+    def has_column(self, db, table, column):
+        db.cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """, (table, column))
+        return bool(db.cursor.fetchone()[0])
+
+    def has_index(self, db, table, index):
+        db.cursor.execute("""
+            SELECT COUNT(*) FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """, (table, index))
+        return bool(db.cursor.fetchone()[0])
+
+
+# ---------------------------
+# SQLite
+# ---------------------------
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",       # readers never block the writer
+    "PRAGMA synchronous=NORMAL",     # safe with WAL, far fewer fsyncs
+    "PRAGMA foreign_keys=ON",        # ON DELETE CASCADE like InnoDB
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",      # ~16 MB page cache per connection
+    "PRAGMA mmap_size=67108864",     # 64 MB memory-mapped reads
+)
+
+
+def _adapt_datetime(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _convert_datetime(raw):
+    text = raw.decode()
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M:%S.%f", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            pass
+    return text
+
+
+sqlite3.register_adapter(datetime, _adapt_datetime)
+sqlite3.register_adapter(date, lambda d: d.isoformat())
+sqlite3.register_converter("DATETIME", _convert_datetime)
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+class SQLiteCursor:
+    """sqlite3 cursor that accepts the repo's %s placeholders."""
+
+    def __init__(self, cursor):
+        self._cur = cursor
+
+    def execute(self, sql, params=()):
+        self._cur.execute(_PLACEHOLDER.sub("?", sql), tuple(params))
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._cur.executemany(_PLACEHOLDER.sub("?", sql), [tuple(p) for p in seq_of_params])
+        return self
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def fetchmany(self, size):
+        return self._cur.fetchmany(size)
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self._cur.close()
+
+
+class SQLiteConnection:
+    """Just enough of the mysql-connector connection API for exam_db."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, prepared=False):
+        # sqlite3 keeps its own prepared-statement cache (cached_statements)
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    @property
+    def in_transaction(self):
+        return self._conn.in_transaction
+
+    def close(self):
+        self._conn.close()
+
+    def is_connected(self):
+        return True
+
+
+class SQLiteBackend:
+    name = "sqlite"
+    autoinc_pk = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    autoinc_bigpk = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    now = "datetime('now', 'localtime')"
+    for_update = ""  # writers are serialized by the database lock
+    iif = "iif"
+    null_safe_eq = "IS"
+    int_div = "/"  # integer operands divide as integers
+
+    def __init__(self, path="exam_system.db", busy_timeout_ms=5000):
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+
+    def connect(self):
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.busy_timeout_ms / 1000,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,  # the pool hands a connection to one user at a time
+            cached_statements=256,
+        )
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return SQLiteConnection(conn)
+
+    def is_broken(self, exc):
+        return False
+
+    def begin(self, db):
+        """Open the block's transaction now.
+
+        A SAVEPOINT outside a transaction starts one, which its RELEASE commits.
+        """
+        if not db.conn.in_transaction:
+            db.cursor.execute("BEGIN")
+
+    # SQL fragments
+    def add_seconds(self, expr, sign="+"):
+        return f"datetime({expr}, '{sign}' || %s || ' seconds')"
+
+    def seconds_between(self, start, end):
+        return f"CAST(ROUND((julianday({end}) - julianday({start})) * 86400) AS INTEGER)"
+
+    def upsert(self, key):
+        return f"ON CONFLICT({key}) DO UPDATE SET"
+
+    def inserted(self, column):
+        return f"excluded.{column}"
+
+    # Introspection
+    def has_column(self, db, table, column):
+        db.cursor.execute(f"PRAGMA table_info({table})")
+        return any(row[1] == column for row in db.cursor.fetchall())
+
+    def has_index(self, db, table, index):
+        db.cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type='index' AND tbl_name=%s AND name=%s",
+            (table, index)
+        )
+        return bool(db.cursor.fetchone()[0])
+
+
+BACKENDS = {"mysql": MySQLBackend, "sqlite": SQLiteBackend}
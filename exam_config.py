@@ -0,0 +1,163 @@
+"""
+E-XAM configuration
+- Built-in defaults (below), overridden by an INI file, overridden by
+  environment variables EXAM_<SECTION>_<KEY> (e.g. EXAM_DB_POOL_SIZE=8,
+  EXAM_DB_BACKEND=sqlite, EXAM_ADMIN_KEY=...)
+- The INI file is exam_system.ini next to the scripts, or the path in
+  EXAM_CONFIG; see exam_system.example.ini
+- Read once per process and cached: modules pull their knobs at import time
+
+No tkinter import here.
+"""
+import configparser
+import os
+
+CONFIG_ENV = "EXAM_CONFIG"
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "exam_system.ini")
+
+DEFAULTS = {
+    "db": {
+        "backend": "mysql",           # mysql | sqlite
+        "host": "localhost",
+        "user": "root",
+        "password": "",
+        "name": "exam_system",
+        "path": "exam_system.db",     # SQLite file
+        "pool_size": "4",             # idle connections kept open per process
+        "connect_timeout": "10",      # seconds
+        "query_timeout_ms": "30000",  # per statement (MySQL max_execution_time / SQLite busy wait)
+    },
+    "admin": {
+        "key": "1234",
+        "change_poll_ms": "2000",
+        "monitor_refresh_ms": "3000",
+        "sweep_ms": "15000",
+        "results_page_size": "500",   # newest results shown on the results page
+        "dashboard_ttl_s": "30",      # dashboard shown from cache this long before a background refresh
+    },
+    "user": {
+        "heartbeat_flush_ms": "5000",
+        "sets_cache_ttl": "5",        # seconds the set list is trusted without a DB check
+        "pack_cache_size": "16",      # question packs kept per process, keyed (set_id, version)
+        "history_page_size": "50",    # results per "My Results" page
+    },
+    "client": {
+        "api_url": "",                # e.g. http://10.0.0.5:8765 = talk to exam_server.py; empty = direct DB
+        "api_timeout": "10",          # seconds per request
+    },
+    "server": {
+        "host": "0.0.0.0",            # exam_server.py
+        "port": "8765",
+        "db_workers": "8",            # concurrent blocking DB calls
+        "write_flush_ms": "200",      # heartbeat / checkpoint batch interval
+        "change_poll_ms": "2000",     # cache invalidation via the change feed
+        "idle_timeout": "300",        # seconds a keep-alive connection may sit idle
+        "session_ttl": "43200",       # seconds a login token stays valid unused
+        "max_body": "262144",         # bytes per request
+        "pack_cache_size": "256",     # set versions kept in memory (LRU)
+    },
+    "attempts": {
+        "finish_grace": "5",
+        "sweep_batch": "200",
+        "checkpoint_every_n": "3",
+        "checkpoint_every_s": "20",
+    },
+    "monitor": {
+        "heartbeat_keepalive": "30",
+        "active_window": "120",
+    },
+    "archive": {
+        "enabled": "1",               # ExamAdminApp's job scheduler archives old results (results_archive.py)
+        "after_days": "180",          # results older than this move to results_archive
+        "batch": "1000",              # rows moved per transaction
+        "interval_s": "3600",         # pause between background runs
+    },
+    "rollups": {
+        "enabled": "1",               # ExamAdminApp's job scheduler folds new results in (rollups.py)
+        "interval_s": "300",          # pause between rollup runs
+        "batch": "5000",              # results folded per transaction
+    },
+    "stats": {
+        "chunk": "5000",              # raw results fetched per round for exact statistics (score_stats.py)
+    },
+    "purge": {
+        "chunk": "500",               # rows per DELETE when purging sets / bulk-deleting questions
+        "pause_ms": "50",             # pause between purge chunks (lets exam writes through)
+    },
+    "qr": {
+        "secret": "",                 # signs result codes; empty = random per-site secret kept in the DB
+        "base_url": "",               # e.g. http://10.0.0.5:8765/r/ ; empty = QR holds the bare code
+        "workers": "0",               # batch render processes (0 = one per CPU)
+        "box_size": "8",              # pixels per QR module
+    },
+    "certificates": {
+        "pass_percent": "75",         # score needed for a certificate
+        "batch": "200",               # results read per query
+        "workers": "0",               # render processes (0 = one per CPU)
+        "out_dir": "certificates",
+        "format": "html",             # html | pdf (pdf needs reportlab)
+        "title": "Certificate of Completion",
+        "issuer": "E-XAM",
+    },
+    "feed": {
+        "retention": "50000",
+        "batch": "1000",
+        "gap_wait_s": "10",           # seconds a skipped change seq is re-read (uncommitted writer)
+    },
+    "instrumentation": {
+        "enabled": "1",
+        "slow_query_ms": "200",
+        "slow_log": "slow_queries.log",  # empty = keep slow queries in memory only
+    },
+    "startup": {
+        "warm_connections": "1",          # opened in the background by user_start.py
+        "timings_log": "startup_timings.jsonl",  # empty = don't record
+    },
+    "profiler": {
+        "enabled": "0",               # UI event-loop profiler (ui_profiler.py), opt-in
+        "probe_ms": "50",
+        "stall_ms": "100",
+        "report": "ui_profile.txt",   # empty = print to stdout
+        "cprofile": "0",              # also collect cProfile stats (ui_profile.prof)
+    },
+}
+
+_config = None
+
+
+def env_name(section, key):
+    return f"EXAM_{section}_{key}".upper()
+
+
+def load_config(path=None, environ=None):
+    """Build a fresh ConfigParser: defaults < INI file < environment."""
+    environ = os.environ if environ is None else environ
+    cfg = configparser.ConfigParser(interpolation=None)
+    cfg.read_dict(DEFAULTS)
+    path = path or environ.get(CONFIG_ENV) or CONFIG_FILE
+    cfg.read(path, encoding="utf-8")  # a missing file is fine
+    for section in cfg.sections():
+        for key in cfg[section]:
+            value = environ.get(env_name(section, key))
+            if value is not None:
+                cfg[section][key] = value
+    return cfg
+
+
+def get_config():
+    global _config
+    if _config is None:
+        _config = load_config()
+    return _config
+
+
+def get(section, key):
+    return get_config().get(section, key)
+
+
+def getint(section, key):
+    return get_config().getint(section, key)
+
+
+def getfloat(section, key):
+    return get_config().getfloat(section, key)
@@ -0,0 +1,959 @@
+"""
+E-XAM shared data-access layer
+- One Database context manager for every panel (admin, legacy admin panels,
+  user client, scripts)
+- Pluggable backend (exam_backends.py): MySQL (default) or embedded SQLite,
+  chosen with [db] backend / EXAM_DB_BACKEND=mysql|sqlite (exam_config.py)
+- Small connection pool: connections stay open between `with Database()`
+  blocks instead of reconnecting per click
+- Hot statements run through server-side prepared statements
+  (cursor(prepared=True)) cached per connection, so MySQL parses them once
+- create_tables(): the single schema definition (tables, indexes, migrations)
+- Repository functions: every SQL string the GUIs use lives here; writes also
+  append to the change feed (change_feed.py) in the same transaction
+- Cursors are timed per statement when instrumentation is on (query_stats.py)
+
+No tkinter import here: callers decide how to show errors (catch DB_ERRORS).
+
+Dependencies:
+    pip install mysql-connector-python   (not needed for EXAM_DB_BACKEND=sqlite)
+"""
+import queue
+import secrets
+import time
+
+import exam_config
+import query_stats
+from exam_backends import BACKENDS, DB_ERRORS
+from change_feed import record_change, record_changes, prune_changes
+from exam_monitor import purge_stale_progress
+
+# ---------------------------
+# CONNECTION SETTINGS ([db] in exam_config.py)
+# ---------------------------
+DB_HOST = exam_config.get("db", "host")
+DB_USER = exam_config.get("db", "user")
+DB_PASSWORD = exam_config.get("db", "password")
+DB_NAME = exam_config.get("db", "name")
+DB_BACKEND = exam_config.get("db", "backend")
+SQLITE_PATH = exam_config.get("db", "path")
+POOL_SIZE = exam_config.getint("db", "pool_size")  # idle connections kept open per process
+CONNECT_TIMEOUT = exam_config.getint("db", "connect_timeout")
+QUERY_TIMEOUT_MS = exam_config.getint("db", "query_timeout_ms")
+DELETE_CHUNK = exam_config.getint("purge", "chunk")  # ids per DELETE ... IN (...) statement
+
+
+# ---------------------------
+# Connection pool (+ per-connection prepared statements)
+# ---------------------------
+class PooledConnection:
+    """A raw connection plus the prepared cursors created on it."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.statements = {}  # sql -> prepared cursor
+
+    def prepared(self, sql):
+        cur = self.statements.get(sql)
+        if cur is None:
+            cur = self.conn.cursor(prepared=True)
+            self.statements[sql] = cur
+        return cur
+
+    def close(self):
+        for cur in self.statements.values():
+            try:
+                cur.close()
+            except Exception:
+                pass
+        self.statements.clear()
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """LIFO pool of idle connections.
+
+    acquire() never blocks: when no idle connection is available a new one
+    is opened. release() keeps at most `size` idle connections.
+    """
+
+    def __init__(self, backend, size=POOL_SIZE):
+        self.backend = backend
+        self.size = size
+        self.idle = queue.LifoQueue()
+
+    def connect(self):
+        return PooledConnection(self.backend.connect())
+
+    def acquire(self):
+        while True:
+            try:
+                pc = self.idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            if pc.conn.is_connected():
+                return pc
+            pc.close()  # server dropped it (wait_timeout); try the next one
+
+    def release(self, pc):
+        if self.idle.qsize() >= self.size:
+            pc.close()
+        else:
+            self.idle.put(pc)
+
+    def close_all(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+_pool = None
+
+
+def make_backend(name=None, path=None):
+    name = name or DB_BACKEND
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown EXAM_DB_BACKEND '{name}' (expected one of {', '.join(BACKENDS)})")
+    if name == "sqlite":
+        return BACKENDS[name](path or SQLITE_PATH, busy_timeout_ms=QUERY_TIMEOUT_MS)
+    return BACKENDS[name](host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME,
+                          connect_timeout=CONNECT_TIMEOUT, query_timeout_ms=QUERY_TIMEOUT_MS)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(make_backend(), POOL_SIZE)
+    return _pool
+
+
+def warm_pool(count=1):
+    """Open `count` connections ahead of the first query (e.g. from a background thread)."""
+    pool = get_pool()
+    conns = [pool.acquire() for _ in range(count)]
+    for pc in conns:
+        pool.release(pc)
+
+
+def use_backend(name=None, path=None, pool_size=POOL_SIZE):
+    """Replace the process pool (scripts / benchmarks pointing at another DB)."""
+    global _pool
+    if _pool is not None:
+        _pool.close_all()
+    _pool = ConnectionPool(make_backend(name, path), pool_size)
+    return _pool
+
+
+# ---------------------------
+# DATABASE CONNECTION (light OOP)
+# ---------------------------
+class Database:
+    """`with Database() as db:` = one transaction on a pooled connection.
+
+    db.cursor is a plain cursor for ad-hoc SQL; db.prepared(sql) returns the
+    connection's cached prepared cursor for a hot statement; db.dialect is
+    the active backend (SQL fragments that differ between MySQL and SQLite).
+    Commits on success, rolls back on exception.
+    """
+
+    def __init__(self):
+        self.pc = None
+        self.conn = None
+        self.cursor = None
+        self.dialect = None
+        self.traced = []
+
+    def __enter__(self):
+        pool = get_pool()
+        self.dialect = pool.backend
+        if query_stats.ENABLED:
+            t0 = time.perf_counter()
+            self.pc = pool.acquire()
+            query_stats.stats.record_connect(time.perf_counter() - t0)
+        else:
+            self.pc = pool.acquire()
+        self.conn = self.pc.conn
+        self.cursor = self._trace(self.conn.cursor())
+        return self
+
+    def _trace(self, cur):
+        if not query_stats.ENABLED:
+            return cur
+        cur = query_stats.TracedCursor(cur)
+        self.traced.append(cur)
+        return cur
+
+    def prepared(self, sql):
+        return self._trace(self.pc.prepared(sql))
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if not self.conn:
+            return
+        for cur in self.traced:
+            cur.finish()
+        self.traced = []
+        broken = False
+        try:
+            if exc_type:
+                self.conn.rollback()
+            else:
+                self.conn.commit()
+        except DB_ERRORS:
+            broken = True
+            if not exc_type:
+                raise
+        finally:
+            try:
+                self.cursor.close()
+            except Exception:
+                pass
+            if broken or (exc_val is not None and self.dialect.is_broken(exc_val)):
+                self.pc.close()
+            else:
+                get_pool().release(self.pc)
+            self.pc = self.conn = self.cursor = None
+
+
+# ---------------------------
+# TABLE CREATION / MIGRATIONS
+# ---------------------------
+def ensure_column(db, table, column, ddl):
+    """ALTER TABLE ... ADD COLUMN only when missing."""
+    if not db.dialect.has_column(db, table, column):
+        db.cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+def ensure_index(db, table, index, columns):
+    """CREATE INDEX only when missing (MySQL has no CREATE INDEX IF NOT EXISTS)."""
+    if not db.dialect.has_index(db, table, index):
+        db.cursor.execute(f"CREATE INDEX {index} ON {table} ({columns})")
+
+
+def create_tables():
+    """Create / migrate the whole schema. Raises one of DB_ERRORS."""
+    with Database() as db:
+        pk = db.dialect.autoinc_pk
+        # Users table
+        db.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id {pk},
+                user_name VARCHAR(255) UNIQUE NOT NULL,
+                pin VARCHAR(10) NOT NULL
+            )
+        """)
+
+        # Sets table (time limits: see attempts.py; deleted_at = soft delete;
+        # version is bumped by every question edit)
+        db.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS sets (
+                set_id {pk},
+                set_name VARCHAR(255) UNIQUE NOT NULL,
+                date_created DATETIME,
+                time_limit_sec INT NULL,
+                question_time_sec INT NULL,
+                deleted_at DATETIME NULL,
+                version INT NOT NULL DEFAULT 1
+            )
+        """)
+        ensure_column(db, "sets", "time_limit_sec", "INT NULL")
+        ensure_column(db, "sets", "question_time_sec", "INT NULL")
+        ensure_column(db, "sets", "deleted_at", "DATETIME NULL")
+        ensure_column(db, "sets", "version", "INT NOT NULL DEFAULT 1")
+
+        # Questions table (types / packed options: see question_types.py)
+        db.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS questions (
+                question_id {pk},
+                set_id INT,
+                question_text TEXT,
+                answer TEXT,
+                qtype VARCHAR(8) NOT NULL DEFAULT 'text',
+                options TEXT,
+                correct_mask INT NOT NULL DEFAULT 0,
+                FOREIGN KEY (set_id) REFERENCES sets(set_id) ON DELETE CASCADE
+            )
+        """)
+        ensure_column(db, "questions", "qtype", "VARCHAR(8) NOT NULL DEFAULT 'text'")
+        ensure_column(db, "questions", "options", "TEXT")
+        ensure_column(db, "questions", "correct_mask", "INT NOT NULL DEFAULT 0")
+        # Copy-on-write versions: a row belongs to set versions [valid_from, valid_to);
+        # an edit retires the row and inserts a copy that keeps its position
+        ensure_column(db, "questions", "valid_from", "INT NOT NULL DEFAULT 1")
+        ensure_column(db, "questions", "valid_to", "INT NULL")
+        ensure_column(db, "questions", "position", "INT NULL")
+        # set_id lookups (SQLite has no implicit FK indexes; MySQL drops its own in favour of these)
+        ensure_index(db, "questions", "idx_questions_set", "set_id")
+
+        # Results table; set_name / set_version are a snapshot taken when the
+        # result is stored, so reads never join `sets` (see result_backfill.py)
+        db.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS results (
+                result_id {pk},
+                user_name VARCHAR(255),
+                set_id INT,
+                score INT,
+                total INT,
+                date_taken DATETIME,
+                set_name VARCHAR(255) NULL,
+                set_version INT NULL,
+                FOREIGN KEY (set_id) REFERENCES sets(set_id) ON DELETE CASCADE
+            )
+        """)
+        ensure_column(db, "results", "set_name", "VARCHAR(255) NULL")
+        ensure_column(db, "results", "set_version", "INT NULL")
+        ensure_index(db, "results", "idx_results_date_taken", "date_taken")
+        ensure_index(db, "results", "idx_results_set", "set_id")
+        ensure_index(db, "results", "idx_results_user_date", "user_name, date_taken")
+
+        # Archived (cold) results + per-set totals (see results_archive.py)
+        db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS results_archive (
+                result_id INT PRIMARY KEY,
+                user_name VARCHAR(255),
+                set_id INT,
+                score INT,
+                total INT,
+                date_taken DATETIME,
+                set_name VARCHAR(255) NULL,
+                set_version INT NULL
+            )
+        """)
+        ensure_column(db, "results_archive", "set_name", "VARCHAR(255) NULL")
+        ensure_column(db, "results_archive", "set_version", "INT NULL")
+        ensure_index(db, "results_archive", "idx_archive_user_date", "user_name, date_taken")
+        ensure_index(db, "results_archive", "idx_archive_set", "set_id")
+        db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS results_archive_totals (
+                set_id INT PRIMARY KEY,
+                attempts INT NOT NULL DEFAULT 0,
+                ratio_sum DOUBLE NOT NULL DEFAULT 0
+            )
+        """)
+
+        # Per-user, per-set history summary, kept up to date by insert_result(s);
+        # filled from existing results (hot + archived) the first time it is created
+        fresh = not db.dialect.has_column(db, "user_summary", "user_name")
+        db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS user_summary (
+                user_name VARCHAR(255) NOT NULL,
+                set_id INT NOT NULL,
+                attempts INT NOT NULL DEFAULT 0,
+                graded INT NOT NULL DEFAULT 0,
+                ratio_sum DOUBLE NOT NULL DEFAULT 0,
+                best_ratio DOUBLE NULL,
+                last_taken DATETIME NULL,
+                PRIMARY KEY (user_name, set_id)
+            )
+        """)
+        if fresh:
+            rebuild_user_summary(db)
+
+        # Per-set score histograms (1% bins), kept up to date by insert_result(s);
+        # filled from existing results the first time it is created (see score_stats.py)
+        fresh = not db.dialect.has_column(db, "score_sketch", "set_id")
+        db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS score_sketch (
+                set_id INT NOT NULL,
+                bin INT NOT NULL,
+                n INT NOT NULL DEFAULT 0,
+                PRIMARY KEY (set_id, bin)
+            )
+        """)
+        if fresh:
+            rebuild_score_sketch(db)
+
+        # Daily / weekly trend rollups, filled incrementally (see rollups.py)
+        db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS rollup_state (
+                name VARCHAR(32) PRIMARY KEY,
+                last_id BIGINT NOT NULL DEFAULT 0,
+                horizon BIGINT NOT NULL DEFAULT 0,
+                updated_at DATETIME NULL
+            )
+        """)
+        for table, key in (("rollup_set", "set_id INT NOT NULL"), ("rollup_user", "user_name VARCHAR(255) NOT NULL")):
+            db.cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    {key},
+                    period CHAR(1) NOT NULL,
+                    period_start DATE NOT NULL,
+                    attempts INT NOT NULL DEFAULT 0,
+                    graded INT NOT NULL DEFAULT 0,
+                    ratio_sum DOUBLE NOT NULL DEFAULT 0,
+                    PRIMARY KEY ({key.split()[0]}, period, period_start)
+                )
+            """)
+
+        # Per-site secrets generated on first use (see site_secret())
+        db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS site_secrets (
+                name VARCHAR(32) PRIMARY KEY,
+                value VARCHAR(128) NOT NULL
+            )
+        """)
+
+        # Change feed (see change_feed.py)
+        db.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS changes (
+                seq {db.dialect.autoinc_bigpk},
+                table_name VARCHAR(32) NOT NULL,
+                row_id INT,
+                op VARCHAR(8) NOT NULL,
+                changed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        ensure_index(db, "changes", "idx_changes_table_seq", "table_name, seq")
+
+        # Live exam monitor (see exam_monitor.py)
+        db.cursor.execute("""
+            CREATE TABLE IF NOT EXISTS attempt_progress (
+                user_name VARCHAR(255) PRIMARY KEY,
+                set_id INT,
+                question_index INT,
+                total INT,
+                started_at DATETIME,
+                last_seen DATETIME
+            )
+        """)
+        ensure_index(db, "attempt_progress", "idx_progress_last_seen", "last_seen")
+
+        # Timed / resumable attempts (see attempts.py)
+        db.cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS attempts (
+                attempt_id {pk},
+                user_name VARCHAR(255) NOT NULL,
+                set_id INT,
+                status VARCHAR(12) NOT NULL DEFAULT 'active',
+                started_at DATETIME NOT NULL,
+                deadline DATETIME NULL,
+                finished_at DATETIME NULL,
+                current_index INT NOT NULL DEFAULT 0,
+                score INT NOT NULL DEFAULT 0,
+                total INT NOT NULL DEFAULT 0,
+                answers TEXT,
+                FOREIGN KEY (set_id) REFERENCES sets(set_id) ON DELETE CASCADE
+            )
+        """)
+        ensure_column(db, "attempts", "answers", "TEXT")
+        ensure_column(db, "attempts", "set_version", "INT NULL")  # pinned set version
+        ensure_column(db, "attempts", "question_time", "INT NULL")  # per-question limit at start
+        ensure_column(db, "attempts", "question_started_at", "DATETIME NULL")  # current question opened
+        ensure_column(db, "attempts", "late", "TEXT")  # JSON list of question indexes answered too late
+        ensure_index(db, "attempts", "idx_attempts_status_deadline", "status, deadline")
+        ensure_index(db, "attempts", "idx_attempts_user_status", "user_name, status")
+        ensure_index(db, "attempts", "idx_attempts_set", "set_id")
+
+        site_secret(db, "qr")  # created here, never from inside another caller's transaction
+
+        # Housekeeping
+        prune_changes(db)
+        purge_stale_progress(db)
+
+
+# ===========================
+# REPOSITORY
+# ===========================
+# Hot paths (hit by every examinee) go through db.prepared(); admin-only
+# queries use the plain cursor.
+
+SQL_USER_PIN = "SELECT pin FROM users WHERE user_name=%s"
+SQL_INSERT_USER = "INSERT INTO users (user_name, pin) VALUES (%s, %s)"
+SQL_LIST_SETS = "SELECT set_id, set_name FROM sets WHERE deleted_at IS NULL ORDER BY set_id DESC"
+SQL_QUIZ_QUESTIONS = """
+    SELECT question_id, question_text, answer, qtype, options, correct_mask
+    FROM questions WHERE set_id=%s AND valid_from <= %s AND (valid_to IS NULL OR valid_to > %s)
+    ORDER BY COALESCE(position, question_id), question_id
+"""
+SQL_SET_VERSION = "SELECT version FROM sets WHERE set_id=%s AND deleted_at IS NULL"
+# snapshot of the set's name / version taken in the same statement
+# (the version is the attempt's pinned one when given, else the current one)
+SQL_INSERT_RESULT = """
+    INSERT INTO results (user_name, set_id, score, total, date_taken, set_name, set_version)
+    SELECT %s, set_id, %s, %s, %s, set_name, COALESCE(%s, version) FROM sets WHERE set_id = %s
+"""
+SQL_USER_RESULTS = """
+    SELECT set_name, score, total, date_taken FROM results WHERE user_name = %s
+    UNION ALL
+    SELECT set_name, score, total, date_taken FROM results_archive WHERE user_name = %s
+    ORDER BY date_taken DESC
+"""
+SQL_USER_SUMMARY = """
+    SELECT u.set_id, s.set_name, u.attempts, u.graded, u.ratio_sum, u.best_ratio, u.last_taken
+    FROM user_summary u LEFT JOIN sets s ON s.set_id = u.set_id
+    WHERE u.user_name = %s
+    ORDER BY u.last_taken DESC
+"""
+SQL_RESULT_ROWS = """
+    SELECT r.result_id, r.user_name, r.set_name, r.score, r.total, r.date_taken
+    FROM results r
+"""
+
+
+def _run(cur, sql, params=()):
+    cur.execute(sql, params)
+    return cur
+
+
+def _in_clause(values):
+    return ", ".join(["%s"] * len(values))
+
+
+# ---------------------------
+# Users
+# ---------------------------
+def get_user_pin(db, user_name):
+    rows = _run(db.prepared(SQL_USER_PIN), SQL_USER_PIN, (user_name,)).fetchall()
+    return rows[0][0] if rows else None
+
+
+def insert_user(db, user_name, pin):
+    cur = _run(db.prepared(SQL_INSERT_USER), SQL_INSERT_USER, (user_name, pin))
+    user_id = cur.lastrowid
+    record_change(db, "users", user_id, "insert")
+    return user_id
+
+
+def list_users(db):
+    return _run(db.cursor, "SELECT user_id, user_name, pin FROM users ORDER BY user_id DESC").fetchall()
+
+
+def update_user_pin(db, user_id, pin):
+    db.cursor.execute("UPDATE users SET pin=%s WHERE user_id=%s", (pin, user_id))
+    record_change(db, "users", user_id, "update")
+
+
+def delete_user(db, user_id):
+    db.cursor.execute("DELETE FROM users WHERE user_id=%s", (user_id,))
+    record_change(db, "users", user_id, "delete")
+
+
+# ---------------------------
+# Sets
+# ---------------------------
+def list_sets(db):
+    """(set_id, set_name), newest first."""
+    return _run(db.prepared(SQL_LIST_SETS), SQL_LIST_SETS).fetchall()
+
+
+def count_sets(db):
+    return _run(db.cursor, "SELECT COUNT(*) FROM sets WHERE deleted_at IS NULL").fetchone()[0] or 0
+
+
+def insert_set(db, set_name, date_created, time_limit_sec=None, question_time_sec=None):
+    db.cursor.execute(
+        "INSERT INTO sets (set_name, date_created, time_limit_sec, question_time_sec) VALUES (%s, %s, %s, %s)",
+        (set_name, date_created, time_limit_sec or None, question_time_sec or None)
+    )
+    set_id = db.cursor.lastrowid
+    record_change(db, "sets", set_id, "insert")
+    return set_id
+
+
+def delete_set(db, set_id):
+    """Soft delete: hidden from every list, history (results, attempts) untouched.
+
+    The name gets a "(deleted #id)" suffix so it can be reused by a new set.
+    """
+    row = _run(db.cursor, "SELECT set_name FROM sets WHERE set_id=%s AND deleted_at IS NULL",
+               (set_id,)).fetchone()
+    if row is None:
+        return
+    suffix = f" (deleted #{set_id})"
+    db.cursor.execute(
+        f"UPDATE sets SET deleted_at={db.dialect.now}, set_name=%s WHERE set_id=%s",
+        (row[0][:255 - len(suffix)] + suffix, set_id)
+    )
+    record_change(db, "sets", set_id, "delete")
+
+
+def list_deleted_sets(db):
+    """(set_id, set_name, deleted_at) of soft-deleted sets, newest deletion first."""
+    return _run(db.cursor, """
+        SELECT set_id, set_name, deleted_at FROM sets
+        WHERE deleted_at IS NOT NULL ORDER BY deleted_at DESC
+    """).fetchall()
+
+
+def set_averages(db):
+    """(set_id, set_name, avg_percent or None) for every live set.
+
+    Hot rows are averaged from `results`; archived rows come pre-summed from
+    results_archive_totals, so the archive itself is never scanned.
+    """
+    return _run(db.cursor, """
+        SELECT s.set_id, s.set_name,
+               (COALESCE(h.ratio_sum, 0) + COALESCE(a.ratio_sum, 0)) * 100
+               / NULLIF(COALESCE(h.attempts, 0) + COALESCE(a.attempts, 0), 0)
+        FROM sets s
+        LEFT JOIN (SELECT set_id, SUM(score * 1.0 / NULLIF(total, 0)) AS ratio_sum,
+                          COUNT(score * 1.0 / NULLIF(total, 0)) AS attempts
+                   FROM results GROUP BY set_id) h ON h.set_id = s.set_id
+        LEFT JOIN results_archive_totals a ON a.set_id = s.set_id
+        WHERE s.deleted_at IS NULL
+        ORDER BY s.set_id DESC
+    """).fetchall()
+
+
+# ---------------------------
+# Questions
+# ---------------------------
+def set_version(db, set_id):
+    """Current version of a set, or None when it does not exist or is deleted (no new attempts)."""
+    row = _run(db.prepared(SQL_SET_VERSION), SQL_SET_VERSION, (set_id,)).fetchone()
+    return row[0] if row else None
+
+
+def get_quiz_questions(db, set_id, version=None):
+    """(question_id, question_text, answer, qtype, options, correct_mask) in stable order.
+
+    `version` pins the set version (attempts); None reads the current one.
+    Rows of a version never change, so (set_id, version) is a safe cache key.
+    """
+    if version is None:
+        version = set_version(db, set_id)
+        if version is None:
+            return []
+    return _run(db.prepared(SQL_QUIZ_QUESTIONS), SQL_QUIZ_QUESTIONS,
+                (set_id, version, version)).fetchall()
+
+
+def list_questions(db, set_id):
+    """Questions of the current version (manage pages)."""
+    return _run(db.cursor, """
+        SELECT question_id, question_text, answer, qtype, options, correct_mask
+        FROM questions WHERE set_id=%s AND valid_to IS NULL
+        ORDER BY COALESCE(position, question_id), question_id
+    """, (set_id,)).fetchall()
+
+
+def next_version(db, set_id):
+    """Open the set's next version (row-locks the set until commit); returns it."""
+    db.cursor.execute("UPDATE sets SET version = version + 1 WHERE set_id=%s", (set_id,))
+    db.cursor.execute("SELECT version FROM sets WHERE set_id=%s", (set_id,))
+    return db.cursor.fetchone()[0]
+
+
+def insert_question(db, set_id, question_text, answer, qtype="text", options=None, correct_mask=0):
+    """Add a question to the set's next version; earlier versions don't see it."""
+    version = next_version(db, set_id)
+    db.cursor.execute(
+        "INSERT INTO questions (set_id, question_text, answer, qtype, options, correct_mask, valid_from) "
+        "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+        (set_id, question_text, answer, qtype, options, correct_mask, version)
+    )
+    q_id = db.cursor.lastrowid
+    record_change(db, "questions", q_id, "insert")
+    return q_id
+
+
+def insert_questions(db, set_id, rows):
+    """rows: (question_text, answer, qtype, options, correct_mask) of a new set (version 1); one executemany."""
+    if not rows:
+        return
+    db.cursor.executemany(
+        "INSERT INTO questions (set_id, question_text, answer, qtype, options, correct_mask) "
+        "VALUES (%s, %s, %s, %s, %s, %s)",
+        [(set_id,) + tuple(r) for r in rows]
+    )
+    record_change(db, "questions", None, "insert")
+
+
+def _current_question(db, question_id):
+    db.cursor.execute(
+        "SELECT set_id, COALESCE(position, question_id), question_text, answer, qtype, options, correct_mask "
+        "FROM questions WHERE question_id=%s AND valid_to IS NULL",
+        (question_id,)
+    )
+    row = db.cursor.fetchone()
+    if row is None:
+        raise ValueError("This question was changed or deleted meanwhile; reload the set.")
+    return row
+
+
+def update_question(db, question_id, question_text, answer, qtype="text", options=None, correct_mask=0):
+    """Copy-on-write edit: the set gets a new version in which only this question
+    is a new row (same position); returns the new question_id.
+
+    Attempts pinned to an older version keep grading against the old row.
+    """
+    set_id, position = _current_question(db, question_id)[:2]
+    version = next_version(db, set_id)
+    db.cursor.execute("UPDATE questions SET valid_to=%s WHERE question_id=%s", (version, question_id))
+    db.cursor.execute(
+        "INSERT INTO questions (set_id, question_text, answer, qtype, options, correct_mask, "
+        "valid_from, position) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+        (set_id, question_text, answer, qtype, options, correct_mask, version, position)
+    )
+    new_id = db.cursor.lastrowid
+    record_changes(db, "questions", [question_id, new_id], "update")
+    return new_id
+
+
+def update_question_text(db, question_id, question_text, answer):
+    """Text-only edit (legacy panels): keeps qtype / options untouched."""
+    _, _, _, _, qtype, options, correct_mask = _current_question(db, question_id)
+    return update_question(db, question_id, question_text, answer, qtype, options, correct_mask)
+
+
+def delete_questions(db, question_ids, chunk=DELETE_CHUNK):
+    """Multi-select delete: retires the questions in one new version per set,
+    one UPDATE ... WHERE question_id IN (...) per `chunk` ids.
+
+    Rows stay for attempts pinned to older versions; set_purge.py removes them
+    with the set.
+    """
+    ids = list(question_ids)
+    by_set = {}
+    for i in range(0, len(ids), chunk):
+        part = tuple(ids[i:i + chunk])
+        db.cursor.execute(
+            f"SELECT question_id, set_id FROM questions WHERE valid_to IS NULL "
+            f"AND question_id IN ({_in_clause(part)})", part)
+        for q_id, set_id in db.cursor.fetchall():
+            by_set.setdefault(set_id, []).append(q_id)
+    for set_id, q_ids in by_set.items():
+        version = next_version(db, set_id)
+        for i in range(0, len(q_ids), chunk):
+            part = tuple(q_ids[i:i + chunk])
+            db.cursor.execute(
+                f"UPDATE questions SET valid_to=%s WHERE question_id IN ({_in_clause(part)})",
+                (version,) + part)
+    record_changes(db, "questions", ids, "delete")
+
+
+# ---------------------------
+# Results
+# ---------------------------
+def insert_result(db, user_name, set_id, score, total, date_taken, version=None):
+    cur = _run(db.prepared(SQL_INSERT_RESULT), SQL_INSERT_RESULT,
+               (user_name, score, total, date_taken, version, set_id))
+    result_id = cur.lastrowid
+    if cur.rowcount == 1:
+        add_to_summary(db, [(user_name, set_id, score, total, date_taken)])
+        add_to_sketch(db, [(user_name, set_id, score, total)])
+    record_change(db, "results", result_id, "insert")
+    return result_id
+
+
+def insert_results(db, rows):
+    """rows: (user_name, set_id, score, total, date_taken[, version]); one executemany.
+
+    Like insert_result(), rows whose set is gone store nothing and are kept
+    out of the summaries; the sets are row-locked so the check holds until
+    commit. Should the row count still disagree, the affected summaries and
+    sketches are rebuilt from `results` instead.
+    """
+    set_ids = tuple({r[1] for r in rows if r[1] is not None})
+    if not set_ids:
+        return
+    db.cursor.execute(f"SELECT set_id FROM sets WHERE set_id IN ({_in_clause(set_ids)}) {db.dialect.for_update}",
+                      set_ids)
+    live = {row[0] for row in db.cursor.fetchall()}
+    rows = [r for r in rows if r[1] in live]
+    if not rows:
+        return
+    db.cursor.executemany(SQL_INSERT_RESULT, [(r[0], r[2], r[3], r[4], r[5] if len(r) > 5 else None, r[1])
+                                              for r in rows])
+    if db.cursor.rowcount == len(rows):
+        add_to_summary(db, rows)
+        add_to_sketch(db, rows)
+    else:
+        for user_name in {r[0] for r in rows}:
+            rebuild_user_summary(db, user_name)
+        for set_id in {r[1] for r in rows}:
+            rebuild_score_sketch(db, set_id)
+    record_change(db, "results", None, "insert")
+
+
+def count_result_users(db):
+    """Distinct users with a result, hot or archived."""
+    return _run(db.cursor, """
+        SELECT COUNT(user_name) FROM (SELECT user_name FROM results
+                              UNION SELECT user_name FROM results_archive) u
+    """).fetchone()[0] or 0
+
+
+def list_results(db, limit=None):
+    """(result_id, user_name, set_name snapshot or None, score, total, date_taken), newest first.
+
+    `limit` caps the rows returned (the newest ones); None returns everything.
+    """
+    if limit is None:
+        return _run(db.cursor, SQL_RESULT_ROWS + " ORDER BY r.date_taken DESC").fetchall()
+    return _run(db.cursor, SQL_RESULT_ROWS + " ORDER BY r.date_taken DESC LIMIT %s", (limit,)).fetchall()
+
+
+def results_by_ids(db, result_ids):
+    if not result_ids:
+        return []
+    return _run(db.cursor, SQL_RESULT_ROWS + f" WHERE r.result_id IN ({_in_clause(result_ids)}) ORDER BY r.date_taken",
+                tuple(result_ids)).fetchall()
+
+
+def result_by_id(db, result_id):
+    """(result_id, user_name, set_name, score, total, date_taken) from either table, or None."""
+    return _run(db.cursor, """
+        SELECT result_id, user_name, set_name, score, total, date_taken FROM results WHERE result_id = %s
+        UNION ALL
+        SELECT result_id, user_name, set_name, score, total, date_taken FROM results_archive WHERE result_id = %s
+    """, (result_id, result_id)).fetchone()
+
+
+def user_results_page(db, user_name, before=None, limit=50):
+    """One page of a user's history (hot + archived), newest first.
+
+    Rows are (result_id, set_name, score, total, date_taken); `before` is the
+    (date_taken, result_id) of the last row of the previous page. Each table
+    is read through its (user_name, date_taken) index, `limit` rows at most.
+    """
+    where, params = "user_name = %s", [user_name]
+    if before is not None:
+        where += " AND (date_taken < %s OR (date_taken = %s AND result_id < %s))"
+        params += [before[0], before[0], before[1]]
+    page = f"""
+        SELECT result_id, set_name, score, total, date_taken FROM {{table}}
+        WHERE {where} ORDER BY date_taken DESC, result_id DESC LIMIT %s
+    """
+    return _run(db.cursor, f"""
+        SELECT * FROM ({page.format(table='results')}) h
+        UNION ALL
+        SELECT * FROM ({page.format(table='results_archive')}) a
+        ORDER BY date_taken DESC, result_id DESC
+        LIMIT %s
+    """, tuple(params + [limit] + params + [limit, limit])).fetchall()
+
+
+def user_results(db, user_name):
+    """(set_name, score, total, date_taken) for one user (hot + archived), newest first."""
+    return _run(db.prepared(SQL_USER_RESULTS), SQL_USER_RESULTS, (user_name, user_name)).fetchall()
+
+
+# ---------------------------
+# Per-user summary
+# ---------------------------
+def add_to_summary(db, rows):
+    """rows: (user_name, set_id, score, total, date_taken, ...) of newly stored results."""
+    if not rows:
+        return
+    d = db.dialect
+    values = []
+    for r in rows:
+        user_name, set_id, score, total, taken = r[:5]
+        ratio = score / total if score is not None and total else None
+        values.append((user_name, set_id, 0 if ratio is None else 1, ratio or 0.0, ratio, taken))
+    db.cursor.executemany(f"""
+        INSERT INTO user_summary (user_name, set_id, attempts, graded, ratio_sum, best_ratio, last_taken)
+        VALUES (%s, %s, 1, %s, %s, %s, %s)
+        {d.upsert('user_name, set_id')}
+            attempts = attempts + 1,
+            graded = graded + {d.inserted('graded')},
+            ratio_sum = ratio_sum + {d.inserted('ratio_sum')},
+            best_ratio = {d.iif}(COALESCE({d.inserted('best_ratio')}, -1) > COALESCE(best_ratio, -1),
+                                 {d.inserted('best_ratio')}, best_ratio),
+            last_taken = {d.iif}({d.inserted('last_taken')} > COALESCE(last_taken, {d.inserted('last_taken')}),
+                                 {d.inserted('last_taken')}, COALESCE(last_taken, {d.inserted('last_taken')}))
+    """, values)
+
+
+def rebuild_user_summary(db, user_name=None):
+    """Recompute summaries from the results tables (one user, or everyone)."""
+    where, params = ("WHERE user_name = %s", (user_name,) * 3) if user_name else ("", ())
+    db.cursor.execute(f"DELETE FROM user_summary {where}", params[:1])
+    db.cursor.execute(f"""
+        INSERT INTO user_summary (user_name, set_id, attempts, graded, ratio_sum, best_ratio, last_taken)
+        SELECT user_name, set_id, COUNT(*), COUNT(ratio), COALESCE(SUM(ratio), 0), MAX(ratio), MAX(date_taken)
+        FROM (SELECT user_name, set_id, score * 1.0 / NULLIF(total, 0) AS ratio, date_taken
+              FROM results {where}
+              UNION ALL
+              SELECT user_name, set_id, score * 1.0 / NULLIF(total, 0), date_taken
+              FROM results_archive {where}) r
+        WHERE user_name IS NOT NULL AND set_id IS NOT NULL
+        GROUP BY user_name, set_id
+    """, params[1:])
+
+
+def user_summary(db, user_name):
+    """(set_id, set_name, attempts, graded, ratio_sum, best_ratio, last_taken) per set, last taken first."""
+    return _run(db.prepared(SQL_USER_SUMMARY), SQL_USER_SUMMARY, (user_name,)).fetchall()
+
+
+# ---------------------------
+# Score sketches (per-set histograms)
+# ---------------------------
+SKETCH_BINS = 101  # bin i = [i%, i+1%); bin 100 = full marks
+
+
+def score_bin(score, total):
+    """Sketch bin of a graded result, None when ungraded."""
+    if score is None or not total:
+        return None
+    return min(max(score * 100 // total, 0), SKETCH_BINS - 1)
+
+
+def add_to_sketch(db, rows):
+    """rows: (user_name, set_id, score, total, ...) of newly stored results."""
+    counts = {}
+    for r in rows:
+        b = score_bin(r[2], r[3])
+        if b is not None and r[1] is not None:
+            counts[(r[1], b)] = counts.get((r[1], b), 0) + 1
+    if not counts:
+        return
+    d = db.dialect
+    db.cursor.executemany(f"""
+        INSERT INTO score_sketch (set_id, bin, n) VALUES (%s, %s, %s)
+        {d.upsert('set_id, bin')} n = n + {d.inserted('n')}
+    """, [(set_id, b, n) for (set_id, b), n in counts.items()])
+
+
+def rebuild_score_sketch(db, set_id=None):
+    """Recompute sketches from the results tables (one set, or all)."""
+    where, params = ("AND set_id = %s", (set_id,) * 3) if set_id is not None else ("", ())
+    db.cursor.execute(f"DELETE FROM score_sketch WHERE 1=1 {where}", params[:1])
+    bin_expr = f"""CASE WHEN score >= total THEN {SKETCH_BINS - 1} WHEN score <= 0 THEN 0
+                        ELSE score * 100 {db.dialect.int_div} total END"""
+    db.cursor.execute(f"""
+        INSERT INTO score_sketch (set_id, bin, n)
+        SELECT set_id, b, COUNT(*)
+        FROM (SELECT set_id, {bin_expr} AS b FROM results
+              WHERE total > 0 AND score IS NOT NULL AND set_id IS NOT NULL {where}
+              UNION ALL
+              SELECT set_id, {bin_expr} FROM results_archive
+              WHERE total > 0 AND score IS NOT NULL AND set_id IS NOT NULL {where}) r
+        GROUP BY set_id, b
+    """, params[1:])
+
+
+def score_sketches(db, set_ids=None):
+    """[(set_id, bin, n)] for the given sets (or all), ordered by set and bin."""
+    if set_ids is None:
+        db.cursor.execute("SELECT set_id, bin, n FROM score_sketch ORDER BY set_id, bin")
+    else:
+        ids = tuple(set_ids)
+        if not ids:
+            return []
+        db.cursor.execute(f"SELECT set_id, bin, n FROM score_sketch WHERE set_id IN ({_in_clause(ids)})"
+                          " ORDER BY set_id, bin", ids)
+    return db.cursor.fetchall()
+
+
+# ---------------------------
+# Site secrets
+# ---------------------------
+def site_secret(db, name):
+    """This site's random secret `name`, created on first use (every process then reads the same one)."""
+    db.cursor.execute("SELECT value FROM site_secrets WHERE name=%s", (name,))
+    row = db.cursor.fetchone()
+    if row is None:
+        db.cursor.execute(f"""
+            INSERT INTO site_secrets (name, value) VALUES (%s, %s)
+            {db.dialect.upsert('name')} name = name
+        """, (name, secrets.token_hex(32)))  # a concurrent first use wins; both read its value back
+        db.cursor.execute("SELECT value FROM site_secrets WHERE name=%s", (name,))
+        row = db.cursor.fetchone()
+    return row[0]
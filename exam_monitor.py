@@ -0,0 +1,113 @@
+"""
+E-XAM live exam-room monitor
+- `attempt_progress`: one row per examinee currently in a quiz
+- Clients push heartbeats into a HeartbeatBatcher; pushes only overwrite the
+  latest state in memory, flush() writes all pending rows with one executemany
+- Timestamps come from the database clock (db.dialect.now), not the
+  workstation clock
+
+Table DDL lives in exam_db.create_tables(). No tkinter import here.
+"""
+import time
+
+import exam_config
+
+HEARTBEAT_KEEPALIVE = exam_config.getint("monitor", "heartbeat_keepalive")  # seconds: rewrite an unchanged row this often
+ACTIVE_WINDOW = exam_config.getint("monitor", "active_window")  # seconds: rows older than this are shown as gone
+
+
+# ---------------------------
+# Client side: coalescing + batched flush
+# ---------------------------
+class HeartbeatBatcher:
+    """Keeps the newest progress per user and writes it in batches.
+
+    push() is free (dict assignment), so it can be called on every UI event.
+    flush(db) writes only users whose state changed, plus unchanged users whose
+    last write is older than `keepalive` seconds.
+    """
+
+    def __init__(self, keepalive=HEARTBEAT_KEEPALIVE):
+        self.keepalive = keepalive
+        self.pending = {}   # user_name -> (set_id, question_index, total)
+        self.written = {}   # user_name -> (state, monotonic time of last write)
+
+    def push(self, user_name, set_id, question_index, total):
+        self.pending[user_name] = (set_id, question_index, total)
+
+    def discard(self, user_name):
+        self.pending.pop(user_name, None)
+        self.written.pop(user_name, None)
+
+    def due(self, now=None):
+        now = time.monotonic() if now is None else now
+        rows = []
+        for user_name, state in self.pending.items():
+            last = self.written.get(user_name)
+            if last is None or last[0] != state or now - last[1] >= self.keepalive:
+                rows.append((user_name,) + state)
+        return rows
+
+    def mark_written(self, rows, now=None):
+        """Record rows from due() as stored (by flush() or a caller that wrote them itself)."""
+        now = time.monotonic() if now is None else now
+        for row in rows:
+            self.written[row[0]] = (row[1:], now)
+
+    def flush(self, db):
+        """Write due rows; returns how many rows were written."""
+        now = time.monotonic()
+        rows = self.due(now)
+        if not rows:
+            return 0
+        write_heartbeats(db, rows)
+        self.mark_written(rows, now)
+        return len(rows)
+
+
+def write_heartbeats(db, rows):
+    """Upsert (user_name, set_id, question_index, total) rows with one executemany."""
+    if not rows:
+        return
+    d = db.dialect
+    db.cursor.executemany(f"""
+        INSERT INTO attempt_progress (user_name, set_id, question_index, total, started_at, last_seen)
+        VALUES (%s, %s, %s, %s, {d.now}, {d.now})
+        {d.upsert('user_name')}
+            started_at = {d.iif}(set_id {d.null_safe_eq} {d.inserted('set_id')}, started_at, {d.now}),
+            set_id = {d.inserted('set_id')},
+            question_index = {d.inserted('question_index')},
+            total = {d.inserted('total')},
+            last_seen = {d.now}
+    """, rows)
+
+
+def clear_progress(db, user_name):
+    """Attempt finished (or abandoned): drop the user's monitor row."""
+    db.cursor.execute("DELETE FROM attempt_progress WHERE user_name=%s", (user_name,))
+
+
+def purge_stale_progress(db, older_than=24 * 3600):
+    """Remove rows of clients that vanished without finishing (indexed range delete)."""
+    db.cursor.execute(
+        f"DELETE FROM attempt_progress WHERE last_seen < {db.dialect.add_seconds(db.dialect.now, '-')}",
+        (older_than,)
+    )
+
+
+# ---------------------------
+# Admin side
+# ---------------------------
+def active_attempts(db, window=ACTIVE_WINDOW):
+    """(user_name, set_name, question_index, total, elapsed_s, idle_s), most recent first."""
+    d = db.dialect
+    db.cursor.execute(f"""
+        SELECT p.user_name, s.set_name, p.question_index, p.total,
+               {d.seconds_between('p.started_at', d.now)},
+               {d.seconds_between('p.last_seen', d.now)}
+        FROM attempt_progress p
+        LEFT JOIN sets s ON p.set_id = s.set_id
+        WHERE p.last_seen >= {d.add_seconds(d.now, '-')}
+        ORDER BY p.last_seen DESC
+    """, (window,))
+    return db.cursor.fetchall()
@@ -0,0 +1,698 @@
+#!/usr/bin/env python3
+"""
+E-XAM LAN exam server (asyncio HTTP/JSON, stdlib only)
+- Workstations talk HTTP to this box instead of opening their own MySQL
+  connections; only the server holds DB credentials and connections
+- Shared in-memory caches: the set list and each set's current version are
+  dropped when the change feed reports a `sets` / `questions` change;
+  question packs are keyed by (set_id, version), never change and are only
+  evicted (LRU). Concurrent misses share one load
+- Attempts pin the set version they started on; grading uses that version
+- Batched writes: monitor heartbeats, checkpoints and finishes are queued
+  and committed together by one writer task (group commit); a finish
+  request waits for the batch that stores it
+- Grading happens here: clients never receive correct answers
+- Blocking DB calls run on a bounded thread pool ([server] db_workers)
+
+Endpoints (JSON bodies; all but /login and /r/ need "Authorization: Bearer <token>"):
+    POST /login                   {"user_name", "pin"} -> {"outcome", "token"}
+    GET  /sets                    [[set_id, set_name], ...]
+    GET  /sets/<id>               {"set_id", "version", "time_limit", "question_time", "questions"}
+    POST /attempts                {"set_id"} -> attempt (version, questions, remaining, ...)
+    GET  /attempts/pending        pending attempt or null
+    POST /attempts/<id>/resume    attempt + saved index / score / answers
+    POST /attempts/<id>/progress  {"index", "answers"?} (heartbeat + checkpoint)
+    POST /attempts/<id>/finish    {"answers"} -> {"accepted", "score", "total", "token"}
+    POST /attempts/<id>/abandon
+    GET  /results                 my results, newest first
+    GET  /results/page?cursor=&limit=  {"rows", "next"} (cursor pages, newest first)
+    GET  /results/summary         {"attempts", "average", "sets"} (per-set best / average)
+    GET  /r/<token>               result behind a signed QR code (no login; see result_qr.py)
+
+The client side is exam_api.py ([client] api_url).
+
+    python exam_server.py [--host 0.0.0.0] [--port 8765]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import re
+import secrets
+import signal
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from urllib.parse import parse_qsl
+
+import exam_config
+import exam_db
+import exam_services
+from exam_db import Database, DB_ERRORS, create_tables
+from attempts import (start_attempt, finish_attempt, abandon_attempt, get_attempt,
+                      get_time_limits, save_checkpoint, mark_late, drop_late)
+from change_feed import ChangeTail
+from exam_monitor import HeartbeatBatcher, clear_progress, write_heartbeats
+from exam_services import QuizSession, load_pack
+from question_types import grade
+from result_qr import make_token, qr_secret, verify_token
+
+SERVER_HOST = exam_config.get("server", "host")
+SERVER_PORT = exam_config.getint("server", "port")
+DB_WORKERS = exam_config.getint("server", "db_workers")            # concurrent blocking DB calls
+WRITE_FLUSH_MS = exam_config.getint("server", "write_flush_ms")    # heartbeat / checkpoint batch interval
+CHANGE_POLL_MS = exam_config.getint("server", "change_poll_ms")    # cache invalidation poll
+IDLE_TIMEOUT = exam_config.getint("server", "idle_timeout")        # seconds a keep-alive connection may sit idle
+SESSION_TTL = exam_config.getint("server", "session_ttl")          # seconds a login token stays valid unused
+MAX_BODY = exam_config.getint("server", "max_body")                # bytes
+PACK_CACHE_SIZE = exam_config.getint("server", "pack_cache_size")  # set versions kept in memory
+FINISHED_KEEP = 1000  # recent finish outcomes kept to answer a retried POST /finish
+
+log = logging.getLogger("exam.server")
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 403: "Forbidden",
+               404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HttpError(Exception):
+    def __init__(self, status, message=None):
+        super().__init__(message or STATUS_TEXT.get(status, ""))
+        self.status = status
+
+
+# ---------------------------
+# HTTP plumbing (just enough HTTP/1.1: keep-alive, Content-Length bodies)
+# ---------------------------
+async def read_request(reader, max_body=MAX_BODY):
+    """(method, path, headers, body) or None when the client closed the connection."""
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, path, version = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    headers[":version"] = version
+    length = headers.get("content-length") or "0"
+    if not (length.isascii() and length.isdigit()):
+        raise HttpError(400, "Malformed Content-Length")
+    length = int(length)
+    if length > max_body:
+        raise HttpError(413)
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+def encode_response(status, payload, keep_alive):
+    body = json.dumps(payload, default=str).encode()
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+def wants_keep_alive(headers):
+    connection = headers.get("connection", "").lower()
+    if headers.get(":version") == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+# ---------------------------
+# Shared caches
+# ---------------------------
+class SetContent:
+    """One set version as the server grades it; `public` is what clients may see."""
+
+    def __init__(self, set_id, version, questions, time_limit, question_time):
+        self.set_id = set_id
+        self.version = version
+        self.questions = questions  # (question_id, text, answer, qtype, options, correct_mask)
+        self.time_limit = time_limit
+        self.question_time = question_time
+        self.public = [[q[0], q[1], q[3], q[4]] for q in questions]
+
+    def score(self, answers):
+        return sum(1 for q, given in zip(self.questions, answers) if grade(q[3], q[5], q[2], given))
+
+
+def load_set_content(set_id, version):
+    with Database() as db:
+        questions = load_pack(db, set_id, version) if version is not None else []
+        time_limit, question_time = get_time_limits(db, set_id)
+    return SetContent(set_id, version, questions, time_limit, question_time)
+
+
+def load_set_version(set_id):
+    with Database() as db:
+        return exam_db.set_version(db, set_id)
+
+
+def load_set_list():
+    with Database() as db:
+        return exam_db.list_sets(db)
+
+
+class SharedCache:
+    """key -> value loaded once on the DB pool; concurrent misses await the same load.
+
+    clear() bumps a generation so a load that started before the change is
+    not stored afterwards. With `size`, the least recently used entries are
+    evicted beyond that many.
+    """
+
+    def __init__(self, server, size=None):
+        self.server = server
+        self.size = size
+        self.values = OrderedDict()
+        self.loading = {}
+        self.generation = 0
+        self.hits = self.misses = 0
+
+    async def get(self, key, loader, *args):
+        if key in self.values:
+            self.hits += 1
+            self.values.move_to_end(key)
+            return self.values[key]
+        task = self.loading.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self.load(key, loader, args))
+            self.loading[key] = task
+        return await task
+
+    async def load(self, key, loader, args):
+        generation = self.generation
+        try:
+            value = await self.server.run_db(loader, *args)
+        finally:
+            self.loading.pop(key, None)
+        if generation == self.generation:
+            self.values[key] = value
+            while self.size and len(self.values) > self.size:
+                self.values.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.values.clear()
+        self.generation += 1
+
+
+# ---------------------------
+# Write-behind (group commit)
+# ---------------------------
+def rule_answers(db, attempt_id, answers, content):
+    """(answers, score) after the attempt record's per-question time check."""
+    if content.question_time:
+        answers = drop_late(answers, mark_late(db, attempt_id, len(answers)))
+    return answers, content.score(answers)
+
+
+def write_checkpoint(db, attempt_id, index, answers, content):
+    answers, score = rule_answers(db, attempt_id, answers, content)
+    save_checkpoint(db, attempt_id, index, score, answers)
+
+
+def write_finish(db, attempt_id, user_name, set_id, version, answers, content):
+    result_id = None
+    total = len(content.questions)
+    answers, score = rule_answers(db, attempt_id, answers, content)
+    ok = finish_attempt(db, attempt_id, score, total)
+    if ok:
+        result_id = exam_db.insert_result(db, user_name, set_id, score, total, datetime.now(), version)
+    clear_progress(db, user_name)
+    return ok, result_id, score
+
+
+def isolated(db, func, *args):
+    """func(db, *args) inside a savepoint; on failure only its own writes are undone.
+
+    The block must already be in a transaction (db.dialect.begin()).
+
+    Returns the result, or the exception it raised. Errors from the rollback
+    itself (lost connection) propagate and fail the whole batch.
+    """
+    db.cursor.execute("SAVEPOINT batch_item")
+    try:
+        result = func(db, *args)
+    except Exception as e:
+        db.cursor.execute("ROLLBACK TO SAVEPOINT batch_item")
+        result = e
+    db.cursor.execute("RELEASE SAVEPOINT batch_item")
+    return result
+
+
+def write_batch(heartbeats, checkpoints, finishes):
+    """One transaction for everything queued, one savepoint per checkpoint / finish.
+
+    Returns (checkpoint errors {attempt_id: exception}, one outcome per
+    finish: (accepted, result_id, score) or the exception that item raised).
+    """
+    failed = {}
+    with Database() as db:
+        db.dialect.begin(db)  # SQLite: otherwise the first savepoint is the transaction
+        write_heartbeats(db, heartbeats)
+        for row in checkpoints:
+            error = isolated(db, write_checkpoint, *row)
+            if error is not None:
+                failed[row[0]] = error
+        outcomes = [isolated(db, write_finish, *row) for row in finishes]
+    return failed, outcomes
+
+
+class WriteBehind:
+    """Queues heartbeats, checkpoints and finishes; run() commits them in batches.
+
+    Heartbeats and checkpoints only keep the newest state per user / attempt
+    and are written every `flush_ms`; a queued finish wakes the writer at once
+    and everything that arrives while a commit is running rides in the next one.
+    Each checkpoint / finish has its own savepoint, so a bad one fails alone.
+    """
+
+    def __init__(self, server, flush_ms=WRITE_FLUSH_MS):
+        self.server = server
+        self.flush_s = flush_ms / 1000
+        self.heartbeat = HeartbeatBatcher()
+        self.checkpoints = {}  # attempt_id -> (index, answers, SetContent)
+        self.finishes = []     # (row, future)
+        self.wake = asyncio.Event()
+        self.batches = 0
+
+    def progress(self, attempt_id, user_name, set_id, index, total, answers=None, content=None):
+        self.heartbeat.push(user_name, set_id, index, total)
+        if answers is not None:
+            self.checkpoints[attempt_id] = (len(answers), answers, content)
+
+    def drop(self, attempt_id, user_name):
+        self.checkpoints.pop(attempt_id, None)
+        self.heartbeat.discard(user_name)
+
+    def finish(self, attempt_id, user_name, set_id, answers, content):
+        """Future of (accepted, result_id, score); graded in the write transaction."""
+        self.drop(attempt_id, user_name)
+        future = asyncio.get_running_loop().create_future()
+        self.finishes.append(((attempt_id, user_name, set_id, content.version, answers, content), future))
+        self.wake.set()
+        return future
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self.wake.wait(), self.flush_s)
+            except asyncio.TimeoutError:
+                pass
+            self.wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        now = time.monotonic()
+        heartbeats = self.heartbeat.due(now)
+        checkpoints, self.checkpoints = self.checkpoints, {}
+        finishes, self.finishes = self.finishes, []
+        if not (heartbeats or checkpoints or finishes):
+            return
+        try:
+            failed, outcomes = await self.server.run_db(
+                write_batch, heartbeats,
+                [(attempt_id,) + state for attempt_id, state in checkpoints.items()],
+                [row for row, _ in finishes])
+        except Exception as e:
+            log.warning("write batch failed: %s", e)
+            for attempt_id, state in checkpoints.items():
+                self.checkpoints.setdefault(attempt_id, state)  # retried next round
+            for _, future in finishes:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        self.batches += 1
+        self.heartbeat.mark_written(heartbeats, now)
+        for attempt_id, e in failed.items():
+            log.warning("checkpoint of attempt %s dropped: %s", attempt_id, e)  # the next one replaces it
+        for (_, future), outcome in zip(finishes, outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+
+# ---------------------------
+# Server
+# ---------------------------
+ROUTES = [
+    ("POST", re.compile(r"^/login$"), "login"),
+    ("GET", re.compile(r"^/sets$"), "list_sets"),
+    ("GET", re.compile(r"^/sets/(\d+)$"), "set_content"),
+    ("POST", re.compile(r"^/attempts$"), "start"),
+    ("GET", re.compile(r"^/attempts/pending$"), "pending"),
+    ("POST", re.compile(r"^/attempts/(\d+)/resume$"), "resume"),
+    ("POST", re.compile(r"^/attempts/(\d+)/progress$"), "progress"),
+    ("POST", re.compile(r"^/attempts/(\d+)/finish$"), "finish"),
+    ("POST", re.compile(r"^/attempts/(\d+)/abandon$"), "abandon"),
+    ("GET", re.compile(r"^/results$"), "my_results"),
+    ("GET", re.compile(r"^/results/page$"), "results_page"),
+    ("GET", re.compile(r"^/results/summary$"), "results_summary"),
+    ("GET", re.compile(r"^/r/([A-Za-z2-7]+)$"), "result_by_token"),
+]
+
+
+class ExamServer:
+    def __init__(self, db_workers=DB_WORKERS, flush_ms=WRITE_FLUSH_MS,
+                 change_poll_ms=CHANGE_POLL_MS, session_ttl=SESSION_TTL, pack_cache_size=PACK_CACHE_SIZE):
+        self.executor = ThreadPoolExecutor(max_workers=db_workers, thread_name_prefix="exam-db")
+        pool = exam_db.get_pool()
+        pool.size = max(pool.size, db_workers)  # keep one idle connection per worker
+        self.cache = SharedCache(self)                     # set list, current versions
+        self.packs = SharedCache(self, pack_cache_size)   # (set_id, version) -> SetContent
+        self.writer = None
+        self.tail = ChangeTail()
+        self.change_poll_s = change_poll_ms / 1000
+        self.flush_ms = flush_ms
+        self.session_ttl = session_ttl
+        self.sessions = {}  # token -> [user_name, last used (monotonic)]
+        self.attempts = {}  # attempt_id -> (user_name, set_id, version) for attempts in progress
+        self.finished = OrderedDict()  # attempt_id -> (user_name, finish task), newest last
+        self.requests = 0
+
+    async def run_db(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+
+    # background tasks
+    async def watch_changes(self):
+        """Drop the set list / current versions when sets or questions change; expire idle sessions."""
+        await self.run_db(self.sync_tail)
+        while True:
+            await asyncio.sleep(self.change_poll_s)
+            try:
+                delta = await self.run_db(self.poll_tail)
+            except DB_ERRORS as e:
+                log.warning("change feed poll failed: %s", e)
+                continue
+            if "sets" in delta or "questions" in delta:
+                self.cache.clear()
+            cutoff = time.monotonic() - self.session_ttl
+            for token in [t for t, (_, used) in self.sessions.items() if used < cutoff]:
+                del self.sessions[token]
+
+    def sync_tail(self):
+        with Database() as db:
+            self.tail.sync(db)
+
+    def poll_tail(self):
+        with Database() as db:
+            return self.tail.poll(db)
+
+    # connections
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), IDLE_TIMEOUT)
+                except HttpError as e:
+                    writer.write(encode_response(e.status, {"error": str(e)}, False))
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                status, payload = await self.dispatch(method, path, headers, body)
+                keep_alive = wants_keep_alive(headers)
+                writer.write(encode_response(status, payload, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, headers, body):
+        self.requests += 1
+        path, _, query = path.partition("?")
+        try:
+            for route_method, pattern, name in ROUTES:
+                match = pattern.match(path)
+                if not match:
+                    continue
+                if method != route_method:
+                    raise HttpError(405)
+                data = json.loads(body) if body else {}
+                if not isinstance(data, dict):
+                    raise ValueError("JSON object expected.")
+                data.update(parse_qsl(query))
+                if name == "login":
+                    return 200, await self.api_login(data)
+                if name == "result_by_token":  # the signed code is the credential
+                    return 200, await self.api_result_by_token(match.group(1))
+                user_name = self.authenticate(headers)
+                args = [int(g) for g in match.groups()]
+                return 200, await getattr(self, "api_" + name)(user_name, *args, data)
+            raise HttpError(404)
+        except HttpError as e:
+            return e.status, {"error": str(e)}
+        except (ValueError, TypeError) as e:
+            return 400, {"error": str(e)}
+        except DB_ERRORS as e:
+            log.warning("%s %s: %s", method, path, e)
+            return 503, {"error": f"Database error: {e}"}
+        except Exception:
+            log.exception("%s %s failed", method, path)
+            return 500, {"error": "Internal server error"}
+
+    def authenticate(self, headers):
+        token = headers.get("authorization", "").removeprefix("Bearer ").strip()
+        entry = self.sessions.get(token)
+        if entry is None:
+            raise HttpError(401, "Please log in again.")
+        entry[1] = time.monotonic()
+        return entry[0]
+
+    async def own_attempt(self, user_name, attempt_id):
+        """(user_name, set_id, version) of an active attempt of this user; 404 otherwise."""
+        owner = self.attempts.get(attempt_id)
+        if owner is None:
+            row = await self.run_db(attempt_row, attempt_id)
+            if row is None or row[2] != "active":
+                raise HttpError(404, "No such attempt in progress.")
+            owner = self.attempts[attempt_id] = (row[0], row[1], row[3])
+        if owner[0] != user_name:
+            raise HttpError(403, "Not your attempt.")
+        return owner
+
+    async def content(self, set_id, version=None):
+        """SetContent of a set version (None = the current one)."""
+        if version is None:
+            version = await self.cache.get(("version", set_id), load_set_version, set_id)
+        return await self.packs.get((set_id, version), load_set_content, set_id, version)
+
+    async def attempt_payload(self, attempt_id, set_id, version, remaining):
+        content = await self.content(set_id, version)
+        return {"attempt_id": attempt_id, "set_id": set_id, "version": content.version,
+                "remaining": remaining, "question_time": content.question_time,
+                "questions": content.public}
+
+    # endpoints
+    async def api_login(self, data):
+        user_name = (data.get("user_name") or "").strip()
+        outcome = await self.run_db(exam_services.login_or_register, user_name, data.get("pin"))
+        if outcome == exam_services.LOGIN_BAD_PIN:
+            return {"outcome": outcome, "token": None}
+        token = secrets.token_urlsafe(24)
+        self.sessions[token] = [user_name, time.monotonic()]
+        return {"outcome": outcome, "token": token}
+
+    async def api_list_sets(self, user_name, data):
+        return await self.cache.get(("sets",), load_set_list)
+
+    async def api_set_content(self, user_name, set_id, data):
+        content = await self.content(set_id)
+        return {"set_id": set_id, "version": content.version, "time_limit": content.time_limit,
+                "question_time": content.question_time, "questions": content.public}
+
+    async def api_start(self, user_name, data):
+        set_id = int(data.get("set_id"))
+        content = await self.content(set_id)
+        if not content.questions:
+            return {"attempt_id": None}
+        attempt_id, remaining = await self.run_db(start_attempt_tx, user_name, set_id,
+                                                  len(content.questions), content.version)
+        for old in [a for a, owner in self.attempts.items() if owner[0] == user_name]:
+            del self.attempts[old]  # start_attempt() abandoned it
+        self.attempts[attempt_id] = (user_name, set_id, content.version)
+        return await self.attempt_payload(attempt_id, set_id, content.version, remaining)
+
+    async def api_pending(self, user_name, data):
+        pending = await self.run_db(QuizSession.pending, user_name)
+        if not pending:
+            return None
+        attempt_id, set_id, set_name, index, score, answers, remaining, version, question_remaining = pending
+        self.attempts[attempt_id] = (user_name, set_id, version)
+        return {"attempt_id": attempt_id, "set_id": set_id, "set_name": set_name, "index": index,
+                "score": score, "answers": answers, "remaining": remaining, "version": version,
+                "question_remaining": question_remaining}
+
+    async def api_resume(self, user_name, attempt_id, data):
+        _, set_id, version = await self.own_attempt(user_name, attempt_id)
+        pending = await self.run_db(QuizSession.pending, user_name)
+        if not pending or pending[0] != attempt_id:
+            raise HttpError(404, "This attempt can no longer be resumed.")
+        payload = await self.attempt_payload(attempt_id, set_id, version, pending[6])
+        payload.update(index=pending[3], score=pending[4], answers=pending[5], question_remaining=pending[8])
+        return payload
+
+    async def api_progress(self, user_name, attempt_id, data):
+        _, set_id, version = await self.own_attempt(user_name, attempt_id)
+        content = await self.content(set_id, version)
+        total = len(content.questions)
+        index = min(int(data.get("index", 0)), total)
+        answers = data.get("answers")
+        if answers is None:
+            self.writer.progress(attempt_id, user_name, set_id, index, total)
+        else:
+            answers = check_answers(answers, total)
+            self.writer.progress(attempt_id, user_name, set_id, index, total, answers, content)
+        return {"ok": True}
+
+    async def api_finish(self, user_name, attempt_id, data):
+        """Deduplicated by attempt_id: a retried finish gets the first one's response."""
+        entry = self.finished.get(attempt_id)
+        if entry is None:
+            entry = self.finished[attempt_id] = (user_name, asyncio.ensure_future(
+                self.finish_attempt(user_name, attempt_id, data)))
+            while len(self.finished) > FINISHED_KEEP:
+                self.finished.popitem(last=False)
+        elif entry[0] != user_name:
+            raise HttpError(403, "Not your attempt.")
+        try:
+            return await asyncio.shield(entry[1])
+        except Exception:
+            if self.finished.get(attempt_id) is entry:
+                del self.finished[attempt_id]  # nothing was stored: a retry starts over
+            raise
+
+    async def finish_attempt(self, user_name, attempt_id, data):
+        _, set_id, version = await self.own_attempt(user_name, attempt_id)
+        content = await self.content(set_id, version)
+        total = len(content.questions)
+        answers = check_answers(data.get("answers", []), total)
+        accepted, result_id, score = await self.writer.finish(attempt_id, user_name, set_id, answers, content)
+        self.attempts.pop(attempt_id, None)
+        token = make_token(result_id) if result_id else None
+        return {"accepted": accepted, "score": score, "total": total, "token": token}
+
+    async def api_abandon(self, user_name, attempt_id, data):
+        await self.own_attempt(user_name, attempt_id)
+        await self.run_db(abandon_tx, attempt_id)
+        self.attempts.pop(attempt_id, None)
+        self.writer.drop(attempt_id, user_name)
+        return {"ok": True}
+
+    async def api_my_results(self, user_name, data):
+        return [list(r) for r in await self.run_db(exam_services.user_history, user_name)]
+
+    async def api_results_page(self, user_name, data):
+        rows, next_cursor = await self.run_db(
+            exam_services.history_page, user_name, data.get("cursor") or None,
+            int(data.get("limit") or exam_services.HISTORY_PAGE_SIZE))
+        return {"rows": [list(r) for r in rows], "next": next_cursor}
+
+    async def api_result_by_token(self, token):
+        result_id = verify_token(token)  # signature checked before any DB access
+        row = await self.run_db(result_row, result_id)
+        if row is None:
+            raise HttpError(404, "This result no longer exists.")
+        _, user_name, set_name, score, total, taken = row
+        return {"user_name": user_name, "set_name": set_name or "(deleted set)",
+                "score": score, "total": total, "date_taken": taken}
+
+    async def api_results_summary(self, user_name, data):
+        attempts, average, per_set = await self.run_db(exam_services.history_summary, user_name)
+        return {"attempts": attempts, "average": average, "sets": [list(r) for r in per_set]}
+
+    # lifecycle
+    async def serve(self, host=SERVER_HOST, port=SERVER_PORT, ready=None):
+        await self.run_db(create_tables)
+        await self.run_db(qr_secret)  # loaded once, so signing / verifying never blocks the loop
+        self.writer = WriteBehind(self, self.flush_ms)
+        tasks = [asyncio.ensure_future(self.writer.run()), asyncio.ensure_future(self.watch_changes())]
+        server = await asyncio.start_server(self.handle, host, port)
+        log.info("E-XAM server listening on %s:%s (%s backend, %s DB workers)",
+                 host, port, exam_db.get_pool().backend.name, self.executor._max_workers)
+        if ready:
+            ready(server)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows: Ctrl+C arrives as KeyboardInterrupt instead
+        try:
+            async with server:
+                await stop.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await self.writer.flush()  # don't lose queued heartbeats / checkpoints / finishes
+            self.executor.shutdown(wait=True)
+
+
+def check_answers(answers, total):
+    if not isinstance(answers, list) or len(answers) > total:
+        raise ValueError("answers must be a list with at most one entry per question.")
+    return answers
+
+
+def attempt_row(attempt_id):
+    with Database() as db:
+        return get_attempt(db, attempt_id)
+
+
+def result_row(result_id):
+    with Database() as db:
+        return exam_db.result_by_id(db, result_id)
+
+
+def start_attempt_tx(user_name, set_id, total, version):
+    with Database() as db:
+        return start_attempt(db, user_name, set_id, total, version)
+
+
+def abandon_tx(attempt_id):
+    with Database() as db:
+        abandon_attempt(db, attempt_id)
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Serve the E-XAM examinee API on the LAN.")
+    p.add_argument("--host", default=SERVER_HOST)
+    p.add_argument("--port", type=int, default=SERVER_PORT)
+    p.add_argument("--db-workers", type=int, default=DB_WORKERS)
+    p.add_argument("--backend", choices=sorted(exam_db.BACKENDS), help="override [db] backend")
+    p.add_argument("--db-path", help="SQLite file (with --backend sqlite)")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    if args.backend or args.db_path:
+        exam_db.use_backend(args.backend, args.db_path)
+    try:
+        asyncio.run(ExamServer(db_workers=args.db_workers).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,476 @@
+"""
+E-XAM services: the GUI-free core behind ExamAdminApp and QuizUserApp
+- Auth     : login_or_register(), check_admin_key()
+- Sets     : SetCatalog (cached set list), parse_time_limits(), create_set(),
+             set_questions()
+- Attempts : QuizSession (start / resume, grading, checkpoints, monitor
+             heartbeats, finish); question packs cached per (set_id, version)
+- Results  : recent_results(), new_results(), user_history(),
+             history_page() (cursor pages), history_summary()
+- Stats    : dashboard_stats(), DashboardCache (stale-while-revalidate)
+
+Each service call is one `with Database()` transaction. Failures raise
+ValueError (bad input, user-facing message) or one of DB_ERRORS; callers
+decide how to show them. No tkinter import here, so the same code runs in
+the Tk panels, worker processes, servers, benchmarks and scripts.
+"""
+import hmac
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import exam_config
+import exam_db
+from exam_db import Database, DB_ERRORS
+from change_feed import latest_seq
+from exam_monitor import HeartbeatBatcher, clear_progress
+from attempts import (start_attempt, finish_attempt, get_time_limits,
+                      find_resumable, abandon_attempt, CheckpointWriter, mark_late, drop_late)
+from question_types import pack_options, unpack_options, grade
+from result_qr import make_token
+
+ADMIN_KEY = exam_config.get("admin", "key")
+SETS_CACHE_TTL = exam_config.getfloat("user", "sets_cache_ttl")  # seconds the set list is trusted as-is
+PACK_CACHE_SIZE = exam_config.getint("user", "pack_cache_size")
+HISTORY_PAGE_SIZE = exam_config.getint("user", "history_page_size")
+RESULTS_PAGE_SIZE = exam_config.getint("admin", "results_page_size")
+DASHBOARD_TTL_S = exam_config.getfloat("admin", "dashboard_ttl_s")  # dashboard served without a refresh
+
+log = logging.getLogger("exam.services")
+
+LOGIN_OK = "ok"
+LOGIN_REGISTERED = "registered"
+LOGIN_BAD_PIN = "bad_pin"
+
+
+# ---------------------------
+# Auth
+# ---------------------------
+def login_or_register(user_name, pin):
+    """LOGIN_OK, LOGIN_REGISTERED (new user created) or LOGIN_BAD_PIN."""
+    user_name, pin = (user_name or "").strip(), (pin or "").strip()
+    if not user_name or not pin:
+        raise ValueError("Please enter both username and PIN!")
+    with Database() as db:
+        stored_pin = exam_db.get_user_pin(db, user_name)
+        if stored_pin is None:
+            exam_db.insert_user(db, user_name, pin)
+            return LOGIN_REGISTERED
+    return LOGIN_OK if stored_pin == pin else LOGIN_BAD_PIN
+
+
+def check_admin_key(key):
+    return hmac.compare_digest((key or "").encode(), ADMIN_KEY.encode())
+
+
+# ---------------------------
+# Sets
+# ---------------------------
+class SetCatalog:
+    """[(set_id, set_name)] cached until the change feed reports a `sets` change.
+
+    Within `ttl` seconds of the last check even the change-feed query is skipped.
+    """
+
+    def __init__(self, ttl=SETS_CACHE_TTL):
+        self.ttl = ttl
+        self.cache = None
+        self.seq = None
+        self.checked_at = 0.0
+
+    def sets(self):
+        now = time.monotonic()
+        if self.cache is not None and now - self.checked_at < self.ttl:
+            return self.cache
+        with Database() as db:
+            seq = latest_seq(db, "sets")
+            if self.cache is None or seq != self.seq:
+                self.cache = exam_db.list_sets(db)
+                self.seq = seq
+        self.checked_at = now
+        return self.cache
+
+
+def parse_time_limits(minutes_text, question_seconds_text):
+    """Form input -> (time_limit_sec, question_time_sec); blank = no limit."""
+    try:
+        time_limit = int(float(minutes_text) * 60) if (minutes_text or "").strip() else None
+        q_limit = int(question_seconds_text) if (question_seconds_text or "").strip() else None
+    except ValueError:
+        raise ValueError("Time limits must be numbers.")
+    return time_limit, q_limit
+
+
+def create_set(set_name, questions, time_limit_sec=None, question_time_sec=None):
+    """questions: (question_text, qtype, options, correct_mask, answer); returns set_id."""
+    set_name = (set_name or "").strip()
+    if not set_name:
+        raise ValueError("Set name cannot be empty.")
+    with Database() as db:
+        set_id = exam_db.insert_set(db, set_name, datetime.now(), time_limit_sec, question_time_sec)
+        exam_db.insert_questions(db, set_id, [
+            (q, a, qtype, pack_options(options), mask)
+            for q, qtype, options, mask, a in questions
+        ])
+    return set_id
+
+
+def set_questions(set_id):
+    """(question_id, text, answer, qtype, options, correct_mask) for the manage page."""
+    with Database() as db:
+        return exam_db.list_questions(db, set_id)
+
+
+# ---------------------------
+# Attempts
+# ---------------------------
+def load_pack(db, set_id, version):
+    """Questions of one set version with options unpacked (uncached)."""
+    # stable order so a resumed attempt lines up with its checkpoint
+    return [(q[0], q[1], q[2], q[3], unpack_options(q[4]), q[5])
+            for q in exam_db.get_quiz_questions(db, set_id, version)]
+
+
+class PackCache:
+    """(set_id, version) -> question pack, least recently used evicted first.
+
+    A set version never changes (edits open a new one), so entries are never
+    invalidated, only evicted.
+    """
+
+    def __init__(self, size=PACK_CACHE_SIZE):
+        self.size = size
+        self.packs = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, db, set_id, version):
+        key = (set_id, version)
+        with self.lock:
+            pack = self.packs.get(key)
+            if pack is not None:
+                self.packs.move_to_end(key)
+                self.hits += 1
+                return pack
+            self.misses += 1
+        pack = load_pack(db, set_id, version)
+        with self.lock:
+            self.packs[key] = pack
+            while len(self.packs) > self.size:
+                self.packs.popitem(last=False)
+        return pack
+
+
+packs = PackCache()
+
+
+class QuizSession:
+    """One examinee working through one set.
+
+    Holds the questions (options unpacked once), the position, score and
+    answers; writes progress through a coalescing CheckpointWriter and a
+    HeartbeatBatcher, both flushed by flush(). With a per-question limit the
+    attempt record has the last word: flush() and finish() drop the answers
+    mark_late() rules late and re-grade.
+    """
+
+    def __init__(self, user_name, set_id, attempt_id, questions, remaining=None,
+                 question_time=None, index=0, score=0, answers=None, heartbeat=None, version=None,
+                 question_remaining=None):
+        self.user_name = user_name
+        self.set_id = set_id
+        self.version = version
+        self.attempt_id = attempt_id
+        self.questions = questions
+        self.question_time = question_time
+        self.question_remaining = question_remaining  # resumed mid-question: what is left of it
+        self.index = index
+        self.score = score
+        self.answers = list(answers or [])
+        self.deadline_at = time.monotonic() + remaining if remaining is not None else None
+        self.checkpoint = CheckpointWriter(attempt_id, every_n=1) if question_time else CheckpointWriter(attempt_id)
+        self.result_token = None  # signed result code (result_qr.py) once finished
+        self.heartbeat = heartbeat or HeartbeatBatcher()
+
+    @staticmethod
+    def fetch_questions(db, set_id, version=None):
+        """Question pack of a set version (None = current); cached per (set_id, version)."""
+        if version is None:
+            version = exam_db.set_version(db, set_id)
+            if version is None:
+                return []
+        return packs.get(db, set_id, version)
+
+    @classmethod
+    def start(cls, user_name, set_id, heartbeat=None):
+        """New server-side attempt pinned to the current set version; None when the set has no questions."""
+        with Database() as db:
+            version = exam_db.set_version(db, set_id)
+            questions = cls.fetch_questions(db, set_id, version) if version is not None else []
+            if not questions:
+                return None
+            attempt_id, remaining = start_attempt(db, user_name, set_id, len(questions), version)
+            _, question_time = get_time_limits(db, set_id)
+        return cls(user_name, set_id, attempt_id, questions, remaining, question_time,
+                   heartbeat=heartbeat, version=version)
+
+    @staticmethod
+    def pending(user_name):
+        """(attempt_id, set_id, set_name, index, score, answers, remaining, version,
+        question_remaining) or None."""
+        with Database() as db:
+            return find_resumable(db, user_name)
+
+    @classmethod
+    def resume(cls, user_name, pending, heartbeat=None):
+        attempt_id, set_id, _, index, score, answers, remaining, version, question_remaining = pending
+        with Database() as db:
+            questions = cls.fetch_questions(db, set_id, version)
+            _, question_time = get_time_limits(db, set_id)
+        return cls(user_name, set_id, attempt_id, questions, remaining, question_time,
+                   index, score, answers, heartbeat, version, question_remaining)
+
+    @staticmethod
+    def abandon(pending):
+        with Database() as db:
+            abandon_attempt(db, pending[0])
+
+    # state
+    @property
+    def total(self):
+        return len(self.questions)
+
+    @property
+    def done(self):
+        return self.index >= len(self.questions)
+
+    @property
+    def current(self):
+        """(question_id, text, answer, qtype, options, correct_mask)."""
+        return self.questions[self.index]
+
+    def seconds_left(self):
+        if self.deadline_at is None:
+            return None
+        return max(int(self.deadline_at - time.monotonic() + 0.999), 0)
+
+    def show_progress(self):
+        """Monitor heartbeat for the question now on screen (in memory until flush)."""
+        self.heartbeat.push(self.user_name, self.set_id, self.index, len(self.questions))
+
+    def answer(self, given):
+        """Grade the current question and move on; returns True when correct.
+
+        given is the typed text, or the selected-option bitmask for choice types.
+        """
+        _, _, correct_answer, qtype, _, correct_mask = self.questions[self.index]
+        correct = grade(qtype, correct_mask, correct_answer, given)
+        if correct:
+            self.score += 1
+        self.answers.append(given)
+        self.index += 1
+        self.checkpoint.note(self.index, self.score, self.answers)
+        return correct
+
+    def enforce_question_time(self, db):
+        """Apply the server's late ruling to the answers so far (same transaction as the write)."""
+        if not self.question_time:
+            return
+        late = mark_late(db, self.attempt_id, len(self.answers))
+        if late:
+            self.answers = drop_late(self.answers, late)
+            self.score = sum(grade(q[3], q[5], q[2], a) for q, a in zip(self.questions, self.answers))
+            if self.checkpoint.unsaved:
+                self.checkpoint.note(self.index, self.score, self.answers)
+
+    def expire(self):
+        """Time's up: no further answers count."""
+        self.index = len(self.questions)
+
+    def flush_due(self):
+        return bool(self.heartbeat.due()) or self.checkpoint.due()
+
+    def flush(self):
+        """Write pending heartbeat + checkpoint (one transaction) when due."""
+        if not self.flush_due():
+            return False
+        with Database() as db:
+            self.heartbeat.flush(db)
+            if self.checkpoint.unsaved:
+                self.enforce_question_time(db)
+            self.checkpoint.flush(db)
+        return True
+
+    def finish(self):
+        """Close the attempt; True when the result was stored (False = server expired it)."""
+        total = len(self.questions)
+        result_id = None
+        with Database() as db:
+            self.enforce_question_time(db)
+            accepted = finish_attempt(db, self.attempt_id, self.score, total)
+            if accepted:
+                result_id = exam_db.insert_result(db, self.user_name, self.set_id, self.score, total,
+                                                  datetime.now(), self.version)
+            clear_progress(db, self.user_name)
+        if result_id is not None:
+            self.result_token = make_token(result_id)  # after commit: may load the secret on its own connection
+        self.heartbeat.discard(self.user_name)
+        self.deadline_at = None
+        return accepted
+
+
+# ---------------------------
+# Results
+# ---------------------------
+def format_result_row(r):
+    """Results-table values: (result_id, user, set name, score, total, date text)."""
+    date_val = r[5]
+    if isinstance(date_val, datetime):
+        date_val = date_val.strftime("%Y-%m-%d %H:%M:%S")
+    return (r[0], r[1], r[2] or "(deleted set)", r[3], r[4], date_val)
+
+
+def recent_results(limit=RESULTS_PAGE_SIZE):
+    with Database() as db:
+        rows = exam_db.list_results(db, limit)
+    return [format_result_row(r) for r in rows]
+
+
+def new_results(result_ids):
+    """Formatted rows for just these ids (change-feed deltas), oldest first."""
+    with Database() as db:
+        rows = exam_db.results_by_ids(db, result_ids)
+    return [format_result_row(r) for r in rows]
+
+
+def user_history(user_name):
+    """(set_name, score, total, date_taken) for one user, newest first."""
+    with Database() as db:
+        rows = exam_db.user_results(db, user_name)
+    return [(r[0] or "(deleted set)",) + tuple(r[1:]) for r in rows]
+
+
+def encode_cursor(date_taken, result_id):
+    return f"{date_taken.isoformat(sep=' ')}|{result_id}"
+
+
+def decode_cursor(cursor):
+    try:
+        date_text, result_id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(date_text), int(result_id)
+    except (AttributeError, ValueError):
+        raise ValueError("Invalid history cursor.") from None
+
+
+def history_page(user_name, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """One page of a user's results, newest first: (rows, next_cursor).
+
+    rows are (set_name, score, total, date_taken); pass next_cursor back for
+    the following page (None = no more results).
+    """
+    limit = max(1, min(int(limit), 500))
+    before = decode_cursor(cursor) if cursor else None
+    with Database() as db:
+        rows = exam_db.user_results_page(db, user_name, before, limit + 1)
+    more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1][4], rows[-1][0]) if more else None
+    return [(r[1] or "(deleted set)", r[2], r[3], r[4]) for r in rows], next_cursor
+
+
+def history_summary(user_name):
+    """(attempts, average_percent or None, [(set_name, attempts, best_percent, average_percent)]).
+
+    Read from user_summary (one row per set taken), never from the results.
+    """
+    with Database() as db:
+        rows = exam_db.user_summary(db, user_name)
+    attempts = sum(r[2] for r in rows)
+    graded = sum(r[3] for r in rows)
+    average = sum(r[4] for r in rows) * 100 / graded if graded else None
+    per_set = [(r[1] or "(deleted set)", r[2],
+                r[5] * 100 if r[5] is not None else None,
+                r[4] * 100 / r[3] if r[3] else None) for r in rows]
+    return attempts, average, per_set
+
+
+# ---------------------------
+# Stats
+# ---------------------------
+def dashboard_stats():
+    """(total_sets, users_with_results, [(set_id, set_name, avg_percent or None)])."""
+    with Database() as db:
+        total_sets = exam_db.count_sets(db)
+        total_users = exam_db.count_result_users(db)
+        averages = exam_db.set_averages(db)
+    return total_sets, total_users, averages
+
+
+class DashboardCache:
+    """Last dashboard model, served as-is while a background thread recomputes it.
+
+    get() never queries: it returns the cached model (None before the first
+    load) and starts a refresh when the model is older than `ttl` seconds or
+    invalidate() was called since it was computed. An invalidation during a
+    refresh makes that refresh run again; a failed refresh (any exception,
+    kept in `error`) is retried after a short pause (min(ttl, 5) s).
+    """
+
+    def __init__(self, loader=dashboard_stats, ttl=DASHBOARD_TTL_S):
+        self.loader = loader
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.model = None
+        self.version = 0         # bumped on every completed refresh
+        self.generation = 0      # bumped on every invalidation
+        self.loaded_gen = -1
+        self.loaded_at = 0.0
+        self.updated_at = None   # wall clock of the model, for display
+        self.refreshing = False
+        self.error = None        # last refresh failure, cleared by a success
+        self.retry_at = 0.0      # after a failure, no new attempt before this (monotonic)
+
+    def get(self):
+        """(model or None, version); kicks off a background refresh when stale."""
+        with self.lock:
+            now = time.monotonic()
+            stale = self.loaded_gen != self.generation or now - self.loaded_at >= self.ttl
+            if stale and not self.refreshing and now >= self.retry_at:
+                self.refreshing = True
+                threading.Thread(target=self._refresh, daemon=True, name="exam-dashboard").start()
+            return self.model, self.version
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+
+    def _refresh(self):
+        while True:
+            with self.lock:
+                gen = self.generation
+            try:
+                model, error = self.loader(), None
+            except DB_ERRORS as e:
+                model, error = None, e
+            except Exception as e:  # a bug must not freeze the dashboard on "refreshing"
+                log.exception("dashboard refresh failed")
+                model, error = None, e
+            with self.lock:
+                self.error = error
+                if error is not None:
+                    self.retry_at = time.monotonic() + min(self.ttl, 5)
+                else:
+                    self.model = model
+                    self.version += 1
+                    self.loaded_gen = gen
+                    self.loaded_at = time.monotonic()
+                    self.updated_at = datetime.now()
+                if error is not None or gen == self.generation:
+                    self.refreshing = False
+                    return
+
+
+def format_average(avg):
+    return f"{avg:.2f}%" if avg is not None else "No results"
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+E-XAM background job scheduler
+- One daemon thread runs periodic jobs in turn: each Job is a function
+  taking the scheduler's stop Event, re-run `interval_s` after it finishes
+- run_now(name) moves a job to the front (admin "Refresh now" buttons);
+  a failing job is logged (traceback for anything but a database error) and
+  retried at the next interval; it never stops the other jobs
+- default_jobs(): trend rollups ([rollups] enabled, rollups.py) and results
+  archiving ([archive] enabled, results_archive.py)
+
+Started by ExamAdminApp for the length of an admin session, or standalone
+on a server box. No tkinter import here.
+
+    python job_scheduler.py [--once]
+"""
+import argparse
+import logging
+import threading
+import time
+
+from exam_db import DB_ERRORS, create_tables
+from results_archive import archive_due, ARCHIVE_ENABLED, ARCHIVE_INTERVAL_S
+from rollups import run_rollups, ROLLUP_ENABLED, ROLLUP_INTERVAL_S
+
+log = logging.getLogger("exam.jobs")
+
+
+class Job:
+    """A named periodic job; last_result / last_error / last_run are for status displays."""
+
+    def __init__(self, name, func, interval_s):
+        self.name = name
+        self.func = func
+        self.interval_s = interval_s
+        self.next_run = 0.0  # monotonic; 0 = as soon as the scheduler starts
+        self.last_run = None  # wall-clock time.time() of the last finished run
+        self.last_result = None
+        self.last_error = None
+        self.running = False
+        self.rerun = False    # run_now() while running
+
+
+class Scheduler(threading.Thread):
+    """Runs due jobs one at a time until stop()."""
+
+    def __init__(self, jobs=()):
+        super().__init__(daemon=True, name="exam-jobs")
+        self.jobs = {job.name: job for job in jobs}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopping = threading.Event()
+
+    def add(self, job):
+        with self.lock:
+            self.jobs[job.name] = job
+        self.wake.set()
+
+    def run_now(self, name):
+        """Run `name` as soon as the current job finishes; False for an unknown job."""
+        with self.lock:
+            job = self.jobs.get(name)
+            if job is None:
+                return False
+            if job.running:
+                job.rerun = True
+            else:
+                job.next_run = 0.0
+        self.wake.set()
+        return True
+
+    def job(self, name):
+        return self.jobs.get(name)
+
+    def _due(self):
+        # (job or None, seconds until the next one is due)
+        with self.lock:
+            if not self.jobs:
+                return None, None
+            job = min(self.jobs.values(), key=lambda j: j.next_run)
+        wait = job.next_run - time.monotonic()
+        return (job, 0) if wait <= 0 else (None, wait)
+
+    def run(self):
+        while not self.stopping.is_set():
+            job, wait = self._due()
+            if job is None:
+                self.wake.wait(wait)
+                self.wake.clear()
+                continue
+            job.running = True
+            try:
+                job.last_result = job.func(self.stopping)
+                job.last_error = None
+            except DB_ERRORS as e:
+                job.last_error = str(e)
+                log.warning("job %s failed: %s", job.name, e)  # retried next round
+            except Exception as e:
+                job.last_error = str(e) or type(e).__name__
+                log.exception("job %s crashed", job.name)  # a bug in one job must not stop the thread
+            finally:
+                job.running = False
+                job.last_run = time.time()
+                with self.lock:
+                    job.next_run = 0.0 if job.rerun else time.monotonic() + job.interval_s
+                    job.rerun = False
+
+    def stop(self):
+        self.stopping.set()
+        self.wake.set()
+
+
+def default_jobs():
+    jobs = []
+    if ROLLUP_ENABLED:
+        jobs.append(Job("rollups", lambda stop: run_rollups(stop=stop), ROLLUP_INTERVAL_S))
+    if ARCHIVE_ENABLED:
+        jobs.append(Job("archive", lambda stop: archive_due(stop=stop), ARCHIVE_INTERVAL_S))
+    return jobs
+
+
+def start_scheduler():
+    """Scheduler running default_jobs() (started even when empty, so jobs can be added later)."""
+    scheduler = Scheduler(default_jobs())
+    scheduler.start()
+    return scheduler
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Run the E-XAM background jobs (rollups, archiving).")
+    p.add_argument("--once", action="store_true", help="run every job once and exit")
+    args = p.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    create_tables()
+    jobs = default_jobs()
+    if args.once:
+        stop = threading.Event()
+        for job in jobs:
+            print(f"{job.name}: {job.func(stop)}")
+        return
+    scheduler = Scheduler(jobs)
+    scheduler.start()
+    try:
+        while scheduler.is_alive():
+            scheduler.join(1)
+    except KeyboardInterrupt:
+        scheduler.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+E-XAM load generator (headless, no tkinter)
+- Replays QuizUserApp for N concurrent simulated examinees through the same
+  exam_services calls the Tk client makes: login / register -> resume check -> set list (cached like the
+  app) -> questions + start attempt -> heartbeat / checkpoint flushes while
+  answering -> finish attempt + insert result -> my results
+- Users start spread over --ramp-up seconds and pause --think seconds
+  (randomized +/-50%) between screens and answers
+- Reports throughput, per-step latency percentiles and error rates
+- Targets the configured backend (MySQL), the local SQLite stand-in, or an
+  exam_server.py instance (--api URL, same calls through exam_api.py)
+
+Usage:
+    python load_test.py --users 200 --ramp-up 30 --think 1.5 --sessions 2
+    python load_test.py --backend sqlite --db-path load.db --seed-sets 5 --users 50
+    python load_test.py --api http://10.0.0.5:8765 --users 500 --ramp-up 60
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+import exam_api
+import exam_config
+import exam_db
+import exam_services
+from exam_db import Database, DB_ERRORS, create_tables
+from exam_monitor import HeartbeatBatcher
+from question_types import pack_options, answer_label
+
+# same knobs as user_system.py
+HEARTBEAT_FLUSH_MS = exam_config.getint("user", "heartbeat_flush_ms")
+SETS_CACHE_TTL = exam_config.getfloat("user", "sets_cache_ttl")
+
+LOAD_USER_PREFIX = "lt_user_"
+LOAD_SET_PREFIX = "Load Test Set "
+
+
+# ---------------------------
+# Results
+# ---------------------------
+class LoadStats:
+    """Per-step latency samples and error counts (thread-safe)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}      # step -> [seconds]
+        self.errors = Counter()  # step -> count
+        self.error_kinds = Counter()
+        self.sessions = 0
+
+    def ok(self, step, seconds):
+        with self.lock:
+            self.samples.setdefault(step, []).append(seconds)
+
+    def fail(self, step, exc):
+        with self.lock:
+            self.errors[step] += 1
+            self.error_kinds[type(exc).__name__] += 1
+
+    def session_done(self):
+        with self.lock:
+            self.sessions += 1
+
+    def summary(self, wall_s):
+        steps = {}
+        for step in sorted(set(self.samples) | set(self.errors)):
+            xs = sorted(self.samples.get(step, []))
+            n, errors = len(xs), self.errors[step]
+            steps[step] = {
+                "ok": n,
+                "errors": errors,
+                "error_rate": errors / (n + errors) if n + errors else 0.0,
+                "p50_ms": percentile(xs, 50) * 1000,
+                "p95_ms": percentile(xs, 95) * 1000,
+                "p99_ms": percentile(xs, 99) * 1000,
+                "max_ms": (xs[-1] if xs else 0.0) * 1000,
+            }
+        ok = sum(s["ok"] for s in steps.values())
+        errors = sum(s["errors"] for s in steps.values())
+        return {
+            "wall_s": wall_s,
+            "transactions": ok,
+            "errors": errors,
+            "error_rate": errors / (ok + errors) if ok + errors else 0.0,
+            "tx_per_s": ok / wall_s if wall_s else 0.0,
+            "sessions": self.sessions,
+            "sessions_per_s": self.sessions / wall_s if wall_s else 0.0,
+            "error_kinds": dict(self.error_kinds),
+            "steps": steps,
+        }
+
+
+def percentile(sorted_xs, p):
+    if not sorted_xs:
+        return 0.0
+    k = min(int(round(p / 100 * (len(sorted_xs) - 1))), len(sorted_xs) - 1)
+    return sorted_xs[k]
+
+
+# ---------------------------
+# One simulated examinee (mirrors QuizUserApp)
+# ---------------------------
+class SimUser:
+    def __init__(self, index, args, stats, stop, services=exam_services):
+        self.user_name = f"{LOAD_USER_PREFIX}{index}"
+        self.pin = "0000"
+        self.args = args
+        self.stats = stats
+        self.stop = stop
+        self.services = services
+        self.rng = random.Random(args.seed * 100003 + index)
+        self.catalog = services.SetCatalog(SETS_CACHE_TTL)
+        self.heartbeat = HeartbeatBatcher()
+
+    def think(self):
+        if self.args.think > 0:
+            self.stop.wait(self.args.think * self.rng.uniform(0.5, 1.5))
+
+    def step(self, name, func, *args):
+        """One service call (= one transaction), timed; returns its result or None on error."""
+        t0 = time.perf_counter()
+        try:
+            result = func(*args)
+        except (DB_ERRORS + exam_api.API_ERRORS + (RuntimeError,)) as e:
+            self.stats.fail(name, e)
+            return None
+        self.stats.ok(name, time.perf_counter() - t0)
+        return result
+
+    def sets(self):
+        if self.catalog.cache is not None and time.monotonic() - self.catalog.checked_at < self.catalog.ttl:
+            return self.catalog.sets()  # cache hit: no query, not a step
+        return self.step("list_sets", self.catalog.sets)
+
+    def answer(self, question):
+        _, _, correct_answer, qtype, options, correct_mask = question
+        right = self.rng.random() < self.args.correct_rate
+        if qtype == "text":
+            return correct_answer if right else "wrong"
+        if right:
+            return correct_mask
+        return 1 << self.rng.randrange(max(len(options), 1))
+
+    def session(self):
+        services = self.services
+        # QuizUserApp.start_user_panel / offer_resume
+        if not self.step("login", services.login_or_register, self.user_name, self.pin):
+            return
+        self.step("resume_check", services.QuizSession.pending, self.user_name)
+        self.think()
+
+        # QuizUserApp.take_quiz_select / start_quiz
+        sets = self.sets()
+        if not sets:
+            return
+        set_id = self.rng.choice(sets)[0]
+        session = self.step("start_quiz", services.QuizSession.start, self.user_name, set_id, self.heartbeat)
+        if not session:
+            return
+
+        # QuizUserApp.quiz_window / submit_answer / flush_heartbeat
+        last_flush = time.monotonic()
+        while not session.done:
+            if self.stop.is_set():
+                return
+            session.show_progress()
+            self.think()
+            session.answer(self.answer(session.current))
+            if session.checkpoint.due() or time.monotonic() - last_flush >= HEARTBEAT_FLUSH_MS / 1000:
+                self.step("heartbeat", session.flush)
+                last_flush = time.monotonic()
+
+        # QuizUserApp.finish_quiz
+        self.step("finish_quiz", session.finish)
+        self.think()
+
+        # QuizUserApp.view_user_results
+        self.step("my_results", services.user_history, self.user_name)
+        self.stats.session_done()
+
+    def run(self, delay):
+        if self.stop.wait(delay):
+            return
+        for _ in range(self.args.sessions):
+            if self.stop.is_set():
+                return
+            self.session()
+
+
+# ---------------------------
+# Setup
+# ---------------------------
+def seed_sets(count, questions_per_set, rng):
+    """Create missing load-test sets (mixed text / multiple-choice questions)."""
+    with Database() as db:
+        existing = {name for _, name in exam_db.list_sets(db)}
+        for i in range(1, count + 1):
+            name = f"{LOAD_SET_PREFIX}{i}"
+            if name in existing:
+                continue
+            set_id = exam_db.insert_set(db, name, datetime.now())
+            rows = []
+            for q in range(questions_per_set):
+                if q % 2:
+                    options = [f"Option {k}" for k in range(4)]
+                    mask = 1 << rng.randrange(4)
+                    rows.append((f"Question {q + 1} of set {i}?", answer_label(options, mask),
+                                 "mc", pack_options(options), mask))
+                else:
+                    rows.append((f"Type answer {q + 1} of set {i}", f"answer{q}", "text", None, 0))
+            exam_db.insert_questions(db, set_id, rows)
+
+
+def run_load(args):
+    if args.backend or args.db_path:
+        exam_db.use_backend(args.backend, args.db_path, args.pool_size or exam_db.POOL_SIZE)
+    elif args.pool_size:
+        exam_db.get_pool().size = args.pool_size
+    services = exam_services
+    if args.api:
+        exam_api.use_server(args.api)
+        services = exam_api
+    if args.seed_sets or not args.api:  # with --api, seeding writes to the server's DB directly
+        create_tables()
+    if args.seed_sets:
+        seed_sets(args.seed_sets, args.questions, random.Random(args.seed))
+
+    stats = LoadStats()
+    stop = threading.Event()
+    users = [SimUser(i, args, stats, stop, services) for i in range(args.users)]
+    threads = []
+    t0 = time.perf_counter()
+    for i, user in enumerate(users):
+        delay = args.ramp_up * i / max(args.users, 1)
+        t = threading.Thread(target=user.run, args=(delay,), daemon=True)
+        t.start()
+        threads.append(t)
+
+    deadline = t0 + args.duration if args.duration else None
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(0.5)
+                if deadline and time.perf_counter() >= deadline:
+                    stop.set()
+    except KeyboardInterrupt:
+        stop.set()
+        for t in threads:
+            t.join(5)
+    return stats.summary(time.perf_counter() - t0)
+
+
+def print_report(summary, args):
+    backend = f"api {args.api}" if args.api else exam_db.get_pool().backend.name
+    print(f"E-XAM load test: {args.users} users, {args.sessions} session(s) each, "
+          f"ramp-up {args.ramp_up:g}s, think {args.think:g}s, backend {backend}")
+    print(f"wall {summary['wall_s']:.1f}s  transactions {summary['transactions']}  "
+          f"({summary['tx_per_s']:.1f}/s)  sessions {summary['sessions']} "
+          f"({summary['sessions_per_s']:.2f}/s)  errors {summary['errors']} "
+          f"({summary['error_rate'] * 100:.2f}%)")
+    print(f"{'step':<14}{'ok':>8}{'err':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for step, s in summary["steps"].items():
+        print(f"{step:<14}{s['ok']:>8}{s['errors']:>6}{s['p50_ms']:>10.1f}"
+              f"{s['p95_ms']:>10.1f}{s['p99_ms']:>10.1f}{s['max_ms']:>10.1f}")
+    if summary["error_kinds"]:
+        print("errors by type:", ", ".join(f"{k}={v}" for k, v in summary["error_kinds"].items()))
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Simulate concurrent E-XAM examinees.")
+    p.add_argument("--users", type=int, default=50, help="concurrent simulated examinees")
+    p.add_argument("--sessions", type=int, default=1, help="quizzes each user takes")
+    p.add_argument("--ramp-up", type=float, default=10.0, help="seconds to start all users")
+    p.add_argument("--think", type=float, default=1.0, help="mean think time between actions (s)")
+    p.add_argument("--duration", type=float, default=0, help="stop after N seconds (0 = run to the end)")
+    p.add_argument("--correct-rate", type=float, default=0.7, help="share of correct answers")
+    p.add_argument("--backend", choices=sorted(exam_db.BACKENDS), help="override [db] backend")
+    p.add_argument("--db-path", help="SQLite file (with --backend sqlite)")
+    p.add_argument("--pool-size", type=int, default=0, help="override [db] pool_size")
+    p.add_argument("--api", help="exam_server.py URL: go through the HTTP API instead of the DB")
+    p.add_argument("--seed-sets", type=int, default=0, help="create N load-test sets first")
+    p.add_argument("--questions", type=int, default=10, help="questions per seeded set")
+    p.add_argument("--seed", type=int, default=1, help="random seed")
+    p.add_argument("--json", help="also write the summary to this JSON file")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    summary = run_load(args)
+    print_report(summary, args)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
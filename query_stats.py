@@ -0,0 +1,268 @@
+"""
+E-XAM query instrumentation
+- Every statement run through a Database block is timed: execute time, fetch
+  time and rows, grouped by a normalized fingerprint of the SQL
+- Pool acquire time (a new connection when the pool is empty) is kept in its
+  own "connect" histogram
+- Histograms use fixed log-spaced buckets, so memory does not grow with the
+  number of calls; p50 / p95 / p99 are read from the buckets
+- Statements slower than [instrumentation] slow_query_ms go to the slow-query
+  log together with the page / callback that ran them (e.g. load_results)
+
+exam_db.Database wraps its cursors with TracedCursor; the admin panel shows
+snapshot() on a hidden page (Ctrl+Shift+Q). No tkinter import here.
+"""
+import bisect
+import collections
+import logging
+import re
+import sys
+import threading
+import time
+
+import exam_config
+
+ENABLED = exam_config.getint("instrumentation", "enabled") != 0
+SLOW_QUERY_MS = exam_config.getfloat("instrumentation", "slow_query_ms")
+SLOW_LOG_FILE = exam_config.get("instrumentation", "slow_log")  # empty = in-memory only
+SLOW_LOG_KEEP = 200  # recent slow queries kept for the admin page
+
+# bucket upper bounds in seconds: 50 us .. ~100 s, 4 buckets per doubling
+BUCKETS = [0.00005 * 2 ** (i / 4) for i in range(84)]
+
+# modules that only pass queries through; the "caller" is the first frame
+# outside these
+DATA_LAYER = {"query_stats", "exam_db", "exam_backends", "change_feed",
+              "attempts", "exam_monitor", "contextlib"}
+
+slow_log = logging.getLogger("exam.slow_query")
+
+
+# ---------------------------
+# Fingerprints / callers
+# ---------------------------
+_STRING = re.compile(r"'(?:[^'\\]|\\.)*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,)*\s*(?:%s|\?)\s*\)", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def fingerprint(sql):
+    """SQL with literals and IN (...) lists collapsed, so one shape = one entry."""
+    fp = _STRING.sub("?", sql)
+    fp = _NUMBER.sub("?", fp)
+    fp = _IN_LIST.sub("IN (...)", fp)
+    return _SPACE.sub(" ", fp).strip().replace("%s", "?")
+
+
+def calling_page():
+    """module.function of the nearest frame outside the data layer."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module not in DATA_LAYER:
+            return f"{module}.{frame.f_code.co_name}"
+        frame = frame.f_back
+    return "?"
+
+
+# ---------------------------
+# Histograms
+# ---------------------------
+class LatencyHistogram:
+    """Fixed-bucket latency histogram (seconds in, milliseconds out)."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in ms."""
+        if not self.count:
+            return 0.0
+        rank = p / 100 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(bound, self.max) * 1000
+        return self.max * 1000
+
+
+class QueryStat:
+    def __init__(self):
+        self.execute = LatencyHistogram()
+        self.fetch = LatencyHistogram()
+        self.total = LatencyHistogram()
+        self.rows = 0
+
+
+class QueryStats:
+    """Process-wide registry; record() is thread-safe."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queries = {}  # fingerprint -> QueryStat
+        self.connect = LatencyHistogram()
+        self.slow = collections.deque(maxlen=SLOW_LOG_KEEP)
+
+    def record(self, fp, execute_s, fetch_s, rows):
+        with self.lock:
+            stat = self.queries.get(fp)
+            if stat is None:
+                stat = self.queries[fp] = QueryStat()
+            stat.execute.add(execute_s)
+            stat.fetch.add(fetch_s)
+            stat.total.add(execute_s + fetch_s)
+            stat.rows += max(rows, 0)
+
+    def record_connect(self, seconds):
+        with self.lock:
+            self.connect.add(seconds)
+
+    def record_slow(self, fp, seconds, rows, page):
+        entry = (time.strftime("%Y-%m-%d %H:%M:%S"), page, round(seconds * 1000, 1), rows, fp)
+        with self.lock:
+            self.slow.append(entry)
+        slow_log.warning("%.1f ms rows=%s page=%s sql=%s", seconds * 1000, rows, page, fp)
+
+    def snapshot(self):
+        """[(fingerprint, calls, rows, p50, p95, p99, max, total, avg_execute, avg_fetch)].
+
+        Times in ms; slowest total first.
+        """
+        with self.lock:
+            out = [
+                (fp, s.total.count, s.rows,
+                 s.total.percentile(50), s.total.percentile(95), s.total.percentile(99),
+                 s.total.max * 1000, s.total.total * 1000,
+                 s.execute.total * 1000 / s.total.count, s.fetch.total * 1000 / s.total.count)
+                for fp, s in self.queries.items()
+            ]
+        out.sort(key=lambda r: r[7], reverse=True)
+        return out
+
+    def connect_summary(self):
+        """(count, p50, p95, p99, max) in ms for pool acquires."""
+        with self.lock:
+            c = self.connect
+            return c.count, c.percentile(50), c.percentile(95), c.percentile(99), c.max * 1000
+
+    def recent_slow(self):
+        with self.lock:
+            return list(reversed(self.slow))
+
+    def reset(self):
+        with self.lock:
+            self.queries.clear()
+            self.connect = LatencyHistogram()
+            self.slow.clear()
+
+
+stats = QueryStats()
+
+
+def _setup_slow_log():
+    if slow_log.handlers:
+        return
+    if SLOW_LOG_FILE:
+        handler = logging.FileHandler(SLOW_LOG_FILE, encoding="utf-8", delay=True)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    else:
+        handler = logging.NullHandler()
+    slow_log.addHandler(handler)
+    slow_log.propagate = False
+
+
+_setup_slow_log()
+
+
+# ---------------------------
+# Cursor wrapper
+# ---------------------------
+class TracedCursor:
+    """Times execute + the fetches that follow it; finish() records one sample.
+
+    A statement is closed by the next execute() on the same cursor or by
+    finish() (called from Database.__exit__).
+    """
+
+    def __init__(self, cursor, slow_ms=SLOW_QUERY_MS):
+        self._cur = cursor
+        self.slow_s = slow_ms / 1000
+        self.sql = None
+
+    def execute(self, sql, params=()):
+        self.finish()
+        t0 = time.perf_counter()
+        self._cur.execute(sql, params)
+        self._start(sql, time.perf_counter() - t0)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self.finish()
+        t0 = time.perf_counter()
+        self._cur.executemany(sql, seq_of_params)
+        self._start(sql, time.perf_counter() - t0)
+        return self
+
+    def _start(self, sql, execute_s):
+        self.sql = sql
+        self.execute_s = execute_s
+        self.fetch_s = 0.0
+        self.rows = 0
+
+    def _fetched(self, t0, rows):
+        self.fetch_s += time.perf_counter() - t0
+        self.rows += rows
+
+    def fetchone(self):
+        t0 = time.perf_counter()
+        row = self._cur.fetchone()
+        self._fetched(t0, 1 if row is not None else 0)
+        return row
+
+    def fetchall(self):
+        t0 = time.perf_counter()
+        rows = self._cur.fetchall()
+        self._fetched(t0, len(rows))
+        return rows
+
+    def fetchmany(self, size):
+        t0 = time.perf_counter()
+        rows = self._cur.fetchmany(size)
+        self._fetched(t0, len(rows))
+        return rows
+
+    def finish(self):
+        if self.sql is None:
+            return
+        sql, self.sql = self.sql, None
+        rows = self.rows or max(self._cur.rowcount or 0, 0)  # writes: affected rows
+        fp = fingerprint(sql)
+        stats.record(fp, self.execute_s, self.fetch_s, rows)
+        elapsed = self.execute_s + self.fetch_s
+        if elapsed >= self.slow_s:
+            stats.record_slow(fp, elapsed, rows, calling_page())
+
+    @property
+    def lastrowid(self):
+        return self._cur.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cur.rowcount
+
+    def close(self):
+        self.finish()
+        self._cur.close()
@@ -0,0 +1,130 @@
+"""
+E-XAM question types
+- text  : free text, case-insensitive compare with `answer` (old behaviour)
+- mc    : multiple choice, exactly one correct option
+- tf    : true / false (mc with the fixed options True, False)
+- multi : multi-select, every correct option and nothing else
+
+Options are packed into one column (unit-separator joined) and the correct
+options are precomputed into `correct_mask` (bit i = option i), so grading a
+choice question is a single integer compare. `answer` keeps a readable copy
+of the correct option(s) for result screens and older panels.
+
+No tkinter import here.
+"""
+QTYPES = ("text", "mc", "tf", "multi")
+QTYPE_LABELS = {
+    "text": "Free text",
+    "mc": "Multiple choice",
+    "tf": "True / False",
+    "multi": "Multi-select",
+}
+TF_OPTIONS = ["True", "False"]
+MAX_OPTIONS = 8
+OPTION_SEP = "\x1f"  # ASCII unit separator: never typed by authors
+
+
+# ---------------------------
+# Packing
+# ---------------------------
+def pack_options(options):
+    return OPTION_SEP.join(options) if options else None
+
+
+def unpack_options(packed):
+    return packed.split(OPTION_SEP) if packed else []
+
+
+def option_letter(i):
+    return chr(ord("A") + i)
+
+
+def mask_from_indexes(indexes):
+    mask = 0
+    for i in indexes:
+        mask |= 1 << i
+    return mask
+
+
+def indexes_from_mask(mask):
+    return [i for i in range(MAX_OPTIONS) if mask >> i & 1]
+
+
+def answer_label(options, mask):
+    """Readable copy of the correct options, e.g. "B) Paris"."""
+    return ", ".join(f"{option_letter(i)}) {options[i]}"
+                     for i in indexes_from_mask(mask) if i < len(options))
+
+
+# ---------------------------
+# Authoring
+# ---------------------------
+def parse_authoring(qtype, options_text, answer_text):
+    """Validate admin input; returns (options, correct_mask, answer).
+
+    options_text is "Paris; London; Rome" (ignored for text / tf).
+    answer_text is the text answer, "True"/"False", or option letters ("B",
+    "A, C"). Raises ValueError with a user-facing message.
+    """
+    answer_text = (answer_text or "").strip()
+    if qtype not in QTYPES:
+        raise ValueError(f"Unknown question type '{qtype}'.")
+    if qtype == "text":
+        if not answer_text:
+            raise ValueError("An answer is required.")
+        return [], 0, answer_text
+
+    if qtype == "tf":
+        options = list(TF_OPTIONS)
+        picked = [i for i, o in enumerate(options) if o.lower() == answer_text.lower()]
+        if not picked:
+            raise ValueError("Answer must be True or False.")
+    else:
+        options = [o.strip() for o in (options_text or "").split(";") if o.strip()]
+        if len(options) < 2:
+            raise ValueError("Enter at least two options separated by ';'.")
+        if len(options) > MAX_OPTIONS:
+            raise ValueError(f"At most {MAX_OPTIONS} options are supported.")
+        if any(OPTION_SEP in o for o in options):
+            raise ValueError("Options contain an invalid character.")
+        letters = [x.strip().upper() for x in answer_text.replace(";", ",").split(",") if x.strip()]
+        picked = []
+        for letter in letters:
+            i = ord(letter) - ord("A") if len(letter) == 1 else -1
+            if not 0 <= i < len(options):
+                raise ValueError(f"'{letter}' is not one of the option letters.")
+            picked.append(i)
+        if not picked:
+            raise ValueError("Enter the letter(s) of the correct option(s).")
+        if qtype == "mc" and len(set(picked)) != 1:
+            raise ValueError("Multiple choice needs exactly one correct option.")
+
+    mask = mask_from_indexes(picked)
+    return options, mask, answer_label(options, mask)
+
+
+def authoring_text(qtype, options, mask, answer):
+    """Inverse of parse_authoring() for edit dialogs: (options_text, answer_text)."""
+    if qtype == "text":
+        return "", answer or ""
+    if qtype == "tf":
+        return "", ", ".join(options[i] for i in indexes_from_mask(mask) if i < len(options))
+    return "; ".join(options), ", ".join(option_letter(i) for i in indexes_from_mask(mask))
+
+
+# ---------------------------
+# Grading
+# ---------------------------
+def grade(qtype, correct_mask, answer, given):
+    """True when `given` is correct.
+
+    given is the typed string for text questions and the selected-option
+    bitmask (int) for every choice type: one compare, independent of the
+    number of options. None (no answer, or one the server ruled too late)
+    is never correct.
+    """
+    if given is None:
+        return False
+    if qtype == "text":
+        return str(given).strip().lower() == (answer or "").strip().lower()
+    return given == correct_mask
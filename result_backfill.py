@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+E-XAM result snapshot backfill
+- Results stored before results.set_name / set_version existed have NULL
+  snapshots; this fills them from `sets` (hot and archived rows)
+- Walks the PK in batches ([archive] batch rows, one transaction each), so
+  it can run next to live exams; rows whose set is gone stay NULL and are
+  shown as "(deleted set)"
+- BackfillJob runs it in a background thread (ExamAdminApp starts one per
+  session); the CLI runs it in the foreground
+
+No tkinter import here.
+
+    python result_backfill.py
+"""
+import argparse
+import logging
+import threading
+
+from exam_db import Database, DB_ERRORS, create_tables
+from results_archive import ARCHIVE_BATCH
+
+SNAPSHOT_TABLES = ("results", "results_archive")
+
+log = logging.getLogger("exam.backfill")
+
+
+def backfill_batch(db, table, after_id=0, batch=ARCHIVE_BATCH):
+    """Fill snapshots of the next `batch` rows missing one; returns (last result_id, rows seen)."""
+    db.cursor.execute(
+        f"SELECT result_id FROM {table} WHERE result_id > %s AND set_name IS NULL "
+        "ORDER BY result_id LIMIT %s",
+        (after_id, batch)
+    )
+    ids = tuple(r[0] for r in db.cursor.fetchall())
+    if not ids:
+        return after_id, 0
+    db.cursor.execute(f"""
+        UPDATE {table} SET
+            set_name = (SELECT s.set_name FROM sets s WHERE s.set_id = {table}.set_id),
+            set_version = (SELECT s.version FROM sets s WHERE s.set_id = {table}.set_id)
+        WHERE result_id IN ({', '.join(['%s'] * len(ids))})
+    """, ids)
+    return ids[-1], len(ids)
+
+
+def backfill(batch=ARCHIVE_BATCH, stop=None):
+    """Backfill every table; returns rows visited."""
+    visited = 0
+    for table in SNAPSHOT_TABLES:
+        after_id = 0
+        while stop is None or not stop.is_set():
+            with Database() as db:
+                after_id, n = backfill_batch(db, table, after_id, batch)
+            visited += n
+            if n < batch:
+                break
+    return visited
+
+
+class BackfillJob(threading.Thread):
+    def __init__(self, batch=ARCHIVE_BATCH):
+        super().__init__(daemon=True, name="exam-backfill")
+        self.batch = batch
+        self.stopping = threading.Event()
+        self.visited = 0
+
+    def run(self):
+        try:
+            self.visited = backfill(self.batch, self.stopping)
+        except DB_ERRORS as e:
+            log.warning("result snapshot backfill failed: %s", e)
+
+    def stop(self):
+        self.stopping.set()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fill set name / version snapshots of old E-XAM results.")
+    p.add_argument("--batch", type=int, default=ARCHIVE_BATCH, help="rows per transaction")
+    args = p.parse_args(argv)
+    create_tables()
+    print(f"Backfilled {backfill(args.batch)} result row(s).")
+
+
+if __name__ == "__main__":
+    main()
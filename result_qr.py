@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+E-XAM result QR codes
+- Tokens: result_id + truncated HMAC-SHA256, base32 without padding
+  (26 chars, QR alphanumeric mode); verify_token() checks the signature
+  without touching the database (once the secret is loaded)
+- The key is [qr] secret when set; empty (or the old published default)
+  means a random per-site secret created in the database on first use,
+  shared by every client and the exam server
+- lookup_result(): verify, then one primary-key read (hot or archived row)
+- QR images need the optional `qrcode` package (pip install qrcode); without
+  it tokens still work and are shown as text
+- Batch: render_batch() draws the QR codes of a whole session (one set, one
+  day) on a process pool and writes a printable index.html next to the PNGs
+
+The QR encodes [qr] base_url + token when base_url is set (e.g. the exam
+server's /r/ lookup), else the bare token. No tkinter import here.
+
+    python result_qr.py --set 12 --day 2026-10-19 --out qr_session
+    python result_qr.py --lookup KQ2V...
+"""
+import argparse
+import base64
+import binascii
+import hashlib
+import hmac
+import html
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+import exam_config
+import exam_db
+from exam_db import Database, create_tables
+
+try:
+    import qrcode
+except ImportError:  # tokens work without it; images don't
+    qrcode = None
+
+QR_SECRET = exam_config.get("qr", "secret")
+PUBLISHED_SECRETS = ("", "change-this-qr-secret")  # never sign with these: anyone could forge codes
+QR_BASE_URL = exam_config.get("qr", "base_url")
+QR_WORKERS = exam_config.getint("qr", "workers")    # render processes (0 = one per CPU)
+QR_BOX_SIZE = exam_config.getint("qr", "box_size")  # pixels per module
+
+TOKEN_VERSION = 1
+ID_BYTES = 5    # result ids up to 2**40
+SIG_BYTES = 10  # 80-bit signature
+
+
+# ---------------------------
+# Tokens
+# ---------------------------
+_site_secret = None
+
+
+def qr_secret():
+    """Signing key: [qr] secret, or the site secret from the database (read once per process)."""
+    global _site_secret
+    if QR_SECRET not in PUBLISHED_SECRETS:
+        return QR_SECRET.encode()
+    if _site_secret is None:
+        with Database() as db:
+            _site_secret = exam_db.site_secret(db, "qr").encode()
+    return _site_secret
+
+
+def _sign(payload, secret):
+    return hmac.new(secret or qr_secret(), payload, hashlib.sha256).digest()[:SIG_BYTES]
+
+
+def make_token(result_id, secret=None):
+    payload = bytes([TOKEN_VERSION]) + int(result_id).to_bytes(ID_BYTES, "big")
+    return base64.b32encode(payload + _sign(payload, secret)).decode("ascii").rstrip("=")
+
+
+def verify_token(token, secret=None):
+    """result_id of a genuine token; raises ValueError otherwise (no DB access once the secret is loaded)."""
+    text = (token or "").strip().upper()
+    if QR_BASE_URL and text.startswith(QR_BASE_URL.upper()):
+        text = text[len(QR_BASE_URL):]
+    try:
+        raw = base64.b32decode(text + "=" * (-len(text) % 8))
+    except (binascii.Error, ValueError):
+        raise ValueError("Not a result code.") from None
+    payload, sig = raw[:1 + ID_BYTES], raw[1 + ID_BYTES:]
+    if (len(raw) != 1 + ID_BYTES + SIG_BYTES or payload[0] != TOKEN_VERSION
+            or base64.b32encode(raw).decode("ascii").rstrip("=") != text):  # one spelling per code
+        raise ValueError("Not a result code.")
+    if not hmac.compare_digest(sig, _sign(payload, secret)):
+        raise ValueError("This result code is not valid.")
+    return int.from_bytes(payload[1:], "big")
+
+
+def qr_text(token):
+    return QR_BASE_URL + token if QR_BASE_URL else token
+
+
+def lookup_result(token):
+    """(result_id, user_name, set_name, score, total, date_taken) or None; ValueError for a bad token."""
+    result_id = verify_token(token)
+    with Database() as db:
+        return exam_db.result_by_id(db, result_id)
+
+
+# ---------------------------
+# Images
+# ---------------------------
+def qr_png(text, box_size=QR_BOX_SIZE):
+    """PNG bytes of one QR code; RuntimeError when the qrcode package is missing."""
+    if qrcode is None:
+        raise RuntimeError("QR images need the qrcode package (pip install qrcode).")
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=box_size, border=2)
+    qr.add_data(text)
+    qr.make(fit=True)
+    buf = io.BytesIO()
+    qr.make_image().save(buf)
+    return buf.getvalue()
+
+
+def _render_one(job):
+    # process-pool worker: (path, text, box_size) -> path
+    path, text, box_size = job
+    with open(path, "wb") as f:
+        f.write(qr_png(text, box_size))
+    return path
+
+
+def session_results(db, set_id, day=None):
+    """(result_id, user_name, set_name, score, total, date_taken) of one set, optionally one day."""
+    sql = exam_db.SQL_RESULT_ROWS + " WHERE r.set_id = %s"
+    params = [set_id]
+    if day is not None:
+        sql += " AND r.date_taken >= %s AND r.date_taken < %s"
+        start = datetime.combine(day, datetime.min.time())
+        params += [start, start + timedelta(days=1)]
+    db.cursor.execute(sql + " ORDER BY r.user_name, r.result_id", tuple(params))
+    return db.cursor.fetchall()
+
+
+def render_batch(rows, out_dir, workers=QR_WORKERS, box_size=QR_BOX_SIZE):
+    """Write <result_id>.png for every result row plus a printable index.html; returns the sheet path.
+
+    Tokens are signed here; only the image rendering goes to the process pool.
+    """
+    if qrcode is None:
+        raise RuntimeError("QR images need the qrcode package (pip install qrcode).")
+    os.makedirs(out_dir, exist_ok=True)
+    entries = [(r, make_token(r[0])) for r in rows]
+    jobs = [(os.path.join(out_dir, f"{r[0]}.png"), qr_text(token), box_size) for r, token in entries]
+    if jobs:
+        with ProcessPoolExecutor(max_workers=workers or None) as pool:
+            for _ in pool.map(_render_one, jobs, chunksize=max(1, len(jobs) // 32)):
+                pass
+
+    cards = []
+    for (result_id, user_name, set_name, score, total, taken), token in entries:
+        cards.append(
+            f'<div class="card"><img src="{result_id}.png" alt="">'
+            f"<b>{html.escape(str(user_name))}</b><br>{html.escape(set_name or '(deleted set)')}<br>"
+            f"{score}/{total} &middot; {html.escape(str(taken))}<br><code>{token}</code></div>")
+    sheet = os.path.join(out_dir, "index.html")
+    with open(sheet, "w", encoding="utf-8") as f:
+        f.write("<!doctype html><meta charset='utf-8'><title>E-XAM result codes</title>"
+                "<style>body{font-family:sans-serif}.card{display:inline-block;width:220px;margin:8px;"
+                "text-align:center;page-break-inside:avoid}.card img{width:180px}</style>\n")
+        f.write("\n".join(cards))
+    return sheet
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Result QR codes: batch printing and token lookup.")
+    p.add_argument("--set", type=int, dest="set_id", help="render every result of this set")
+    p.add_argument("--day", type=date.fromisoformat, help="only results taken on this day (YYYY-MM-DD)")
+    p.add_argument("--results", type=int, nargs="*", default=[], help="render these result ids")
+    p.add_argument("--out", default="qr_codes", help="output directory")
+    p.add_argument("--workers", type=int, default=QR_WORKERS, help="render processes (0 = one per CPU)")
+    p.add_argument("--lookup", metavar="TOKEN", help="verify a token and print its result")
+    args = p.parse_args(argv)
+    create_tables()
+
+    if args.lookup:
+        try:
+            row = lookup_result(args.lookup)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(row if row else "Valid code, but the result no longer exists.")
+        return
+
+    with Database() as db:
+        rows = session_results(db, args.set_id, args.day) if args.set_id else []
+        rows += [r for r in (exam_db.result_by_id(db, rid) for rid in args.results) if r]
+    if not rows:
+        p.error("no results selected (use --set ID [--day D] or --results ID ...)")
+    try:
+        sheet = render_batch(rows, args.out, args.workers)
+    except RuntimeError as e:
+        raise SystemExit(str(e))
+    print(f"Rendered {len(rows)} QR code(s); print {sheet}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+E-XAM results archive (hot / cold split of `results`)
+- `results` keeps recent rows; rows older than [archive] after_days move to
+  `results_archive` (same columns, same result_id, no foreign key) in
+  date-ordered batches of [archive] batch rows, one short transaction each
+- `results_archive_totals`: per-set count and sum of score ratios of the
+  archived rows, so dashboard averages stay exact without reading the archive
+- Per-user history (exam_db.user_results) reads both tables through the
+  (user_name, date_taken) indexes; admin results pages stay on the hot table
+- archive_due() drains everything due; job_scheduler.py runs it every
+  [archive] interval_s (ExamAdminApp), or run it once from the CLI
+
+Sets are soft-deleted (sets.deleted_at, exam_db.delete_set), so deleting a
+set never cascades into results. Table DDL lives in exam_db.create_tables().
+No tkinter import here.
+
+    python results_archive.py [--days 180] [--batch 1000]
+"""
+import argparse
+
+import exam_config
+from exam_db import Database, create_tables
+
+ARCHIVE_ENABLED = exam_config.getint("archive", "enabled")
+ARCHIVE_AFTER_DAYS = exam_config.getint("archive", "after_days")  # results older than this move to the archive
+ARCHIVE_BATCH = exam_config.getint("archive", "batch")            # rows moved per transaction
+ARCHIVE_INTERVAL_S = exam_config.getint("archive", "interval_s")  # pause between background runs
+
+
+# ---------------------------
+# Mover
+# ---------------------------
+def archive_batch(db, after_days=ARCHIVE_AFTER_DAYS, batch=ARCHIVE_BATCH):
+    """Move up to `batch` of the oldest due results; returns how many moved.
+
+    Uses the date_taken index for the pick and the PK for copy / delete.
+    """
+    d = db.dialect
+    db.cursor.execute(f"""
+        SELECT result_id, set_id, score, total FROM results
+        WHERE date_taken < {d.add_seconds(d.now, '-')}
+        ORDER BY date_taken
+        LIMIT %s
+        {d.for_update}
+    """, (after_days * 86400, batch))
+    rows = db.cursor.fetchall()
+    if not rows:
+        return 0
+
+    ids = tuple(r[0] for r in rows)
+    placeholders = ", ".join(["%s"] * len(ids))
+    db.cursor.execute(f"""
+        INSERT INTO results_archive (result_id, user_name, set_id, score, total, date_taken,
+                                     set_name, set_version)
+        SELECT result_id, user_name, set_id, score, total, date_taken, set_name, set_version
+        FROM results WHERE result_id IN ({placeholders})
+    """, ids)
+    db.cursor.execute(f"DELETE FROM results WHERE result_id IN ({placeholders})", ids)
+
+    totals = {}  # set_id -> [attempts, ratio_sum] (same NULL handling as AVG in set_averages)
+    for _, set_id, score, total in rows:
+        if score is None or not total:
+            continue
+        t = totals.setdefault(set_id, [0, 0.0])
+        t[0] += 1
+        t[1] += score / total
+    if totals:
+        db.cursor.executemany(f"""
+            INSERT INTO results_archive_totals (set_id, attempts, ratio_sum) VALUES (%s, %s, %s)
+            {d.upsert('set_id')}
+                attempts = attempts + {d.inserted('attempts')},
+                ratio_sum = ratio_sum + {d.inserted('ratio_sum')}
+        """, [(set_id, n, ratio) for set_id, (n, ratio) in totals.items()])
+    return len(rows)
+
+
+def archive_due(after_days=ARCHIVE_AFTER_DAYS, batch=ARCHIVE_BATCH, stop=None):
+    """Drain everything due, one transaction per batch; returns rows moved."""
+    moved = 0
+    while stop is None or not stop.is_set():
+        with Database() as db:
+            n = archive_batch(db, after_days, batch)
+        moved += n
+        if n < batch:
+            break
+    return moved
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Move old E-XAM results to results_archive.")
+    p.add_argument("--days", type=int, default=ARCHIVE_AFTER_DAYS, help="archive results older than N days")
+    p.add_argument("--batch", type=int, default=ARCHIVE_BATCH, help="rows per transaction")
+    args = p.parse_args(argv)
+    create_tables()
+    print(f"Archived {archive_due(args.days, args.batch)} result(s) older than {args.days} days.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+E-XAM analytics rollups (daily / weekly, per set and per user)
+- rollup_set / rollup_user: attempts, graded attempts and the sum of score
+  ratios per period ('d' = day, 'w' = week starting Monday); averages are
+  ratio_sum / graded, so rollups add up exactly like set_averages()
+- Incremental: rollup_state keeps the last result_id folded in; each run
+  reads only newer rows (hot + archived, by primary key) in batches of
+  [rollups] batch, one transaction per batch including the watermark
+- A pass only goes up to the highest result_id seen by the previous pass
+  (the horizon), so a result whose transaction was still open then is not
+  skipped; each run makes a second pass a moment later to catch up
+- Trend charts (ExamAdminApp "Trends") read only these tables
+
+Run by job_scheduler.py every [rollups] interval_s; sets purged by
+set_purge.py lose their rollup_set rows. Table DDL lives in
+exam_db.create_tables(). No tkinter import here.
+
+    python rollups.py
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+import exam_config
+from exam_db import Database, create_tables
+
+ROLLUP_BATCH = exam_config.getint("rollups", "batch")            # results folded in per transaction
+ROLLUP_ENABLED = exam_config.getint("rollups", "enabled")
+ROLLUP_INTERVAL_S = exam_config.getint("rollups", "interval_s")  # scheduler period
+ROLLUP_SETTLE_S = 2  # wait before the catch-up pass; longer than any results insert transaction
+
+STATE_NAME = "results"
+PERIODS = ("d", "w")
+
+
+def period_start(taken, period):
+    day = taken.date() if isinstance(taken, datetime) else date.fromisoformat(str(taken)[:10])
+    return day if period == "d" else day - timedelta(days=day.weekday())
+
+
+# ---------------------------
+# Watermark
+# ---------------------------
+def get_state(db):
+    """(last_id, horizon); creates the state row on first use."""
+    db.cursor.execute("SELECT last_id, horizon FROM rollup_state WHERE name=%s", (STATE_NAME,))
+    row = db.cursor.fetchone()
+    if row is None:
+        db.cursor.execute("INSERT INTO rollup_state (name, last_id, horizon) VALUES (%s, 0, 0)", (STATE_NAME,))
+        return 0, 0
+    return row[0], row[1]
+
+
+def advance_horizon(db):
+    """Next run may go up to today's highest result_id."""
+    db.cursor.execute("""
+        SELECT MAX(m) FROM (SELECT MAX(result_id) AS m FROM results
+                            UNION ALL SELECT MAX(result_id) FROM results_archive) t
+    """)
+    horizon = db.cursor.fetchone()[0] or 0
+    db.cursor.execute(
+        f"UPDATE rollup_state SET horizon=%s, updated_at={db.dialect.now} WHERE name=%s",
+        (horizon, STATE_NAME)
+    )
+    return horizon
+
+
+# ---------------------------
+# Folding
+# ---------------------------
+def fold(rows):
+    """{(table, key, period, start): [attempts, graded, ratio_sum]} for result rows."""
+    sums = {}
+    for _, user_name, set_id, score, total, taken in rows:
+        if taken is None:
+            continue
+        ratio = score / total if score is not None and total else None
+        for period in PERIODS:
+            start = period_start(taken, period)
+            for table, key in (("rollup_set", set_id), ("rollup_user", user_name)):
+                if key is None:
+                    continue
+                s = sums.setdefault((table, key, period, start), [0, 0, 0.0])
+                s[0] += 1
+                if ratio is not None:
+                    s[1] += 1
+                    s[2] += ratio
+    return sums
+
+
+def rollup_batch(db, last_id, horizon, batch=ROLLUP_BATCH):
+    """Fold up to `batch` results in (last_id, horizon]; returns (new last_id, rows)."""
+    d = db.dialect
+    db.cursor.execute("""
+        SELECT result_id, user_name, set_id, score, total, date_taken FROM results
+        WHERE result_id > %s AND result_id <= %s
+        UNION ALL
+        SELECT result_id, user_name, set_id, score, total, date_taken FROM results_archive
+        WHERE result_id > %s AND result_id <= %s
+        ORDER BY result_id
+        LIMIT %s
+    """, (last_id, horizon, last_id, horizon, batch))
+    rows = db.cursor.fetchall()
+    if not rows:
+        return last_id, 0
+
+    for table, key_col in (("rollup_set", "set_id"), ("rollup_user", "user_name")):
+        values = [(key, period, start, n, graded, ratio_sum)
+                  for (t, key, period, start), (n, graded, ratio_sum) in fold(rows).items() if t == table]
+        if not values:
+            continue
+        db.cursor.executemany(f"""
+            INSERT INTO {table} ({key_col}, period, period_start, attempts, graded, ratio_sum)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            {d.upsert(f'{key_col}, period, period_start')}
+                attempts = attempts + {d.inserted('attempts')},
+                graded = graded + {d.inserted('graded')},
+                ratio_sum = ratio_sum + {d.inserted('ratio_sum')}
+        """, values)
+    last_id = rows[-1][0]
+    db.cursor.execute("UPDATE rollup_state SET last_id=%s WHERE name=%s", (last_id, STATE_NAME))
+    return last_id, len(rows)
+
+
+def _fold_to_horizon(batch, stop):
+    with Database() as db:
+        last_id, horizon = get_state(db)
+    folded = 0
+    while stop is None or not stop.is_set():
+        with Database() as db:
+            last_id, n = rollup_batch(db, last_id, horizon, batch)
+        folded += n
+        if n < batch:
+            break
+    with Database() as db:
+        advance_horizon(db)
+    return folded
+
+
+def run_rollups(batch=ROLLUP_BATCH, stop=None, settle_s=ROLLUP_SETTLE_S):
+    """Fold everything up to the previous horizon, move it, wait `settle_s` and fold again.
+
+    The second pass makes a run current to within a few seconds instead of a
+    whole interval; returns rows folded.
+    """
+    folded = _fold_to_horizon(batch, stop)
+    if settle_s:
+        if stop is None:
+            time.sleep(settle_s)
+        elif stop.wait(settle_s):
+            return folded
+        folded += _fold_to_horizon(batch, stop)
+    return folded
+
+
+# ---------------------------
+# Reads (chart page)
+# ---------------------------
+def set_trend(db, set_id=None, period="w", limit=26):
+    """[(period_start, attempts, average_percent or None)] oldest first, newest `limit` periods.
+
+    set_id None = all sets together.
+    """
+    where, params = "period = %s", [period]
+    if set_id is not None:
+        where += " AND set_id = %s"
+        params.append(set_id)
+    db.cursor.execute(f"""
+        SELECT period_start, SUM(attempts), SUM(ratio_sum) * 100 / NULLIF(SUM(graded), 0)
+        FROM rollup_set WHERE {where}
+        GROUP BY period_start
+        ORDER BY period_start DESC
+        LIMIT %s
+    """, tuple(params + [limit]))
+    return list(reversed(db.cursor.fetchall()))
+
+
+def user_trend(db, user_name, period="w", limit=26):
+    """[(period_start, attempts, average_percent or None)] oldest first."""
+    db.cursor.execute("""
+        SELECT period_start, attempts, ratio_sum * 100 / NULLIF(graded, 0)
+        FROM rollup_user WHERE user_name = %s AND period = %s
+        ORDER BY period_start DESC
+        LIMIT %s
+    """, (user_name, period, limit))
+    return list(reversed(db.cursor.fetchall()))
+
+
+def rollup_status(db):
+    """(last_id, horizon, updated_at) of the results rollup, or None before the first run."""
+    db.cursor.execute("SELECT last_id, horizon, updated_at FROM rollup_state WHERE name=%s", (STATE_NAME,))
+    return db.cursor.fetchone()
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fold new E-XAM results into the daily / weekly rollups.")
+    p.add_argument("--batch", type=int, default=ROLLUP_BATCH, help="results per transaction")
+    args = p.parse_args(argv)
+    create_tables()
+    folded = run_rollups(args.batch)
+    print(f"Folded {folded} result(s) into the rollups.")
+
+
+if __name__ == "__main__":
+    main()
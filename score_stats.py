@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+E-XAM score statistics (distributions, percentiles, percentile ranks)
+- Sketches: per-set histograms of score / total in 1% bins
+  (exam_db.score_sketch, SKETCH_BINS), updated by insert_result(s) in the
+  same transaction as the result, so reads never scan `results`
+- Percentiles interpolate inside a bin (error below one percentage point);
+  percentile_rank() answers "what percentile is this candidate" as
+  (below + half of the same bin) / graded attempts
+- Vectorized with NumPy when it is installed (pip install numpy), plain
+  Python otherwise; both give the same numbers
+- SketchCache: sketches kept in memory per process, loaded for many sets
+  in one query; pages drop it when the change feed reports new results
+- exact_distribution(): streams the raw score / total pairs in chunks of
+  [stats] chunk rows and keeps one count per distinct pair, for exact
+  percentiles in bounded memory (CLI, checks)
+
+No tkinter import here.
+
+    python score_stats.py --set 12 [--exact]
+    python score_stats.py --rebuild
+"""
+import argparse
+import bisect
+import threading
+from collections import Counter
+
+import exam_config
+import exam_db
+from exam_db import Database, SKETCH_BINS, create_tables
+
+try:
+    import numpy as np
+except ImportError:  # same results, slower for large batches
+    np = None
+
+STATS_CHUNK = exam_config.getint("stats", "chunk")  # rows fetched per round when streaming raw scores
+
+DEFAULT_PERCENTILES = (25, 50, 75, 90)
+
+
+# ---------------------------
+# Sketch math (counts: SKETCH_BINS ints, bin i = [i%, i+1%))
+# ---------------------------
+def empty_counts():
+    return np.zeros(SKETCH_BINS, dtype=np.int64) if np is not None else [0] * SKETCH_BINS
+
+
+def counts_from_rows(rows):
+    """{set_id: counts} from (set_id, bin, n) rows."""
+    sketches = {}
+    for set_id, b, n in rows:
+        counts = sketches.get(set_id)
+        if counts is None:
+            counts = sketches[set_id] = empty_counts()
+        counts[b] += n
+    return sketches
+
+
+def histogram(ratios):
+    """Sketch counts of an iterable of score ratios (0..1)."""
+    if np is not None:
+        bins = np.clip(np.floor(np.asarray(ratios, dtype=np.float64) * 100 + 1e-9), 0, SKETCH_BINS - 1)
+        return np.bincount(bins.astype(np.int64), minlength=SKETCH_BINS)
+    counts = [0] * SKETCH_BINS
+    for r in ratios:
+        counts[min(max(int(r * 100 + 1e-9), 0), SKETCH_BINS - 1)] += 1
+    return counts
+
+
+def percentiles(counts, qs=DEFAULT_PERCENTILES):
+    """Score percent at each percentile in `qs` (0..100); None values when there is no data."""
+    if np is not None:
+        counts = np.asarray(counts, dtype=np.float64)
+        cum = np.cumsum(counts)
+        n = cum[-1]
+        if n == 0:
+            return [None] * len(qs)
+        targets = np.asarray(qs, dtype=np.float64) / 100 * n
+        idx = np.minimum(np.searchsorted(cum, targets, side="left"), SKETCH_BINS - 1)
+        idx = np.where(counts[idx] == 0, np.searchsorted(cum, targets, side="right"), idx)
+        idx = np.minimum(idx, SKETCH_BINS - 1)
+        before = cum[idx] - counts[idx]
+        frac = np.clip((targets - before) / np.maximum(counts[idx], 1), 0, 1)
+        values = np.minimum(idx + np.where(idx == SKETCH_BINS - 1, 0, frac), 100)
+        return [float(v) for v in values]
+    cum, total = [], 0
+    for c in counts:
+        total += c
+        cum.append(total)
+    if total == 0:
+        return [None] * len(qs)
+    values = []
+    for q in qs:
+        target = q / 100 * total
+        i = min(bisect.bisect_left(cum, target), SKETCH_BINS - 1)
+        if counts[i] == 0:
+            i = min(bisect.bisect_right(cum, target), SKETCH_BINS - 1)
+        frac = min(max((target - (cum[i] - counts[i])) / max(counts[i], 1), 0), 1)
+        values.append(float(min(i + (0 if i == SKETCH_BINS - 1 else frac), 100)))
+    return values
+
+
+def percentile_ranks(counts, ratios):
+    """Percentile rank (0..100) of each score ratio within `counts`; None when there is no data."""
+    ratios = list(ratios)
+    if np is not None:
+        counts = np.asarray(counts, dtype=np.float64)
+        n = counts.sum()
+        if n == 0:
+            return [None] * len(ratios)
+        bins = np.clip(np.floor(np.asarray(ratios, dtype=np.float64) * 100 + 1e-9), 0, SKETCH_BINS - 1).astype(np.int64)
+        below = np.concatenate(([0.0], np.cumsum(counts)))[bins]
+        return [float(v) for v in (below + counts[bins] / 2) * 100 / n]
+    n = sum(counts)
+    if n == 0:
+        return [None] * len(ratios)
+    below, total = [], 0
+    for c in counts:
+        below.append(total)
+        total += c
+    ranks = []
+    for r in ratios:
+        b = min(max(int(r * 100 + 1e-9), 0), SKETCH_BINS - 1)
+        ranks.append((below[b] + counts[b] / 2) * 100 / n)
+    return ranks
+
+
+def percentile_rank(counts, score, total):
+    """Percentile rank of one score, or None (ungraded / no data)."""
+    if score is None or not total:
+        return None
+    return percentile_ranks(counts, [score / total])[0]
+
+
+def coarse(counts, width=10):
+    """Merge 1% bins into `width`% buckets for display; full marks join the top bucket."""
+    counts = [int(c) for c in counts]
+    buckets = [sum(counts[i:i + width]) for i in range(0, SKETCH_BINS - 1, width)]
+    buckets[-1] += counts[-1]
+    return buckets
+
+
+def summary(counts):
+    """(graded, mean, p25, median, p75, p90) of a sketch; None values when empty."""
+    n = int(sum(counts))
+    if n == 0:
+        return 0, None, None, None, None, None
+    mids = [i + 0.5 for i in range(SKETCH_BINS - 1)] + [100.0]  # full marks is exact
+    if np is not None:
+        mean = float(np.dot(np.asarray(counts, dtype=np.float64), mids)) / n
+    else:
+        mean = sum(c * m for c, m in zip(counts, mids)) / n
+    return (n, mean) + tuple(percentiles(counts, DEFAULT_PERCENTILES))
+
+
+# ---------------------------
+# Per-process cache
+# ---------------------------
+class SketchCache:
+    """set_id -> counts, loaded on demand; invalidate() when results change.
+
+    invalidate() bumps a generation so a load that started before it is
+    returned to its caller but not stored.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sketches = {}
+        self.generation = 0
+
+    def get_many(self, set_ids):
+        """{set_id: counts} (an empty sketch for sets without graded results)."""
+        set_ids = list(set_ids)
+        with self.lock:
+            found = {s: self.sketches[s] for s in set_ids if s in self.sketches}
+            generation = self.generation
+        missing = [s for s in set_ids if s not in found]
+        if missing:
+            with Database() as db:
+                loaded = counts_from_rows(exam_db.score_sketches(db, missing))
+            with self.lock:
+                for set_id in missing:
+                    found[set_id] = loaded.get(set_id, empty_counts())
+                    if generation == self.generation:
+                        self.sketches[set_id] = found[set_id]
+        return {s: found[s] for s in set_ids}
+
+    def get(self, set_id):
+        return self.get_many([set_id])[set_id]
+
+    def invalidate(self, set_id=None):
+        with self.lock:
+            self.generation += 1
+            if set_id is None:
+                self.sketches.clear()
+            else:
+                self.sketches.pop(set_id, None)
+
+
+sketches = SketchCache()
+
+
+def set_distributions(set_ids):
+    """{set_id: summary(counts)} from the cached sketches."""
+    return {set_id: summary(counts) for set_id, counts in sketches.get_many(set_ids).items()}
+
+
+def result_percentile(result_id):
+    """(set_id, score, total, percentile rank or None) of a stored result, or None when it is gone."""
+    with Database() as db:
+        db.cursor.execute("""
+            SELECT set_id, score, total FROM results WHERE result_id = %s
+            UNION ALL
+            SELECT set_id, score, total FROM results_archive WHERE result_id = %s
+        """, (result_id, result_id))
+        row = db.cursor.fetchone()
+    if row is None:
+        return None
+    set_id, score, total = row
+    if set_id is None:
+        return set_id, score, total, None
+    return set_id, score, total, percentile_rank(sketches.get(set_id), score, total)
+
+
+# ---------------------------
+# Exact (streamed) statistics
+# ---------------------------
+def stream_scores(db, set_id, chunk=STATS_CHUNK):
+    """(score, total) rows of a set's graded results (hot + archived), one list per chunk."""
+    db.cursor.execute("""
+        SELECT score, total FROM results WHERE set_id = %s AND total > 0 AND score IS NOT NULL
+        UNION ALL
+        SELECT score, total FROM results_archive WHERE set_id = %s AND total > 0 AND score IS NOT NULL
+    """, (set_id, set_id))
+    while True:
+        rows = db.cursor.fetchmany(chunk)
+        if not rows:
+            return
+        yield rows
+
+
+def exact_distribution(set_id, qs=DEFAULT_PERCENTILES, chunk=STATS_CHUNK):
+    """(graded, mean, [percentile values], counts) computed from the raw results.
+
+    Rows are folded into a count per distinct (score, total) pair as they
+    stream, so memory follows the number of distinct scores, not of results;
+    percentiles are then selected on the cumulative counts.
+    """
+    pairs = Counter()
+    with Database() as db:
+        for rows in stream_scores(db, set_id, chunk):
+            pairs.update(map(tuple, rows))
+    groups = Counter()  # percent -> results (2/4 and 1/2 meet here)
+    for (score, total), n in pairs.items():
+        groups[score * 100 / total] += n
+    values = sorted(groups)
+    weights = [groups[v] for v in values]
+    counts = empty_counts()
+    for v, n in zip(values, weights):
+        counts[min(max(int(v + 1e-9), 0), SKETCH_BINS - 1)] += n
+    graded = sum(weights)
+    if not graded:
+        return 0, None, [None] * len(qs), counts
+    ends, total = [], 0  # ends[i] = rank just past the last result with values[i]
+    for n in weights:
+        total += n
+        ends.append(total)
+
+    def nth(k):  # k-th smallest percent (0-based)
+        return values[bisect.bisect_right(ends, k)]
+
+    out = []
+    for q in qs:  # linear interpolation between closest ranks, as numpy.percentile
+        pos = q / 100 * (graded - 1)
+        lo = int(pos)
+        lo_value, hi_value = nth(lo), nth(min(lo + 1, graded - 1))
+        out.append(lo_value + (hi_value - lo_value) * (pos - lo))
+    mean = sum(v * n for v, n in zip(values, weights)) / graded
+    return graded, mean, out, counts
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Score distributions and percentiles per set.")
+    p.add_argument("--set", type=int, dest="set_id", action="append", default=[], help="set id (repeatable)")
+    p.add_argument("--exact", action="store_true", help="also compute exact percentiles from the raw results")
+    p.add_argument("--rebuild", action="store_true", help="recompute every sketch from the results tables")
+    args = p.parse_args(argv)
+    create_tables()
+    if args.rebuild:
+        with Database() as db:
+            exam_db.rebuild_score_sketch(db)
+        print("Score sketches rebuilt.")
+    if not args.set_id:
+        if not args.rebuild:
+            p.error("use --set ID or --rebuild")
+        return
+    for set_id, (n, mean, p25, p50, p75, p90) in set_distributions(args.set_id).items():
+        if not n:
+            print(f"Set {set_id}: no graded results")
+            continue
+        print(f"Set {set_id}: {n} graded, mean {mean:.1f}%, p25 {p25:.1f}%, median {p50:.1f}%, "
+              f"p75 {p75:.1f}%, p90 {p90:.1f}%")
+        print("  " + "  ".join(f"{i * 10}-{i * 10 + 10}%: {c}" for i, c in enumerate(coarse(sketches.get(set_id)))))
+        if args.exact:
+            n, mean, (p25, p50, p75, p90), _ = exact_distribution(set_id)
+            print(f"  exact: mean {mean:.1f}%, p25 {p25:.1f}%, median {p50:.1f}%, p75 {p75:.1f}%, p90 {p90:.1f}%")
+
+
+if __name__ == "__main__":
+    main()
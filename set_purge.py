@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+E-XAM set purge (permanent removal of soft-deleted sets)
+- exam_db.delete_set() only hides a set; purging removes it together with
+  its results (hot + archived), attempts and questions
+- Deletes in bounded chunks ([purge] chunk rows, one short transaction
+  each, [purge] pause_ms apart), so no single statement holds locks that
+  block finish_quiz inserts during an exam
+- The set row goes last; an interrupted purge simply continues next time
+- PurgeJob runs in a background thread and exposes progress (done / total)
+  for the admin panel; the CLI prints it
+
+Only sets with deleted_at set can be purged. No tkinter import here.
+
+    python set_purge.py --all-deleted
+    python set_purge.py --set 12 --set 15
+"""
+import argparse
+import threading
+
+import exam_config
+import exam_db
+from exam_db import Database, DB_ERRORS, DELETE_CHUNK, create_tables
+from change_feed import record_change
+
+PURGE_PAUSE_MS = exam_config.getint("purge", "pause_ms")
+
+# children first; each table has an index on set_id
+PURGE_TABLES = (
+    ("results", "result_id"),
+    ("results_archive", "result_id"),
+    ("attempts", "attempt_id"),
+    ("questions", "question_id"),
+)
+
+
+# ---------------------------
+# Chunks
+# ---------------------------
+def is_deleted(db, set_id):
+    db.cursor.execute("SELECT deleted_at FROM sets WHERE set_id=%s", (set_id,))
+    row = db.cursor.fetchone()
+    return row is not None and row[0] is not None
+
+
+def count_rows(db, set_id):
+    """Rows a purge of this set still has to delete (children + the set row)."""
+    total = 1
+    for table, _ in PURGE_TABLES:
+        db.cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE set_id=%s", (set_id,))
+        total += db.cursor.fetchone()[0] or 0
+    return total
+
+
+def purge_chunk(db, set_id, chunk=DELETE_CHUNK):
+    """Delete up to `chunk` child rows of a deleted set; returns rows deleted.
+
+    When no children are left the set row itself is removed (counts as 1);
+    0 means the set is gone.
+    """
+    for table, pk in PURGE_TABLES:
+        db.cursor.execute(f"SELECT {pk} FROM {table} WHERE set_id=%s LIMIT %s", (set_id, chunk))
+        ids = tuple(r[0] for r in db.cursor.fetchall())
+        if ids:
+            db.cursor.execute(f"DELETE FROM {table} WHERE {pk} IN ({', '.join(['%s'] * len(ids))})", ids)
+            return len(ids)
+
+    db.cursor.execute("DELETE FROM attempt_progress WHERE set_id=%s", (set_id,))
+    db.cursor.execute("DELETE FROM results_archive_totals WHERE set_id=%s", (set_id,))
+    db.cursor.execute("DELETE FROM user_summary WHERE set_id=%s", (set_id,))
+    db.cursor.execute("DELETE FROM rollup_set WHERE set_id=%s", (set_id,))
+    db.cursor.execute("DELETE FROM score_sketch WHERE set_id=%s", (set_id,))
+    db.cursor.execute("DELETE FROM sets WHERE set_id=%s AND deleted_at IS NOT NULL", (set_id,))
+    if db.cursor.rowcount != 1:
+        return 0
+    record_change(db, "sets", set_id, "delete")
+    record_change(db, "results", None, "delete")
+    return 1
+
+
+# ---------------------------
+# Background job
+# ---------------------------
+class PurgeJob(threading.Thread):
+    """Purges `set_ids` chunk by chunk; poll .done / .total / .error / is_alive()."""
+
+    def __init__(self, set_ids, chunk=DELETE_CHUNK, pause_ms=PURGE_PAUSE_MS):
+        super().__init__(daemon=True, name="exam-purge")
+        self.set_ids = list(set_ids)
+        self.chunk = chunk
+        self.pause = pause_ms / 1000
+        self.total = None
+        self.done = 0
+        self.purged = []
+        self.error = None
+        self.stopping = threading.Event()
+
+    def run(self):
+        try:
+            with Database() as db:
+                for set_id in self.set_ids:
+                    if not is_deleted(db, set_id):
+                        raise ValueError(f"Set {set_id} is not deleted; only deleted sets can be purged.")
+                self.total = sum(count_rows(db, set_id) for set_id in self.set_ids)
+            for set_id in self.set_ids:
+                while not self.stopping.is_set():
+                    with Database() as db:
+                        n = purge_chunk(db, set_id, self.chunk)
+                    self.done += n
+                    if n == 0:
+                        self.purged.append(set_id)
+                        break
+                    self.stopping.wait(self.pause)
+        except (ValueError,) + DB_ERRORS as e:
+            self.error = e
+
+    def stop(self):
+        self.stopping.set()
+
+    def fraction(self):
+        if not self.total:
+            return 0.0
+        return min(self.done / self.total, 1.0)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Permanently remove soft-deleted E-XAM sets.")
+    p.add_argument("--set", type=int, action="append", dest="set_ids", help="set id (repeatable)")
+    p.add_argument("--all-deleted", action="store_true", help="every soft-deleted set")
+    p.add_argument("--chunk", type=int, default=DELETE_CHUNK, help="rows per transaction")
+    args = p.parse_args(argv)
+    create_tables()
+    set_ids = list(args.set_ids or [])
+    if args.all_deleted:
+        with Database() as db:
+            set_ids += [r[0] for r in exam_db.list_deleted_sets(db)]
+    if not set_ids:
+        p.error("nothing to purge (use --set ID or --all-deleted)")
+
+    job = PurgeJob(set_ids, args.chunk)
+    job.start()
+    while job.is_alive():
+        job.join(1)
+        if job.total:
+            print(f"\r{job.done}/{job.total} rows ({job.fraction() * 100:.0f}%)", end="", flush=True)
+    print()
+    if job.error:
+        raise SystemExit(f"Purge stopped: {job.error}")
+    print(f"Purged {len(job.purged)} set(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+E-XAM UI responsiveness profiler (opt-in: [profiler] enabled = 1, or
+EXAM_PROFILER_ENABLED=1)
+- Event-loop lag: an after() probe every probe_ms; how late it fires is the
+  time the loop was blocked
+- Every Tcl -> Python callback (buttons, bindings, after() jobs) is timed by
+  swapping tkinter.CallWrapper; labels carry the button text when there is one
+- Page builders called through app.load_page() are timed as "page:<name>"
+- On exit a report of the worst stalls is written (and cProfile stats of the
+  timed callbacks when [profiler] cprofile = 1)
+
+Usage (see the __main__ blocks of admin_system.py / user_system.py):
+    profiler = ui_profiler.from_config()   # before any widget is created
+    ...build the app...
+    if profiler:
+        profiler.attach(root, app)
+"""
+import atexit
+import cProfile
+import io
+import pstats
+import threading
+import time
+import tkinter
+
+import exam_config
+from query_stats import LatencyHistogram
+
+ENABLED = exam_config.getint("profiler", "enabled") != 0
+PROBE_MS = exam_config.getint("profiler", "probe_ms")
+STALL_MS = exam_config.getfloat("profiler", "stall_ms")
+REPORT_FILE = exam_config.get("profiler", "report")
+CPROFILE = exam_config.getint("profiler", "cprofile") != 0
+WORST_KEEP = 25  # stalls listed in the report
+PROBE_LABEL = "after:UIProfiler.probe"
+
+
+def callback_label(func, widget):
+    """Readable name for a Tk callback, e.g. "ExamAdminApp.logout [🔓  Logout]"."""
+    name = getattr(func, "__qualname__", repr(func))
+    if name.endswith("after.<locals>.callit"):
+        # after(ms, f): the real job is the callable captured by callit()
+        for cell in func.__closure__ or ():
+            inner = cell.cell_contents
+            if callable(inner):
+                name = "after:" + getattr(inner, "__qualname__", repr(inner))
+                break
+    try:
+        text = widget.cget("text") if isinstance(widget, tkinter.Button) else ""
+    except tkinter.TclError:
+        text = ""
+    return f"{name} [{text.strip()}]" if text else name
+
+
+class UIProfiler:
+    def __init__(self, probe_ms=PROBE_MS, stall_ms=STALL_MS, report_file=REPORT_FILE,
+                 use_cprofile=CPROFILE):
+        self.probe_ms = probe_ms
+        self.stall_s = stall_ms / 1000
+        self.report_file = report_file
+        self.lag = LatencyHistogram()
+        self.timings = {}  # label -> LatencyHistogram
+        self.stalls = []   # (ms, label, wall-clock time)
+        self.last_label = None
+        self.depth = 0
+        self.profile = cProfile.Profile() if use_cprofile else None
+        self.root = None
+        self.expected = None
+        self.lock = threading.Lock()
+
+    # ---------------------------
+    # Hooks
+    # ---------------------------
+    def install(self):
+        """Time every Tk callback created from now on."""
+        profiler = self
+        base = tkinter.CallWrapper
+
+        class ProfiledCallWrapper(base):
+            def __call__(self, *args):
+                label = callback_label(self.func, self.widget)
+                if label == PROBE_LABEL:
+                    return base.__call__(self, *args)  # don't time the probe itself
+                return profiler.run(label, base.__call__, self, *args)
+
+        tkinter.CallWrapper = ProfiledCallWrapper
+        atexit.register(self.write_report)
+
+    def attach(self, root, app):
+        """Start the lag probe on `root` and time app.load_page() page builders."""
+        self.root = root
+        load_page = getattr(app, "load_page", None)
+        if load_page is not None:
+            def timed_load_page(page_func, *args, **kwargs):
+                return self.run("page:" + page_func.__name__, load_page, page_func, *args, **kwargs)
+            app.load_page = timed_load_page
+        self.expected = time.perf_counter() + self.probe_ms / 1000
+        root.after(self.probe_ms, self.probe)
+
+    def probe(self):
+        now = time.perf_counter()
+        late = max(now - self.expected, 0.0)
+        self.lag.add(late)
+        if late >= self.stall_s:
+            # whatever ran last before the probe got its turn blocked the loop
+            self.note_stall(late, f"loop lag after {self.last_label or '?'}")
+        self.expected = now + self.probe_ms / 1000
+        try:
+            self.root.after(self.probe_ms, self.probe)
+        except tkinter.TclError:
+            pass  # root destroyed
+
+    def run(self, label, func, *args, **kwargs):
+        self.depth += 1
+        if self.profile is not None and self.depth == 1:
+            self.profile.enable()
+        t0 = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            if self.profile is not None and self.depth == 1:
+                self.profile.disable()
+            self.depth -= 1
+            self.record(label, elapsed)
+
+    def record(self, label, elapsed):
+        with self.lock:
+            hist = self.timings.get(label)
+            if hist is None:
+                hist = self.timings[label] = LatencyHistogram()
+            hist.add(elapsed)
+        self.last_label = label
+        if elapsed >= self.stall_s:
+            self.note_stall(elapsed, label)
+
+    def note_stall(self, seconds, label):
+        with self.lock:
+            self.stalls.append((seconds * 1000, label, time.strftime("%H:%M:%S")))
+            if len(self.stalls) > WORST_KEEP * 4:
+                self.stalls.sort(reverse=True)
+                del self.stalls[WORST_KEEP:]
+
+    # ---------------------------
+    # Report
+    # ---------------------------
+    def report(self):
+        out = io.StringIO()
+        lag = self.lag
+        out.write("E-XAM UI profile\n")
+        out.write(f"event-loop lag ({lag.count} probes every {self.probe_ms} ms): "
+                  f"p50 {lag.percentile(50):.1f} ms, p95 {lag.percentile(95):.1f} ms, "
+                  f"p99 {lag.percentile(99):.1f} ms, max {lag.max * 1000:.1f} ms\n\n")
+
+        out.write(f"worst stalls (>= {self.stall_s * 1000:g} ms)\n")
+        with self.lock:
+            stalls = sorted(self.stalls, reverse=True)[:WORST_KEEP]
+            timings = sorted(self.timings.items(), key=lambda kv: kv[1].max, reverse=True)
+        for ms, label, at in stalls:
+            out.write(f"  {ms:9.1f} ms  {at}  {label}\n")
+        if not stalls:
+            out.write("  none\n")
+
+        out.write("\ncallbacks / pages (slowest max first)\n")
+        out.write(f"  {'calls':>6} {'p50':>8} {'p95':>8} {'max':>8}  label\n")
+        for label, hist in timings:
+            out.write(f"  {hist.count:6d} {hist.percentile(50):8.1f} {hist.percentile(95):8.1f} "
+                      f"{hist.max * 1000:8.1f}  {label}\n")
+
+        if self.profile is not None:
+            out.write("\ncProfile (timed callbacks, top 30 by cumulative time)\n")
+            pstats.Stats(self.profile, stream=out).sort_stats("cumulative").print_stats(30)
+        return out.getvalue()
+
+    def write_report(self):
+        text = self.report()
+        if self.report_file:
+            with open(self.report_file, "w", encoding="utf-8") as f:
+                f.write(text)
+            if self.profile is not None:
+                self.profile.dump_stats(self.report_file.rsplit(".", 1)[0] + ".prof")
+        else:
+            print(text)
+
+
+def from_config():
+    """A started UIProfiler when [profiler] enabled = 1, else None."""
+    if not ENABLED:
+        return None
+    profiler = UIProfiler()
+    profiler.install()
+    return profiler
@@ -6,20 +6,23 @@ E-XAM Admin Panel (Tkinter GUI) - Minimal grayscale theme + emoji icons
 - Removed "active set" usage in GUI
 - Refresh buttons added for Manage Sets and Results
 - Minimal grayscale palette, emoji icons kept
-- Uses Database context manager for MySQL connections
+- Uses the shared Database / repository layer in exam_db.py
 
 Dependencies:
-    pip install mysql-connector-python
+    pip install mysql-connector-python   (not needed for EXAM_DB_BACKEND=sqlite)
 """
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import mysql.connector
 from datetime import datetime
+import exam_config
+import exam_db
+from exam_db import Database, create_tables, DB_ERRORS
 
 # ---------------------------
 # CONFIG
 # ---------------------------
-ADMIN_KEY = "1234"  # change to your secure admin key
+ADMIN_KEY = exam_config.get("admin", "key")  # set [admin] key / EXAM_ADMIN_KEY per site
+RESULTS_PAGE_SIZE = exam_config.getint("admin", "results_page_size")  # newest results listed
 WIN_W = 1000
 WIN_H = 640
 
@@ -33,81 +36,6 @@ HDR_BG = "#EDEDED"      # header background
 BORDER = "#BFBFBF"      # borders / separators
 TEXT = "#000000"        # text color
 
-# ---------------------------
-# DATABASE CONNECTION (light OOP)
-# ---------------------------
-class Database:
-    def __init__(self):
-        # Update to your DB credentials
-        self.host = "localhost"
-        self.user = "root"
-        self.password = ""
-        self.database = "exam_system"
-        self.conn = None
-        self.cursor = None
-
-    def __enter__(self):
-        self.conn = mysql.connector.connect(
-            host=self.host,
-            user=self.user,
-            password=self.password,
-            database=self.database,
-            autocommit=False
-        )
-        self.cursor = self.conn.cursor()
-        return self
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn:
-            if exc_type:
-                self.conn.rollback()
-            else:
-                self.conn.commit()
-            try:
-                self.cursor.close()
-            except Exception:
-                pass
-            try:
-                self.conn.close()
-            except Exception:
-                pass
-
-# ---------------------------
-# TABLE CREATION (no is_active used)
-# ---------------------------
-def create_tables():
-    try:
-        with Database() as db:
-            db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS sets (
-                    set_id INT AUTO_INCREMENT PRIMARY KEY,
-                    set_name VARCHAR(255) UNIQUE,
-                    date_created DATETIME
-                )
-            """)
-            db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS questions (
-                    question_id INT AUTO_INCREMENT PRIMARY KEY,
-                    set_id INT,
-                    question_text TEXT,
-                    answer TEXT,
-                    FOREIGN KEY (set_id) REFERENCES sets(set_id) ON DELETE CASCADE
-                )
-            """)
-            db.cursor.execute("""
-                CREATE TABLE IF NOT EXISTS results (
-                    result_id INT AUTO_INCREMENT PRIMARY KEY,
-                    user_name VARCHAR(255),
-                    set_id INT,
-                    score INT,
-                    total INT,
-                    date_taken DATETIME,
-                    FOREIGN KEY (set_id) REFERENCES sets(set_id) ON DELETE CASCADE
-                )
-            """)
-    except mysql.connector.Error as e:
-        messagebox.showerror("Database Error", f"Could not create tables:\n{e}")
-
 # ---------------------------
 # Helper: simple button creation to preserve minimal look
 # ---------------------------
@@ -138,7 +66,10 @@ class ExamAdminApp(tk.Tk):
         self.main_frame = None
         self.content_frame = None
 
-        create_tables()
+        try:
+            create_tables()
+        except DB_ERRORS as e:
+            messagebox.showerror("Database Error", f"Could not create tables:\n{e}")
         self.show_login()
 
     # ---------------------------
@@ -249,11 +180,9 @@ class ExamAdminApp(tk.Tk):
 
         try:
             with Database() as db:
-                db.cursor.execute("SELECT COUNT(*) FROM sets")
-                total_sets = db.cursor.fetchone()[0] or 0
-                db.cursor.execute("SELECT COUNT(DISTINCT user_name) FROM results")
-                total_users = db.cursor.fetchone()[0] or 0
-        except mysql.connector.Error as e:
+                total_sets = exam_db.count_sets(db)
+                total_users = exam_db.count_result_users(db)
+        except DB_ERRORS as e:
             messagebox.showerror("Database Error", str(e))
             return
 
@@ -279,14 +208,11 @@ class ExamAdminApp(tk.Tk):
 
         try:
             with Database() as db:
-                db.cursor.execute("SELECT set_id, set_name FROM sets ORDER BY set_id DESC")
-                sets = db.cursor.fetchall()
-                for s in sets:
-                    db.cursor.execute("SELECT AVG(score/NULLIF(total,0))*100 FROM results WHERE set_id=%s", (s[0],))
-                    avg = db.cursor.fetchone()[0]
-                    avg_display = f"{avg:.2f}%" if avg is not None else "No results"
-                    tree.insert("", "end", values=(s[0], s[1], avg_display))
-        except mysql.connector.Error as e:
+                averages = exam_db.set_averages(db)
+            for set_id, set_name, avg in averages:
+                avg_display = f"{avg:.2f}%" if avg is not None else "No results"
+                tree.insert("", "end", values=(set_id, set_name, avg_display))
+        except DB_ERRORS as e:
             messagebox.showerror("Database Error", str(e))
 
     # ---------------------------
@@ -362,25 +288,14 @@ class ExamAdminApp(tk.Tk):
                     return
             try:
                 with Database() as db:
-                    db.cursor.execute(
-                        "INSERT INTO sets (set_name, date_created) VALUES (%s, %s)",
-                        (set_name, datetime.now())
-                    )
-                    db.cursor.execute("SELECT set_id FROM sets WHERE set_name=%s", (set_name,))
-                    row = db.cursor.fetchone()
-                    if row:
-                        set_id = row[0]
-                        for q, a in questions_list:
-                            db.cursor.execute(
-                                "INSERT INTO questions (set_id, question_text, answer) VALUES (%s, %s, %s)",
-                                (set_id, q, a)
-                            )
+                    set_id = exam_db.insert_set(db, set_name, datetime.now())
+                    exam_db.insert_questions(db, set_id, [(q, a, "text", None, 0) for q, a in questions_list])
                 messagebox.showinfo("Success", f"Set '{set_name}' created successfully!")
                 # clear
                 set_name_var.set("")
                 lstbox.delete(0, "end")
                 questions_list.clear()
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 # Integrity error (duplicate name) or others
                 messagebox.showerror("Database Error", str(e))
 
@@ -417,10 +332,9 @@ class ExamAdminApp(tk.Tk):
                 sets_tree.delete(r)
             try:
                 with Database() as db:
-                    db.cursor.execute("SELECT set_id, set_name FROM sets ORDER BY set_id DESC")
-                    for s in db.cursor.fetchall():
+                    for s in exam_db.list_sets(db):
                         sets_tree.insert("", "end", values=(s[0], s[1]))
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
         refresh_sets_btn = simple_button(left, "Refresh Sets", command=load_sets)
         refresh_sets_btn.pack(fill="x", padx=8, pady=(0,8))
@@ -452,10 +366,9 @@ class ExamAdminApp(tk.Tk):
             set_id = sets_tree.item(sel[0])["values"][0]
             try:
                 with Database() as db:
-                    db.cursor.execute("SELECT question_id, question_text, answer FROM questions WHERE set_id=%s", (set_id,))
-                    for q in db.cursor.fetchall():
+                    for q in exam_db.list_questions(db, set_id):
                         q_tree.insert("", "end", values=(q[0], q[1], q[2]))
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         sets_tree.bind("<<TreeviewSelect>>", on_set_select)
@@ -474,10 +387,10 @@ class ExamAdminApp(tk.Tk):
                 return
             try:
                 with Database() as db:
-                    db.cursor.execute("INSERT INTO questions (set_id, question_text, answer) VALUES (%s, %s, %s)", (set_id, qtext.strip(), ans.strip()))
+                    exam_db.insert_question(db, set_id, qtext.strip(), ans.strip())
                 on_set_select(None)
                 messagebox.showinfo("Success", "Question added.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def edit_question():
@@ -494,10 +407,12 @@ class ExamAdminApp(tk.Tk):
                 return
             try:
                 with Database() as db:
-                    db.cursor.execute("UPDATE questions SET question_text=%s, answer=%s WHERE question_id=%s", (new_q.strip(), new_a.strip(), q_id))
+                    exam_db.update_question_text(db, q_id, new_q.strip(), new_a.strip())
                 on_set_select(None)
                 messagebox.showinfo("Success", "Question updated.")
-            except mysql.connector.Error as e:
+            except ValueError as e:
+                messagebox.showwarning("Question changed", str(e))
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def delete_question():
@@ -510,10 +425,10 @@ class ExamAdminApp(tk.Tk):
                 return
             try:
                 with Database() as db:
-                    db.cursor.execute("DELETE FROM questions WHERE question_id=%s", (q_id,))
+                    exam_db.delete_questions(db, [q_id])
                 on_set_select(None)
                 messagebox.showinfo("Deleted", "Question deleted.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         def delete_set():
@@ -522,16 +437,16 @@ class ExamAdminApp(tk.Tk):
                 messagebox.showinfo("Select Set", "Select a set to delete.")
                 return
             set_id = sets_tree.item(sel[0])["values"][0]
-            if not messagebox.askyesno("Confirm", "Delete set and all its questions?"):
+            if not messagebox.askyesno("Confirm", "Delete this set? Past results are kept."):
                 return
             try:
                 with Database() as db:
-                    db.cursor.execute("DELETE FROM sets WHERE set_id=%s", (set_id,))
+                    exam_db.delete_set(db, set_id)
                 load_sets()
                 for r in q_tree.get_children():
                     q_tree.delete(r)
                 messagebox.showinfo("Deleted", "Set deleted.")
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         # Buttons
@@ -579,20 +494,14 @@ class ExamAdminApp(tk.Tk):
                 tree.delete(i)
             try:
                 with Database() as db:
-                    db.cursor.execute("""
-                        SELECT r.result_id, r.user_name, s.set_name, r.score, r.total, r.date_taken
-                        FROM results r
-                        LEFT JOIN sets s ON r.set_id = s.set_id
-                        ORDER BY r.date_taken DESC
-                    """)
-                    rows = db.cursor.fetchall()
+                    rows = exam_db.list_results(db, RESULTS_PAGE_SIZE)
                     for r in rows:
                         date_val = r[5]
                         if hasattr(date_val, "strftime"):
                             date_val = date_val.strftime("%Y-%m-%d %H:%M:%S")
                         display_set = r[2] or "(deleted set)"
                         tree.insert("", "end", values=(r[0], r[1], display_set, r[3], r[4], date_val))
-            except mysql.connector.Error as e:
+            except DB_ERRORS as e:
                 messagebox.showerror("Database Error", str(e))
 
         # Refresh button
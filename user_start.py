@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+E-XAM user client, fast cold start (recommended launcher for exam PCs)
+- Imports only tkinter before the login screen is on screen
+- A background thread then imports the client (user_system -> exam_services
+  -> exam_db -> DB driver) and opens [startup] warm_connections pooled
+  connections while the candidate types; in API mode ([client] api_url)
+  the client never touches the database, so there is no pool to warm
+- The first Login click hands the typed name / PIN to QuizUserApp; it only
+  waits if the background warm-up is still running
+- Startup timings are appended to [startup] timings_log (JSON lines)
+
+    python user_start.py
+"""
+import time
+
+T0 = time.perf_counter()
+
+import json
+import threading
+import tkinter as tk
+from datetime import datetime
+
+T_TK_IMPORTED = time.perf_counter()
+
+
+class Warmup(threading.Thread):
+    """Imports the client stack and warms the connection pool off the UI thread."""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.timings = {}
+        self.error = None
+        self.user_system = None
+
+    def run(self):
+        t = time.perf_counter()
+        try:
+            import user_system  # exam_services, exam_db and the DB driver come with it
+            import exam_api
+            import exam_config
+            import exam_db
+        except Exception as e:
+            self.error = e
+            return
+        self.user_system = user_system
+        self.timings["core_import_ms"] = (time.perf_counter() - t) * 1000
+        self.timings["backend"] = "api" if exam_api.API_URL else exam_db.DB_BACKEND
+        self.log_file = exam_config.get("startup", "timings_log")
+        if exam_api.API_URL:
+            return  # HTTP connections are per thread: the UI thread opens its own on login
+
+        t = time.perf_counter()
+        try:
+            exam_db.warm_pool(exam_config.getint("startup", "warm_connections"))
+        except Exception as e:
+            self.error = e  # best effort; QuizUserApp reports DB errors on the first real query
+        self.timings["pool_warm_ms"] = (time.perf_counter() - t) * 1000
+
+
+class QuickLogin:
+    """Same login form as QuizUserApp.build_login_screen, without the client imports."""
+
+    def __init__(self, root):
+        self.root = root
+        self.app = None
+        self.timings = {}
+        root.title("Quiz System - User Panel")
+        root.geometry("500x480")
+        root.configure(bg="#f0f0f0")
+
+        tk.Label(root, text="Welcome to the Quiz System",
+                 font=("Arial", 16), bg="#f0f0f0").pack(pady=20)
+        tk.Label(root, text="Enter your username:", bg="#f0f0f0").pack()
+        self.user_entry = tk.Entry(root, width=30)
+        self.user_entry.pack(pady=5)
+        self.user_entry.focus()
+        tk.Label(root, text="Enter your PIN:", bg="#f0f0f0").pack()
+        self.pin_entry = tk.Entry(root, show="*", width=30)
+        self.pin_entry.pack(pady=5)
+        self.status = tk.Label(root, text="", bg="#f0f0f0", fg="#777777")
+        self.status.pack()
+        self.login_btn = tk.Button(root, text="Login / Register", width=20, command=self.login)
+        self.login_btn.pack(pady=15)
+
+        self.warmup = Warmup()
+        root.after_idle(self.painted)
+
+    def painted(self):
+        self.timings["first_paint_ms"] = (time.perf_counter() - T0) * 1000
+        self.warmup.start()
+
+    def login(self):
+        if self.app is not None:
+            return
+        if self.warmup.is_alive():
+            # still importing / connecting: keep the window responsive and retry
+            self.status.config(text="Connecting…")
+            self.login_btn.config(state="disabled")
+            self.timings.setdefault("first_action_wait_start", time.perf_counter())
+            self.root.after(50, self.login)
+            return
+        waited = time.perf_counter() - self.timings.pop("first_action_wait_start", time.perf_counter())
+        self.timings["first_action_wait_ms"] = waited * 1000
+
+        if self.warmup.user_system is None:
+            from tkinter import messagebox
+            messagebox.showerror("Startup Error", f"Could not load the quiz client:\n{self.warmup.error}")
+            self.login_btn.config(state="normal")
+            return
+
+        user_name, pin = self.user_entry.get(), self.pin_entry.get()
+        t = time.perf_counter()
+        self.app = self.warmup.user_system.QuizUserApp(self.root)  # replaces this form
+        self.timings["app_build_ms"] = (time.perf_counter() - t) * 1000
+        self.app.user_entry.insert(0, user_name)
+        self.app.pin_entry.insert(0, pin)
+        self.record()
+        self.app.start_user_panel()
+
+    def record(self):
+        entry = {
+            "when": datetime.now().isoformat(timespec="seconds"),
+            "tk_import_ms": (T_TK_IMPORTED - T0) * 1000,
+            **self.timings,
+            **self.warmup.timings,
+            "warm_error": str(self.warmup.error) if self.warmup.error else None,
+        }
+        log_file = getattr(self.warmup, "log_file", None)
+        if log_file:
+            try:
+                with open(log_file, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError:
+                pass
+
+
+def main():
+    root = tk.Tk()
+    QuickLogin(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()
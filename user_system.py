@@ -1,53 +1,59 @@
+import base64
+import time
 import tkinter as tk
-from tkinter import messagebox, ttk
-import mysql.connector
 from datetime import datetime
+from tkinter import messagebox, ttk
+import exam_api
+import exam_config
+import exam_services
+import result_qr
+import ui_profiler
+from exam_db import DB_ERRORS
+from exam_monitor import HeartbeatBatcher
+from question_types import option_letter
 
-# ============================================================
-# DATABASE CLASS
-# ============================================================
-class Database:
-    def __init__(self):
-        self.host = "localhost"
-        self.user = "root"
-        self.password = ""
-        self.database = "exam_system"
-        self.conn = None
-        self.cursor = None
-
-    def __enter__(self):
-        try:
-            self.conn = mysql.connector.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database
-            )
-            self.cursor = self.conn.cursor()
-            return self
-        except mysql.connector.Error as e:
-            messagebox.showerror("Database Error", f"Cannot connect to database:\n{e}")
-            return None
+HEARTBEAT_FLUSH_MS = exam_config.getint("user", "heartbeat_flush_ms")  # progress is written at most this often per client
+
+# [client] api_url set: same calls, served by exam_server.py instead of a direct DB connection
+services = exam_api if exam_api.API_URL else exam_services
+CLIENT_ERRORS = DB_ERRORS + exam_api.API_ERRORS
+
+
+def db_error(e):
+    target = "the exam server" if services is exam_api else "database"
+    messagebox.showerror("Database Error", f"Cannot connect to {target}:\n{e}")
 
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        if self.conn:
-            self.conn.commit()
-            self.cursor.close()
-            self.conn.close()
+
+def percent(value):
+    return f"{value:.0f}%" if value is not None else "-"
 
 # ============================================================
-# USER GUI APPLICATION
+# USER GUI APPLICATION (screens only; logic lives in exam_services.py / exam_api.py)
 # ============================================================
 class QuizUserApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Quiz System - User Panel")
-        self.root.geometry("500x420")
+        self.root.geometry("500x480")
         self.root.configure(bg="#f0f0f0")
 
         self.user_name = ""
         self.user_pin = ""
 
+        # sets list cached until the change feed reports a `sets` change
+        self.catalog = services.SetCatalog()
+
+        # live monitor heartbeats (coalesced, flushed by an after() loop)
+        self.heartbeat = HeartbeatBatcher()
+        self.heartbeat_job = None
+
+        # current attempt (exam_services.QuizSession or exam_api.QuizSession)
+        self.session = None
+
+        # countdown (deadline comes from the server, ticks with after())
+        self.timer_job = None
+        self.question_deadline_at = None
+
         self.build_login_screen()
 
     # --------------------------------------------------------
@@ -76,34 +82,49 @@ class QuizUserApp:
         username = self.user_entry.get().strip()
         pin = self.pin_entry.get().strip()
 
-        if not username or not pin:
-            messagebox.showwarning("Error", "Please enter both username and PIN!")
+        try:
+            outcome = services.login_or_register(username, pin)
+        except ValueError as e:
+            messagebox.showwarning("Error", str(e))
+            return
+        except CLIENT_ERRORS as e:
+            db_error(e)
             return
 
-        with Database() as db:
-            if not db:
-                return
-
-            # Check if user exists
-            db.cursor.execute("SELECT pin FROM users WHERE user_name=%s", (username,))
-            record = db.cursor.fetchone()
-
-            if record:
-                if record[0] != pin:
-                    messagebox.showerror("Login Failed", "Incorrect PIN!")
-                    return
-            else:
-                # Register new user
-                try:
-                    db.cursor.execute("INSERT INTO users (user_name, pin) VALUES (%s, %s)", (username, pin))
-                    messagebox.showinfo("New User", f"User '{username}' created successfully!")
-                except mysql.connector.Error as e:
-                    messagebox.showerror("Database Error", f"Failed to create user:\n{e}")
-                    return
+        if outcome == services.LOGIN_BAD_PIN:
+            messagebox.showerror("Login Failed", "Incorrect PIN!")
+            return
+        if outcome == services.LOGIN_REGISTERED:
+            messagebox.showinfo("New User", f"User '{username}' created successfully!")
 
         self.user_name = username
         self.user_pin = pin
-        self.build_user_menu()
+        if not self.offer_resume():
+            self.build_user_menu()
+
+    # --------------------------------------------------------
+    # RESUME UNFINISHED ATTEMPT (from last checkpoint)
+    # --------------------------------------------------------
+    def offer_resume(self):
+        try:
+            pending = services.QuizSession.pending(self.user_name)
+            if not pending:
+                return False
+            set_name, index = pending[2], pending[3]
+            if not messagebox.askyesno(
+                "Resume Quiz",
+                f"You have an unfinished attempt on '{set_name}' "
+                f"(question {index + 1}).\nResume where you left off?"
+            ):
+                services.QuizSession.abandon(pending)
+                return False
+            session = services.QuizSession.resume(self.user_name, pending, self.heartbeat)
+        except CLIENT_ERRORS as e:
+            db_error(e)
+            return False
+
+        self.begin_quiz(session)
+        return True
 
     # --------------------------------------------------------
     # MAIN USER MENU
@@ -125,15 +146,23 @@ class QuizUserApp:
         tk.Button(self.root, text="Logout",
                   width=30, command=self.build_login_screen).pack(pady=10)
 
+    # --------------------------------------------------------
+    # SETS LIST (cached, refreshed via change feed)
+    # --------------------------------------------------------
+    def load_sets(self):
+        try:
+            return self.catalog.sets()
+        except CLIENT_ERRORS as e:
+            db_error(e)
+            return None
+
     # --------------------------------------------------------
     # VIEW ALL QUIZZES
     # --------------------------------------------------------
     def view_all_sets(self):
-        with Database() as db:
-            if not db:
-                return
-            db.cursor.execute("SELECT set_id, set_name FROM sets")
-            sets = db.cursor.fetchall()
+        sets = self.load_sets()
+        if sets is None:
+            return
 
         win = tk.Toplevel(self.root)
         win.title("Available Quizzes")
@@ -158,11 +187,9 @@ class QuizUserApp:
     # TAKE QUIZ (Select & Start)
     # --------------------------------------------------------
     def take_quiz_select(self):
-        with Database() as db:
-            if not db:
-                return
-            db.cursor.execute("SELECT set_id, set_name FROM sets")
-            self.all_sets = db.cursor.fetchall()
+        self.all_sets = self.load_sets()
+        if self.all_sets is None:
+            return
 
         if not self.all_sets:
             messagebox.showinfo("No Quiz", "No quizzes available.")
@@ -196,112 +223,272 @@ class QuizUserApp:
         parent_win.destroy()
         set_id = int(selected.split(" - ")[0])
 
-        with Database() as db:
-            if not db:
-                return
-            db.cursor.execute("""
-                SELECT question_id, question_text, answer 
-                FROM questions WHERE set_id=%s
-            """, (set_id,))
-            self.questions = db.cursor.fetchall()
+        try:
+            # server-side attempt record holds the authoritative deadline
+            session = services.QuizSession.start(self.user_name, set_id, self.heartbeat)
+        except CLIENT_ERRORS as e:
+            db_error(e)
+            return
 
-        if not self.questions:
+        if session is None:
             messagebox.showerror("Error", "This quiz has no questions.")
             return
 
-        self.current_index = 0
-        self.score = 0
-        self.current_set_id = set_id
+        self.begin_quiz(session)
+
+    def begin_quiz(self, session):
+        self.session = session
         self.quiz_window()
+        self.schedule_heartbeat()
+        self.tick_timer()
 
     # --------------------------------------------------------
     # QUIZ WINDOW
     # --------------------------------------------------------
     def quiz_window(self):
         self.clear_screen()
-        if self.current_index >= len(self.questions):
+        session = self.session
+        if session.done:
             self.finish_quiz()
             return
 
-        q_id, question_text, correct_answer = self.questions[self.current_index]
+        q_id, question_text, correct_answer, qtype, options, _ = session.current
+        session.show_progress()
 
-        tk.Label(self.root, text=f"Question {self.current_index + 1}",
+        tk.Label(self.root, text=f"Question {session.index + 1}",
                  font=("Arial", 16), bg="#f0f0f0").pack(pady=20)
 
+        self.timer_label = tk.Label(self.root, text="", font=("Arial", 11), bg="#f0f0f0")
+        self.timer_label.pack()
+        if session.question_time:
+            # a resumed question keeps the time the server says is left of it
+            left = session.question_remaining
+            session.question_remaining = None
+            self.question_deadline_at = time.monotonic() + (session.question_time if left is None else left)
+        self.update_timer_label()
+
         tk.Label(self.root, text=question_text, font=("Arial", 13),
                  wraplength=450, bg="#f0f0f0").pack(pady=10)
 
-        self.answer_entry = tk.Entry(self.root, width=40)
-        self.answer_entry.pack(pady=10)
+        # answer widgets per type; choice answers are kept as a bitmask
+        self.choice_vars = []
+        if qtype == "text":
+            self.answer_entry = tk.Entry(self.root, width=40)
+            self.answer_entry.pack(pady=10)
+        elif qtype == "multi":
+            tk.Label(self.root, text="(select all that apply)", bg="#f0f0f0").pack()
+            for i, opt in enumerate(options):
+                var = tk.IntVar(value=0)
+                self.choice_vars.append(var)
+                tk.Checkbutton(self.root, text=f"{option_letter(i)}) {opt}", variable=var,
+                               bg="#f0f0f0", anchor="w").pack(fill="x", padx=60)
+        else:  # mc / tf
+            self.choice_var = tk.IntVar(value=-1)
+            for i, opt in enumerate(options):
+                tk.Radiobutton(self.root, text=f"{option_letter(i)}) {opt}", value=i,
+                               variable=self.choice_var, bg="#f0f0f0", anchor="w").pack(fill="x", padx=60)
 
         tk.Button(self.root, text="Submit", command=self.submit_answer).pack(pady=20)
 
+    # --------------------------------------------------------
+    # COUNTDOWN (one after() tick per second, no busy loop)
+    # --------------------------------------------------------
+    def remaining(self, at):
+        return None if at is None else max(int(at - time.monotonic() + 0.999), 0)
+
+    def update_timer_label(self):
+        parts = []
+        left = self.session.seconds_left()
+        if left is not None:
+            parts.append(f"Time left: {left // 60:02d}:{left % 60:02d}")
+        q_left = self.remaining(self.question_deadline_at)
+        if q_left is not None:
+            parts.append(f"This question: {q_left}s")
+        self.timer_label.config(text="   ".join(parts))
+
+    def tick_timer(self):
+        self.timer_job = None
+        session = self.session
+        if session.deadline_at is None and not session.question_time:
+            return
+        if session.seconds_left() == 0:
+            messagebox.showinfo("Time's up", "The time limit for this quiz is over.")
+            session.expire()
+            self.finish_quiz()
+            return
+        if self.question_deadline_at is not None and self.remaining(self.question_deadline_at) == 0:
+            self.submit_answer()  # auto-submit whatever was typed
+        elif self.timer_label.winfo_exists():
+            self.update_timer_label()
+        if not session.done:
+            self.timer_job = self.root.after(1000, self.tick_timer)
+
+    def stop_timer(self):
+        if self.timer_job:
+            self.root.after_cancel(self.timer_job)
+            self.timer_job = None
+        self.question_deadline_at = None
+
     # --------------------------------------------------------
     # SUBMIT ANSWER
     # --------------------------------------------------------
     def submit_answer(self):
-        user_answer = self.answer_entry.get().strip()
-        correct_answer = self.questions[self.current_index][2].strip()
-
-        if user_answer.lower() == correct_answer.lower():
-            self.score += 1
-
-        self.current_index += 1
+        qtype = self.session.current[3]
+        if qtype == "text":
+            user_answer = self.answer_entry.get().strip()
+        elif qtype == "multi":
+            user_answer = sum(1 << i for i, var in enumerate(self.choice_vars) if var.get())
+        else:
+            picked = self.choice_var.get()
+            user_answer = 1 << picked if picked >= 0 else 0
+
+        self.session.answer(user_answer)
+        if self.session.checkpoint.due():
+            self.flush_heartbeat()
         self.quiz_window()
 
     # --------------------------------------------------------
     # FINISH QUIZ
     # --------------------------------------------------------
     def finish_quiz(self):
-        total = len(self.questions)
-
-        with Database() as db:
-            if not db:
-                return
-            db.cursor.execute("""
-                INSERT INTO results (user_name, set_id, score, total, date_taken)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (self.user_name, self.current_set_id, self.score, total, datetime.now()))
+        session = self.session
+        self.stop_timer()
 
-        messagebox.showinfo("Quiz Finished",
-                            f"Your score: {self.score}/{total}\nResult saved!")
+        try:
+            accepted = session.finish()
+        except CLIENT_ERRORS as e:
+            self.stop_heartbeat()
+            db_error(e)
+            self.submit_failed_screen()
+            return
+        self.stop_heartbeat()
+
+        if accepted and session.result_token:
+            self.show_result_code(session)
+        elif accepted:
+            messagebox.showinfo("Quiz Finished",
+                                f"Your score: {session.score}/{session.total}\nResult saved!")
+        else:
+            messagebox.showwarning("Quiz Closed",
+                                   "The time limit had already passed; the server closed this attempt.")
         self.build_user_menu()
 
+    def submit_failed_screen(self):
+        """The last question is done but finish() failed: retry, or leave the attempt to resume later."""
+        self.clear_screen()
+        tk.Label(self.root, text="Your answers could not be submitted.",
+                 font=("Arial", 14), bg="#f0f0f0").pack(pady=20)
+        tk.Label(self.root, text="Check the connection and try again. If you go back to the menu,\n"
+                                 "the attempt stays open and is offered for resuming at your next login\n"
+                                 "(until its time limit runs out).",
+                 bg="#f0f0f0").pack(pady=5)
+        tk.Button(self.root, text="Retry submit", width=20, command=self.finish_quiz).pack(pady=10)
+        tk.Button(self.root, text="Back to Menu", width=20, command=self.build_user_menu).pack(pady=5)
+
+    def show_result_code(self, session):
+        """Score plus the signed result code and its QR (when the qrcode package is installed)."""
+        win = tk.Toplevel(self.root)
+        win.title("Quiz Finished")
+        win.configure(bg="#f0f0f0")
+        tk.Label(win, text=f"Your score: {session.score}/{session.total}\nResult saved!",
+                 font=("Arial", 13), bg="#f0f0f0").pack(padx=20, pady=(15, 5))
+        try:
+            png = result_qr.qr_png(result_qr.qr_text(session.result_token), box_size=5)
+            win.qr_image = tk.PhotoImage(data=base64.b64encode(png))  # keep a reference
+            tk.Label(win, image=win.qr_image, bg="#f0f0f0").pack(pady=5)
+        except (RuntimeError, tk.TclError):
+            pass  # no qrcode package: the code below still works
+        tk.Label(win, text="Result code (scan or keep it to retrieve this result):",
+                 bg="#f0f0f0").pack(padx=20)
+        code = tk.Entry(win, width=32, justify="center", font=("Courier", 11))
+        code.insert(0, session.result_token)
+        code.config(state="readonly")
+        code.pack(pady=5)
+        tk.Button(win, text="OK", width=10, command=win.destroy).pack(pady=(5, 15))
+        win.transient(self.root)
+        win.grab_set()
+        self.root.wait_window(win)
+
+    # --------------------------------------------------------
+    # HEARTBEAT (live exam monitor)
+    # --------------------------------------------------------
+    def schedule_heartbeat(self):
+        self.flush_heartbeat()
+        self.heartbeat_job = self.root.after(HEARTBEAT_FLUSH_MS, self.schedule_heartbeat)
+
+    def flush_heartbeat(self):
+        # checkpoint rides on the same connection as the monitor heartbeat
+        try:
+            self.session.flush()
+        except CLIENT_ERRORS:
+            pass  # best effort; never interrupt the exam
+
+    def stop_heartbeat(self):
+        if self.heartbeat_job:
+            self.root.after_cancel(self.heartbeat_job)
+            self.heartbeat_job = None
+        self.heartbeat.discard(self.user_name)
+
     # --------------------------------------------------------
     # VIEW USER RESULTS
     # --------------------------------------------------------
     def view_user_results(self):
-        with Database() as db:
-            if not db:
-                return
-            db.cursor.execute("""
-                SELECT s.set_name, r.score, r.total, r.date_taken
-                FROM results r
-                JOIN sets s ON r.set_id = s.set_id
-                WHERE r.user_name = %s
-            """, (self.user_name,))
-            results = db.cursor.fetchall()
+        try:
+            attempts, average, per_set = services.history_summary(self.user_name)
+            rows, cursor = services.history_page(self.user_name)
+        except CLIENT_ERRORS as e:
+            db_error(e)
+            return
 
         win = tk.Toplevel(self.root)
         win.title("My Results")
-        win.geometry("500x350")
+        win.geometry("560x480")
         win.configure(bg="#f0f0f0")
 
         tk.Label(win, text="Your Quiz Results", font=("Arial", 14), bg="#f0f0f0").pack(pady=10)
 
-        if not results:
+        if not rows:
             tk.Label(win, text="No results found.", bg="#f0f0f0").pack()
             return
 
+        tk.Label(win, text=f"Attempts: {attempts}    Average: {percent(average)}",
+                 bg="#f0f0f0").pack()
+        summary = ttk.Treeview(win, columns=("Quiz", "Attempts", "Best", "Average"),
+                               show="headings", height=min(len(per_set), 5))
+        for col in ("Quiz", "Attempts", "Best", "Average"):
+            summary.heading(col, text=col)
+        summary.pack(fill="x", padx=10, pady=5)
+        for set_name, n, best, avg in per_set:
+            summary.insert("", tk.END, values=(set_name, n, percent(best), percent(avg)))
+
         tree = ttk.Treeview(win, columns=("Quiz", "Score", "Total", "Date"), show="headings")
         tree.heading("Quiz", text="Quiz")
         tree.heading("Score", text="Score")
         tree.heading("Total", text="Total")
         tree.heading("Date", text="Date Taken")
-        tree.pack(fill="both", expand=True, padx=10, pady=10)
+        tree.pack(fill="both", expand=True, padx=10, pady=5)
+
+        # newest first, one page at a time
+        state = {"cursor": cursor}
+
+        def show(page):
+            for set_name, score, total, taken in page:
+                if isinstance(taken, datetime):
+                    taken = taken.strftime("%Y-%m-%d %H:%M:%S")
+                tree.insert("", tk.END, values=(set_name, score, total, taken))
+            more_btn.config(state="normal" if state["cursor"] else "disabled")
+
+        def load_more():
+            try:
+                page, state["cursor"] = services.history_page(self.user_name, state["cursor"])
+            except CLIENT_ERRORS as e:
+                db_error(e)
+                return
+            show(page)
 
-        for r in results:
-            tree.insert("", tk.END, values=r)
+        more_btn = tk.Button(win, text="Load more", command=load_more)
+        more_btn.pack(pady=(0, 10))
+        show(rows)
 
     # --------------------------------------------------------
     # UTILITY
@@ -314,6 +501,10 @@ class QuizUserApp:
 # ============================================================
 # RUN SYSTEM
 # ============================================================
-root = tk.Tk()
-app = QuizUserApp(root)
-root.mainloop()
+if __name__ == "__main__":
+    profiler = ui_profiler.from_config()  # opt-in, must hook Tk before widgets exist
+    root = tk.Tk()
+    app = QuizUserApp(root)
+    if profiler:
+        profiler.attach(root, app)
+    root.mainloop()